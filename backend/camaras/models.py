@@ -23,6 +23,51 @@ class Camara(models.Model):
         return f"Cámara en {self.lugar} ({self.cantidad} unidades)"
 
 
+class PerfilGrabacion(models.Model):
+    """
+    Perfil de grabación reutilizable entre cámaras.
+    Define cómo se escriben los videos: resolución, fps, códec y calidad.
+    Las cámaras sin perfil graban a resolución nativa con XVID.
+    """
+    CODECS = [
+        ('XVID', 'XVID (.avi)'),
+        ('MJPG', 'MJPEG (.avi)'),
+        ('mp4v', 'MPEG-4 (.mp4)'),
+        ('avc1', 'H.264 (.mp4)'),
+    ]
+    EXTENSIONES = {'XVID': '.avi', 'MJPG': '.avi', 'mp4v': '.mp4', 'avc1': '.mp4'}
+
+    nombre = models.CharField(max_length=100, unique=True)
+    altura_maxima = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Alto máximo en píxeles (se conserva la proporción). Vacío = resolución nativa.'
+    )
+    fps_maximo = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Tope de fps al grabar. Vacío = IA_RECORDING_MAX_FPS global.'
+    )
+    codec = models.CharField(max_length=4, choices=CODECS, default='XVID')
+    calidad = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text='Calidad 1-100 (MJPEG y pre-roll JPEG). Vacío = valor por defecto.'
+    )
+
+    class Meta:
+        verbose_name = 'Perfil de Grabación'
+        verbose_name_plural = 'Perfiles de Grabación'
+        ordering = ['nombre']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.codec}, {self.altura_maxima or 'nativa'}p, {self.fps_maximo or 'sin tope'} fps)"
+
+    @property
+    def extension(self):
+        return self.EXTENSIONES.get(self.codec, '.avi')
+
+
 class CamaraDetalles(models.Model):
     """
     Detalles técnicos de cada cámara individual.
@@ -44,6 +89,34 @@ class CamaraDetalles(models.Model):
     ip = models.GenericIPAddressField(protocol='both', unpack_ipv4=True)
     marca = models.CharField(max_length=100)
     resolucion = models.CharField(max_length=50)
+    
+    # Pre-filtro de movimiento: fracción de píxeles que deben cambiar para correr el modelo.
+    # Vacío = IA_MOTION_THRESHOLD global; 0 = analizar siempre.
+    umbral_movimiento = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Fracción (0-1) de píxeles con cambio para considerar que hay movimiento.'
+    )
+    
+    # Muestreo temporal del clip de 16 frames que ve el modelo
+    paso_muestreo = models.PositiveSmallIntegerField(
+        default=1,
+        help_text='Usar 1 de cada N frames para el clip (1 = frames consecutivos).'
+    )
+    duracion_clip = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Segundos que debe cubrir el clip de 16 frames; si se define, calcula el paso según los fps medidos.'
+    )
+    
+    # Cómo se graban los videos de esta cámara (vacío = resolución nativa, XVID)
+    perfil_grabacion = models.ForeignKey(
+        PerfilGrabacion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='camaras'
+    )
 
     class Meta:
         verbose_name = 'Detalle de Cámara'
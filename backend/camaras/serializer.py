@@ -1,8 +1,20 @@
 from rest_framework import serializers
-from .models import Camara, CamaraDetalles
+from .models import Camara, CamaraDetalles, PerfilGrabacion
 from zonas.serializers import ZonaSerializer
 
 
+class PerfilGrabacionSerializer(serializers.ModelSerializer):
+    """
+    Serializer para perfiles de grabación.
+    """
+    extension = serializers.ReadOnlyField()
+
+    class Meta:
+        model = PerfilGrabacion
+        fields = '__all__'
+        read_only_fields = ['id']
+
+
 class CamaraDetallesSerializer(serializers.ModelSerializer):
     """
     Serializer para detalles de cámara.
@@ -1,11 +1,12 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
-from .views import CamaraViewSet, CamaraDetallesViewSet, DetectarCamarasAPIView, RegistrarCamaraManualAPIView, estado_camara
+from .views import CamaraViewSet, CamaraDetallesViewSet, PerfilGrabacionViewSet, DetectarCamarasAPIView, RegistrarCamaraManualAPIView, estado_camara
 from .relay_integration import camara_detectada_relay, registrar_camara_desde_relay
 
 router = DefaultRouter()
 router.register(r'camaras', CamaraViewSet, basename='camara')
 router.register(r'camara-detalles', CamaraDetallesViewSet, basename='camara-detalles')
+router.register(r'perfiles-grabacion', PerfilGrabacionViewSet, basename='perfiles-grabacion')
 
 urlpatterns = router.urls + [
     path('detectar/', DetectarCamarasAPIView.as_view(), name='detectar-camaras'),
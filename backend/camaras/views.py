@@ -8,8 +8,8 @@ from django.shortcuts import get_object_or_404
 import requests
 import socket
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from .models import Camara, CamaraDetalles
-from .serializer import CamaraSerializer, CamaraDetallesSerializer
+from .models import Camara, CamaraDetalles, PerfilGrabacion
+from .serializer import CamaraSerializer, CamaraDetallesSerializer, PerfilGrabacionSerializer
 
 # Endpoint para verificar el estado de la señal de una cámara
 @api_view(['GET'])
@@ -59,6 +59,10 @@ class CamaraDetallesViewSet(viewsets.ModelViewSet):
     queryset = CamaraDetalles.objects.all()
     serializer_class = CamaraDetallesSerializer
 
+class PerfilGrabacionViewSet(viewsets.ModelViewSet):
+    queryset = PerfilGrabacion.objects.all()
+    serializer_class = PerfilGrabacionSerializer
+
 class RegistrarCamaraManualAPIView(APIView):
     def post(self, request):
         ip = request.data.get('ip')
@@ -0,0 +1,488 @@
+# ai_detection/ml/alert_outbox.py
+
+import json
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+from queue import Queue
+from threading import Thread, Timer, Lock
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+
+class AlertOutbox:
+    """
+    Outbox de alertas entre CameraProcessor y sus efectos secundarios.
+    El hilo de análisis solo encola (memoria, sin I/O); un pool de workers:
+      1. registra la alerta en AlertaPendiente (durable desde aquí)
+      2. crea el DetectionEvent, escribe sus miniaturas y lo asocia a la grabación
+      3. crea y entrega las notificaciones
+    Cada fila se reclama con un UPDATE condicional (pendiente → en_proceso), así
+    una alerta nunca la procesan dos workers a la vez. Cada paso se marca al
+    completarse; si falla, la fila vuelve a 'pendiente' y se reintenta con backoff
+    hasta IA_ALERT_OUTBOX_MAX_RETRIES (contador único: AlertaPendiente.intentos).
+    Si la BD no responde antes de registrar la alerta, ésta se guarda en un spool
+    en disco y se reintenta sin límite. Al arrancar el proceso (una sola vez) se
+    retoman el spool y las filas viejas que quedaron a medias.
+    Singleton.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.num_workers = max(1, int(getattr(settings, 'IA_ALERT_OUTBOX_WORKERS', 2)))
+        self.max_retries = int(getattr(settings, 'IA_ALERT_OUTBOX_MAX_RETRIES', 5))
+        self.retry_delay = float(getattr(settings, 'IA_ALERT_OUTBOX_RETRY_DELAY', 1.0))
+        self.max_retry_delay = float(getattr(settings, 'IA_ALERT_OUTBOX_MAX_RETRY_DELAY', 60))
+        self.recovery_age = float(getattr(settings, 'IA_ALERT_OUTBOX_RECOVERY_AGE', 600))
+        self.spool_dir = Path(getattr(settings, 'IA_ALERT_OUTBOX_SPOOL_DIR', '') or
+                              Path(getattr(settings, 'IA_RECORDING_DIR', 'media')) / '.outbox')
+
+        self.queue = Queue()
+        self.workers = []
+        self.lock = Lock()
+        self.recovery_done = False
+
+        # Métricas
+        self.submitted = 0
+        self.processed = 0
+        self.waiting_video = 0
+        self.retries = 0
+        self.failed = 0
+        self.spooled = 0
+        self.recovered = 0
+        self.last_latency_ms = 0.0
+
+        self._initialized = True
+
+    def submit(self, record):
+        """
+        Encola una alerta. Nunca bloquea: ni base de datos ni red.
+
+        Args:
+            record: dict serializable con alert_key, camera_id, camera_ip, result, notify;
+                las claves con '_' (p. ej. _preview, la vista previa en memoria) no se persisten
+        """
+        self.start()
+        record.setdefault('submitted_at', time.time())
+        self.submitted += 1
+        self.queue.put(record)
+
+    def start(self):
+        """Lanza los workers y, una sola vez por proceso, retoma las alertas de un proceso anterior"""
+        with self.lock:
+            if self.workers:
+                return
+            for i in range(self.num_workers):
+                worker = Thread(target=self._worker_loop, daemon=True, name=f'alert-outbox-{i}')
+                worker.start()
+                self.workers.append(worker)
+            recover = not self.recovery_done
+            self.recovery_done = True
+
+        if recover:
+            Thread(target=self._recover_pending, daemon=True, name='alert-outbox-recover').start()
+        print(f"✅ Outbox de alertas iniciado: {self.num_workers} workers")
+
+    def get_stats(self):
+        return {
+            'workers': self.num_workers,
+            'queued': self.queue.qsize(),
+            'submitted': self.submitted,
+            'processed': self.processed,
+            'waiting_video': self.waiting_video,
+            'retries': self.retries,
+            'failed': self.failed,
+            'spooled': self.spooled,
+            'recovered': self.recovered,
+            'last_latency_ms': self.last_latency_ms,
+        }
+
+    def _worker_loop(self):
+        while True:
+            record = self.queue.get()
+            try:
+                self._process(record)
+            except Exception as e:
+                self._retry_later(record, e)
+
+    def _claim(self, record):
+        """
+        Registra la alerta (o reclama su fila) para este worker.
+
+        Returns:
+            AlertaPendiente en estado 'en_proceso', o None si otro worker la tiene o ya terminó
+        """
+        from .models import AlertaPendiente
+
+        payload = {k: v for k, v in record.items() if not k.startswith('_')}
+        try:
+            with transaction.atomic():
+                outbox = AlertaPendiente.objects.create(
+                    clave=record['alert_key'],
+                    camara_id=record['camera_id'],
+                    payload=payload,
+                    estado='en_proceso',
+                )
+        except IntegrityError:
+            # Una fila 'en_proceso' solo se retoma si la reclamó este mismo record
+            # (su liberación falló con la BD caída)
+            estados = ['pendiente', 'en_proceso'] if record.get('_claimed') else ['pendiente']
+            claimed = AlertaPendiente.objects.filter(
+                clave=record['alert_key'], estado__in=estados
+            ).update(estado='en_proceso', fecha_actualizacion=timezone.now())
+            outbox = AlertaPendiente.objects.get(clave=record['alert_key']) if claimed else None
+
+        # Ya es durable en la BD: el spool sobra
+        record['_persisted'] = True
+        record['_claimed'] = outbox is not None
+        self._unspool(record['alert_key'])
+        return outbox
+
+    def _process(self, record):
+        outbox = self._claim(record)
+        if outbox is None:
+            return
+
+        try:
+            if 'deteccion' not in outbox.pasos_completados:
+                with transaction.atomic():
+                    outbox.detection_id = save_detection(record['camera_id'], record['result'])
+                    self._complete_step(outbox, 'deteccion')
+
+            if 'grabacion' not in outbox.pasos_completados:
+                if attach_to_recording(record, outbox.detection_id):
+                    self._complete_step(outbox, 'grabacion')
+
+            if record.get('notify') and 'notificaciones' not in outbox.pasos_completados:
+                with transaction.atomic():
+                    notificaciones = create_notifications(record, outbox.detection_id)
+                    self._complete_step(outbox, 'notificaciones')
+                    deliver_notifications(notificaciones)
+        except Exception as e:
+            outbox.intentos += 1
+            outbox.ultimo_error = f"{e}\n{traceback.format_exc()}"
+            outbox.estado = 'fallida' if outbox.intentos >= self.max_retries else 'pendiente'
+            outbox.save(update_fields=['intentos', 'ultimo_error', 'estado', 'fecha_actualizacion'])
+            record['_claimed'] = False
+            if outbox.estado == 'fallida':
+                self.failed += 1
+                print(f"❌ Alerta {outbox.clave} descartada tras {outbox.intentos} intentos: {e}")
+                return
+            raise
+
+        self.last_latency_ms = (time.time() - record['submitted_at']) * 1000
+        if 'grabacion' in outbox.pasos_completados:
+            outbox.estado = 'procesada'
+            outbox.save(update_fields=['estado', 'fecha_actualizacion'])
+            self.processed += 1
+            return
+
+        # El clip aún se está consolidando: lo cierra la consolidación (complete_waiting_alerts).
+        # Se marca la espera antes de volver a buscar el clip, para que uno de los dos lo vea
+        outbox.estado = 'esperando_video'
+        outbox.save(update_fields=['estado', 'fecha_actualizacion'])
+        self.waiting_video += 1
+        finish_waiting_alert(outbox.clave)
+
+    def _complete_step(self, outbox, step):
+        outbox.pasos_completados = outbox.pasos_completados + [step]
+        outbox.save(update_fields=['pasos_completados', 'detection_id', 'fecha_actualizacion'])
+
+    def _retry_later(self, record, error):
+        """
+        Reencola con backoff exponencial (tope IA_ALERT_OUTBOX_MAX_RETRY_DELAY) sin ocupar un worker.
+        Los reintentos que cuentan son los de la fila (intentos); si la BD no responde
+        la alerta nunca se descarta: se guarda en el spool y se sigue intentando.
+        """
+        if not record.get('_persisted'):
+            self._spool(record)
+        backoff = record.get('_backoff', 0)
+        record['_backoff'] = backoff + 1
+        self.retries += 1
+        delay = min(self.retry_delay * (2 ** backoff), self.max_retry_delay)
+        print(f"⚠️ Error procesando alerta {record['alert_key']} (reintento en {delay:.0f}s): {error}")
+        timer = Timer(delay, self.queue.put, args=(record,))
+        timer.daemon = True
+        timer.start()
+
+    def _spool(self, record):
+        """Copia en disco de una alerta aún no registrada en la BD"""
+        path = self.spool_dir / f"{record['alert_key']}.json"
+        if path.exists():
+            return
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix('.tmp')
+            tmp.write_text(json.dumps({k: v for k, v in record.items() if not k.startswith('_')}))
+            tmp.replace(path)
+            self.spooled += 1
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ No se pudo guardar la alerta {record['alert_key']} en el spool: {e}")
+
+    def _unspool(self, alert_key):
+        try:
+            (self.spool_dir / f"{alert_key}.json").unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def _recover_pending(self):
+        """
+        Alertas que quedaron a medias en un proceso anterior. Se ejecuta una vez al
+        arrancar y solo toca filas sin actividad hace más de IA_ALERT_OUTBOX_RECOVERY_AGE,
+        para no pisar alertas que otro proceso vivo tenga en su cola o en backoff.
+        """
+        from .models import AlertaPendiente
+
+        # 1. Spool: alertas que nunca llegaron a la BD
+        for path in sorted(self.spool_dir.glob('*.json')) if self.spool_dir.exists() else []:
+            try:
+                record = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Spool de alerta ilegible {path.name}: {e}")
+                continue
+            record['recovered'] = True
+            self.recovered += 1
+            self.queue.put(record)
+
+        while True:
+            try:
+                cutoff = timezone.now() - timedelta(seconds=self.recovery_age)
+                # 2. Filas reclamadas por un proceso que murió a mitad de camino
+                AlertaPendiente.objects.filter(
+                    estado='en_proceso', fecha_actualizacion__lt=cutoff
+                ).update(estado='pendiente')
+                pending = list(AlertaPendiente.objects.filter(estado='pendiente', fecha_actualizacion__lt=cutoff))
+                # 3. Alertas cuyo clip ya no va a consolidarse en este proceso
+                waiting = list(AlertaPendiente.objects.filter(
+                    estado='esperando_video', fecha_actualizacion__lt=cutoff
+                ).values_list('clave', flat=True))
+                break
+            except Exception as e:
+                print(f"⚠️ No se pudieron leer alertas pendientes (reintento en {self.max_retry_delay:.0f}s): {e}")
+                time.sleep(self.max_retry_delay)
+
+        for outbox in pending:
+            record = dict(outbox.payload)
+            record['recovered'] = True
+            record['_persisted'] = True
+            self.recovered += 1
+            self.queue.put(record)
+
+        for clave in waiting:
+            try:
+                finish_waiting_alert(clave, give_up=True)
+            except Exception as e:
+                print(f"⚠️ Error cerrando alerta {clave} sin video: {e}")
+
+        if pending or waiting:
+            print(f"♻️ Alertas retomadas: {len(pending)} pendientes, {len(waiting)} esperando video")
+
+
+def save_detection(camera_id, result):
+    """Guarda evento de detección en la base de datos"""
+    from .models import DetectionEvent
+    from camaras.models import CamaraDetalles
+    id_camara = CamaraDetalles.objects.select_related('camara').get(id=camera_id)
+    detection = DetectionEvent.objects.create(
+        camara_id=id_camara,
+        tipo_alerta=result['class_name'],
+        zona=id_camara.zona,
+        user=id_camara.camara.user
+    )
+    return detection.id
+
+
+def attach_to_recording(record, detection_id):
+    """
+    Escribe las miniaturas de la alerta y asocia el DetectionEvent a ellas y a su grabación.
+    La vista previa en memoria se pierde si el proceso cae: una alerta retomada queda sin miniaturas.
+
+    Returns:
+        True si quedó asociado (o si la grabación se perdió con un proceso anterior);
+        False si el clip aún se está consolidando (lo asocia complete_waiting_alerts)
+    """
+    from .models import DetectionEvent
+    from .camara_manager import camera_manager
+    from .video_recorder import write_preview
+
+    # Fuera del hilo de análisis; en un reintento ya están escritas
+    if record.get('_preview') is not None:
+        record['thumbnails'] = write_preview(record['_preview'])
+        del record['_preview']
+
+    thumbnails = record.get('thumbnails') or {}
+    if thumbnails:
+        DetectionEvent.objects.filter(id=detection_id).update(
+            thumbnail_file=thumbnails.get('thumbnail'),
+            strip_file=thumbnails.get('strip')
+        )
+
+    # Grabación en curso: el video se asocia al consolidar
+    processor = camera_manager.processors.get(record['camera_id'])
+    if processor and processor.recorder:
+        if processor.recorder.attach_detection(record['alert_key'], detection_id):
+            return True
+
+    # Clip ya consolidado: asociarlo desde el índice
+    if link_recorded_clip(record['alert_key'], detection_id):
+        return True
+
+    if record.get('recovered'):
+        # La grabación en memoria murió con el proceso anterior
+        print(f"⚠️ Alerta {record['alert_key']} sin video: la grabación no sobrevivió al reinicio")
+        return True
+    return False
+
+
+def link_recorded_clip(alert_key, detection_id):
+    """Asocia el DetectionEvent al clip consolidado que contiene la alerta, si existe"""
+    from .models import VideoAlerta
+    from .retention import link_detections
+
+    video = VideoAlerta.objects.filter(claves_alerta__contains=[alert_key]).first()
+    if video is None:
+        return False
+    link_detections(video, [detection_id])
+    return True
+
+
+def finish_waiting_alert(alert_key, give_up=False):
+    """
+    Cierra una alerta en 'esperando_video' si su clip ya está indexado.
+    Con give_up se cierra igual (el clip no va a llegar: consolidación fallida o proceso caído).
+    La transición es condicional: si la consolidación y el worker llegan a la vez, solo uno la cierra.
+    """
+    from .models import AlertaPendiente
+
+    outbox = AlertaPendiente.objects.filter(clave=alert_key, estado='esperando_video').first()
+    if outbox is None:
+        return False
+    linked = link_recorded_clip(alert_key, outbox.detection_id)
+    if not linked and not give_up:
+        return False
+    if not linked:
+        print(f"⚠️ Alerta {alert_key} cerrada sin video")
+
+    return bool(AlertaPendiente.objects.filter(clave=alert_key, estado='esperando_video').update(
+        estado='procesada',
+        pasos_completados=outbox.pasos_completados + ['grabacion'],
+        fecha_actualizacion=timezone.now(),
+    ))
+
+
+def complete_waiting_alerts(alert_keys):
+    """Llamado por la consolidación tras indexar el clip: cierra las alertas que lo esperaban"""
+    from .models import AlertaPendiente
+
+    if not alert_keys:
+        return 0
+    waiting = AlertaPendiente.objects.filter(
+        clave__in=alert_keys, estado='esperando_video'
+    ).values_list('clave', flat=True)
+    return sum(1 for clave in list(waiting) if finish_waiting_alert(clave))
+
+
+def thumbnail_urls(detection_id, thumbnails):
+    """URLs cacheables de la vista previa para la metadata de la notificación"""
+    from django.urls import reverse
+    urls = {}
+    if not detection_id or not thumbnails:
+        return urls
+    if thumbnails.get('thumbnail'):
+        urls['thumbnail_url'] = reverse('detection_events-thumbnail', args=[detection_id])
+    if thumbnails.get('strip'):
+        urls['strip_url'] = reverse('detection_events-thumbnail', args=[detection_id]) + '?tipo=strip'
+    return urls
+
+
+def create_notifications(record, detection_id):
+    """
+    Crea las notificaciones del sistema para una alerta.
+    Destinatarios desde el índice de alertas (misma empresa que la cámara):
+    jefes de seguridad + guardias de la zona de la cámara (ver Perfil.puede_recibir_alerta).
+    Todas en un solo INSERT (bulk_create).
+    """
+    from notificaciones.models import Notificacion
+    from perfil.models import Perfil
+    from perfil.routing_index import alert_routing_index
+    from django.utils import timezone
+
+    camera_id = record['camera_id']
+    result = record['result']
+
+    # Zona y destinatarios de la cámara: búsqueda en el índice, sin recorrer perfiles
+    ruta = alert_routing_index.resolve(camera_id)
+    if ruta is None:
+        print(f"⚠️ Cámara {camera_id} no encontrada en el índice de alertas")
+        return []
+    zona_nombre = ruta['zona_nombre']
+
+    # Determinar nivel según criticidad
+    event_type = result.get('event_type', 'AI Detection')
+    if result.get('is_critical'):
+        nivel_peligro = 'rojo'
+        prioridad = 'alta'
+        titulo = f"🚨 CRÍTICO: {result['class_name']} detectado"
+    else:
+        nivel_peligro = 'amarillo'
+        prioridad = 'media'
+        titulo = f"⚠️ ALERTA: {result['class_name']} detectado"
+
+    # Solo id y nombre (el serializer del WebSocket usa perfil.nombre)
+    perfiles_destinatarios = list(
+        Perfil.objects.filter(id__in=ruta['perfil_ids']).only('id', 'nombre')
+    )
+
+    metadata = {
+        'detection_id': detection_id,
+        'confidence': result['confidence'],
+        'class_id': result.get('class_id', 1),
+        'class_name': result['class_name'],
+        'probabilities': result.get('probabilities', {}),
+        'camera_ip': record.get('camera_ip'),
+        'event_type': event_type,
+        'timestamp': timezone.now().isoformat(),
+        **thumbnail_urls(detection_id, record.get('thumbnails'))
+    }
+
+    notificaciones = Notificacion.objects.bulk_create([
+        Notificacion(
+            perfil=perfil,
+            titulo=titulo,
+            mensaje=f"Detección en zona {zona_nombre}. Confianza: {result['confidence']:.0%}. Tipo: {event_type}",
+            tipo='violencia',
+            prioridad=prioridad,
+            nivel_peligro=nivel_peligro,
+            canal='push',
+            zona=zona_nombre,
+            camara_id=camera_id,
+            metadata=metadata
+        )
+        for perfil in perfiles_destinatarios
+    ])
+
+    print(f"📢 Notificaciones creadas: {len(notificaciones)} destinatarios | Zona: {zona_nombre} | Evento: {event_type}")
+    return notificaciones
+
+
+def deliver_notifications(notificaciones):
+    """bulk_create no dispara post_save: el lote completo se entrega tras el commit"""
+    from notificaciones.dispatch import despachar_lote
+    if notificaciones:
+        despachar_lote(notificaciones)
+
+
+# Instancia global singleton (los workers arrancan con la primera cámara)
+alert_outbox = AlertOutbox()
@@ -7,6 +7,17 @@ class IaDetectionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ia_detection'
     
+    def ready(self):
+        """Al arrancar: barrer temporales de grabación que dejó un proceso anterior"""
+        from django.conf import settings
+        if not getattr(settings, 'IA_RETENTION_SWEEP_ON_STARTUP', True):
+            return
+        
+        from threading import Thread
+        from .retention import sweep_orphans
+        # En segundo plano: no demorar el arranque en discos grandes
+        Thread(target=sweep_orphans, daemon=True, name='barrido-temporales').start()
+    
     # def ready(self):
     #     """Se ejecuta cuando Django arranca"""
     #     from .ml.camera_manager import camera_manager
@@ -1,6 +1,7 @@
 # ai_detection/ml/camera_manager.py
 
 from .camara_processor import CameraProcessor
+from .alert_outbox import alert_outbox
 
 
 class CameraManager:
@@ -22,6 +23,7 @@ class CameraManager:
         try:
             processor.start()  # ← puede fallar
             self.processors[camera_id] = processor
+            alert_outbox.start()  # Retoma alertas pendientes de un proceso anterior
         except Exception as e:
             print(f"❌ Error iniciando cámara {camera_id}: {e}")
             print("⏭ Saltando a la siguiente cámara…")
@@ -35,6 +37,14 @@ class CameraManager:
     def get_active_cameras(self):
         """Lista de cámaras activas"""
         return list(self.processors.keys())
+    
+    def get_stats(self, camera_ids=None):
+        """Contadores de captura/análisis por cámara activa"""
+        return [
+            processor.get_stats()
+            for camera_id, processor in list(self.processors.items())
+            if camera_ids is None or camera_id in camera_ids
+        ]
 
 
 # Singleton global
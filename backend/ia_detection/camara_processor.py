@@ -3,14 +3,22 @@
 import cv2
 import numpy as np
 import time
-from threading import Thread, Lock
-from .detector import detector
+import uuid
+from threading import Thread, Lock, Condition
+from django.conf import settings
+from .inference import get_inference_backend
+from .feature_cache import FeatureRingCache
+from .frame_buffer import ClipRingBuffer
+from .motion_gate import MotionGate
 from .video_recorder import VideoRecorder
+from .alert_outbox import alert_outbox
 
 class CameraProcessor:
     """
     Procesa una cámara individual.
-    Captura frames, acumula en buffer y detecta violencia.
+    Dos etapas en hilos separados:
+      - Captura: lee la cámara sin pausa, graba y deja siempre los frames más recientes en el buffer
+      - Análisis: cuando está libre toma el clip más fresco, detecta violencia y gestiona alertas
     """
     
     def __init__(self, camera_id, camera_type, camera_ip):
@@ -24,6 +32,9 @@ class CameraProcessor:
         self.cooldown_active = False
         self.cooldown_until = 0
         self.cooldown_seconds = 60 # 1 minuto
+        # Durante el cooldown las alertas se registran (sin notificar) cada N segundos como máximo
+        self.alert_min_interval = getattr(settings, 'IA_ALERT_MIN_INTERVAL', 5)
+        self.last_alert_time = 0
         
         # Construir stream URL
         if camera_type == "IP Webcam":
@@ -33,18 +44,58 @@ class CameraProcessor:
         else:
             raise ValueError(f"Tipo de cámara no soportado: {camera_type}")
         
-        # Buffer de frames
-        self.frame_buffer = []
+        # Buffer circular uint8 de frames (preasignado)
         self.max_buffer_size = 16
+        self.frame_buffer = ClipRingBuffer(size=self.max_buffer_size)
         self.lock = Lock()
+        self.frames_ready = Condition(self.lock)
+        self.last_analyzed_total = 0  # frame_buffer.total en el último análisis
+        
+        # Política de descarte del análisis:
+        #   'latest'     → siempre el clip más reciente; frames no analizados se cuentan como descartados
+        #   'skip_stale' → igual, pero descarta clips más viejos que max_clip_age (captura detenida)
+        self.drop_policy = getattr(settings, 'IA_ANALYSIS_DROP_POLICY', 'latest')
+        self.max_clip_age = getattr(settings, 'IA_ANALYSIS_MAX_CLIP_AGE', 2.0)
+        
+        # Modo streaming: cada frame pasa una sola vez por MobileNet y el
+        # LSTM se re-ejecuta cada `stride` frames sobre las últimas 16 features
+        self.streaming_mode = getattr(settings, 'IA_STREAMING_MODE', False)
+        self.stride = max(1, int(getattr(settings, 'IA_STREAMING_STRIDE', 4)))
+        self.feature_cache = FeatureRingCache(window_size=self.max_buffer_size)
+        
+        # Pre-filtro de movimiento (se configura en start() con el umbral de la cámara)
+        self.motion_gate = None
+        
+        # Muestreo temporal: 1 de cada `sample_step` frames entra al clip (ver CamaraDetalles)
+        self.sample_step = 1
+        self.clip_duration = None
+        self.input_fps = 0.0
+        self.last_grab_time = None
+        
+        # Planificador en proceso o servidor de inferencia aparte (IA_INFERENCE_BACKEND)
+        self.inference = get_inference_backend()
         
         # Control
         self.running = False
-        self.thread = None
+        self.capture_thread = None
+        self.analysis_thread = None
         self.cap = None
         
         # Resultado actual
         self.last_result = None
+        
+        # Contadores
+        self.frames_captured = 0
+        self.frames_sampled = 0
+        self.frames_not_decoded = 0
+        self.frames_analyzed = 0
+        self.frames_dropped = 0
+        self.clips_analyzed = 0
+        self.clips_stale = 0
+        self.clips_skipped_motion = 0
+        self.capture_errors = 0
+        self.last_analysis_ms = 0.0
+        self.last_result_delay_ms = 0.0
     
     def start(self):
         """Inicia el procesamiento"""
@@ -58,162 +109,376 @@ class CameraProcessor:
             print(f"No se pudo conectar a {self.stream_url}")
             raise ConnectionError(f"No se pudo conectar a {self.stream_url}")
         print(f"Conectado a {self.stream_url}")
+        # Minimizar el buffer interno del decoder (no todos los backends lo respetan)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._load_camera_config()
         self.recorder = VideoRecorder(self.camera_id)
         self.running = True
         self.start_time = time.time()
-        self.thread = Thread(target=self._process_loop, daemon=True)
-        self.thread.start()
+        self.capture_thread = Thread(target=self._capture_loop, daemon=True)
+        self.analysis_thread = Thread(target=self._analysis_loop, daemon=True)
+        self.capture_thread.start()
+        self.analysis_thread.start()
+    
+    def _load_camera_config(self):
+        """Configuración por cámara guardada en CamaraDetalles"""
+        from camaras.models import CamaraDetalles
+        camara = CamaraDetalles.objects.get(id=self.camera_id)
+        
+        self.sample_step = max(1, camara.paso_muestreo or 1)
+        self.clip_duration = camara.duracion_clip
+        
+        if getattr(settings, 'IA_MOTION_GATE', True):
+            threshold = camara.umbral_movimiento
+            if threshold is None:
+                threshold = getattr(settings, 'IA_MOTION_THRESHOLD', 0.005)
+            self.motion_gate = MotionGate(
+                threshold=threshold,
+                pixel_threshold=getattr(settings, 'IA_MOTION_PIXEL_THRESHOLD', 25)
+            )
     
     def stop(self):
         """Detiene el procesamiento"""
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
+        with self.frames_ready:
+            self.frames_ready.notify_all()
+        for thread in (self.capture_thread, self.analysis_thread):
+            if thread:
+                thread.join(timeout=5)
         if self.cap:
             self.cap.release()
         if hasattr(self, 'recorder') and self.recorder:
             self.recorder.cleanup()
 
 
-    def _process_loop(self):
-        """Loop INFINITO que procesa frames mientras la cámara esté activa"""
+    def _capture_loop(self):
+        """
+        Loop INFINITO de captura: nunca espera al modelo.
+        Usa grab() + retrieve(): los frames que no van al clip ni al recorder
+        no se decodifican, y los que solo van al recorder no se preprocesan.
+        """
 
         while self.running:
-            ret, frame = self.cap.read()
+            ret = self.cap.grab()
 
             # Si la cámara no entrega frame
-            if not ret or frame is None:
+            if not ret:
+                self.capture_errors += 1
                 print("⚠️ Frame vacío o error de cámara, reintentando...")
                 time.sleep(0.05)
                 continue
             
+            captured_at = time.time()
+            self._update_input_fps(captured_at)
+            sampled = self.frames_captured % self._current_sample_step() == 0
+            self.frames_captured += 1
+            
+            record = self.recorder.needs_frame(captured_at)
+            if not sampled and not record:
+                self.frames_not_decoded += 1
+                continue
+            
+            ret, frame = self.cap.retrieve()
+            if not ret or frame is None:
+                self.capture_errors += 1
+                continue
+            
+            if record:
+                # Solo encola: la escritura a disco corre en el hilo del recorder
+                self.recorder.add_frame(frame, captured_at)
+
+            if sampled:
+                self.frames_sampled += 1
+                self._add_frame(frame, captured_at)
+
+    def _update_input_fps(self, now):
+        """Media móvil de los fps que entrega la cámara"""
+        if self.last_grab_time is not None:
+            interval = now - self.last_grab_time
+            if interval > 0:
+                fps = 1.0 / interval
+                self.input_fps = fps if self.input_fps == 0 else 0.9 * self.input_fps + 0.1 * fps
+        self.last_grab_time = now
+
+    def _current_sample_step(self):
+        """Paso de muestreo: fijo, o derivado de la duración de clip y los fps medidos"""
+        if self.clip_duration and self.input_fps > 0:
+            return max(1, round(self.clip_duration * self.input_fps / self.max_buffer_size))
+        return self.sample_step
+
+    def _analysis_loop(self):
+        """Loop INFINITO de análisis: toma el clip más fresco cuando el modelo está libre"""
+
+        while self.running:
+            with self.frames_ready:
+                self.frames_ready.wait_for(
+                    lambda: not self.running or self._ready_for_detection(),
+                    timeout=1.0
+                )
+                if not self.running or not self._ready_for_detection():
+                    continue
+                
+                # 🔥 NUEVO: Saltar detecciones durante warmup
+                if time.time() - self.start_time < self.warmup_seconds:
+                    # No detectar durante primeros X segundos
+                    # pero SÍ seguir grabando y acumulando frames
+                    self.last_analyzed_total = self.frame_buffer.total
+                    continue
+            
             # ← NUEVO: Verificar si cooldown expiró
             if self.cooldown_active and time.time() >= self.cooldown_until:
                 self.cooldown_active = False
                 print(f"✅ Cooldown terminado - Cámara {self.camera_id}")
-            
-            try:
-                self.recorder.add_frame(frame)
-            except Exception as e:
-                print(f"⚠️ Error al grabar frame en recorder: {e}")
-
-            self._add_frame(frame)
-
-            # Esperar hasta tener suficientes frames
-            if len(self.frame_buffer) < self.max_buffer_size:
-                continue
-            # 🔥 NUEVO: Saltar detecciones durante warmup
-            if time.time() - self.start_time < self.warmup_seconds:
-                # No detectar durante primeros X segundos
-                # pero SÍ seguir grabando y acumulando frames
-                continue
 
+            started = time.time()
             result = self._detect()
+            self.last_analysis_ms = (time.time() - started) * 1000
 
             # Protección para evitar crashes
             if not result or not isinstance(result, dict):
                 print("⚠️ _detect() devolvió None o formato inválido, saltando…")
                 continue
             
-            # ← MODIFICADO: Solo alertar si NO hay cooldown activo
-            if result.get("is_alert", False) and not self.cooldown_active:
+            self._handle_result(result)
 
-                # Websocket inmediatamente
-                self._notify_websocket(result)
+    def _handle_result(self, result):
+        """Gestiona una alerta: notificación, BD, grabación y cooldown"""
+        if result.get("is_alert", False) and self.cooldown_active:
+            self._handle_cooldown_alert(result)
 
-                # Guardar en BD
-                detection_id = self._save_to_db(result)
+        # ← MODIFICADO: Solo notificar si NO hay cooldown activo
+        elif result.get("is_alert", False):
+            self.last_alert_time = time.time()
 
-                # ← NUEVO: Enviar notificaciones automáticas
-                try:
-                    self._enviar_notificacion_sistema(detection_id, result)
-                except Exception as e:
-                    print(f"⚠️ Error al enviar notificaciones: {e}")
+            # Websocket inmediatamente
+            self._notify_websocket(result)
 
-                # Activar grabación especial BEFORE + AFTER
-                try:
-                    self.recorder.trigger_alert(
-                        alert_type=result.get("class_name", "alerta"),
-                        confidence=result.get("confidence", 0),
-                        detection_id=detection_id
-                    )
-                except Exception as e:
-                    print(f"⚠️ Error al activar grabación de alerta: {e}")
+            # Grabación inline; BD, miniaturas y notificaciones vía outbox
+            self._submit_alert(result, notify=True)
 
-                # ← NUEVO: Activar cooldown de 1 minuto
-                self.cooldown_active = True
-                self.cooldown_until = time.time() + self.cooldown_seconds
-                print(f"⏸️  Cooldown activado: 1 minuto - Cámara {self.camera_id}")
+            # ← NUEVO: Activar cooldown de 1 minuto
+            self.cooldown_active = True
+            self.cooldown_until = time.time() + self.cooldown_seconds
+            print(f"⏸️  Cooldown activado: 1 minuto - Cámara {self.camera_id}")
 
-                # Si usas celery → habilitar:
-                # process_alert_task.delay(detection_id)
+            # Si usas celery → habilitar:
+            # process_alert_task.delay(alert_key)
 
+    def _handle_cooldown_alert(self, result):
+        """
+        Alerta durante el cooldown: no se vuelve a notificar, pero se registra el
+        DetectionEvent y se extiende la grabación en curso (un solo clip por incidente).
+        """
+        now = time.time()
+        if now - self.last_alert_time < self.alert_min_interval:
+            return
+        self.last_alert_time = now
+
+        self._submit_alert(result, notify=False)
+        print(f"🔇 Alerta en cooldown registrada sin notificar - Cámara {self.camera_id}")
 
+    def _submit_alert(self, result, notify):
+        """
+        Activa la grabación de la alerta y delega en el outbox el DetectionEvent,
+        las miniaturas y las notificaciones. La vista previa se copia en memoria;
+        el outbox la escribe a disco. El hilo de análisis no espera a disco, base de datos ni red.
+        """
+        alert_key = uuid.uuid4().hex
+
+        # Activar grabación especial BEFORE + AFTER (copia también la vista previa)
+        preview = None
+        try:
+            preview = self.recorder.trigger_alert(
+                alert_type=result.get("class_name", "alerta"),
+                confidence=result.get("confidence", 0),
+                alert_key=alert_key
+            )
+        except Exception as e:
+            print(f"⚠️ Error al activar grabación de alerta: {e}")
+
+        alert_outbox.submit({
+            'alert_key': alert_key,
+            'camera_id': self.camera_id,
+            'camera_ip': self.camera_ip,
+            'result': result,
+            'notify': notify,
+            # Privado (no serializable): no pasa al payload ni al spool
+            '_preview': preview,
+        })
+        return alert_key
+
+    def get_stats(self):
+        """Contadores de captura y análisis de la cámara"""
+        return {
+            'camera_id': self.camera_id,
+            'drop_policy': self.drop_policy,
+            'frames_captured': self.frames_captured,
+            'frames_sampled': self.frames_sampled,
+            'frames_not_decoded': self.frames_not_decoded,
+            'sample_step': self._current_sample_step(),
+            'input_fps': self.input_fps,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_dropped': self.frames_dropped,
+            'clips_analyzed': self.clips_analyzed,
+            'clips_stale': self.clips_stale,
+            'clips_skipped_motion': self.clips_skipped_motion,
+            'capture_errors': self.capture_errors,
+            'last_analysis_ms': self.last_analysis_ms,
+            'last_result_delay_ms': self.last_result_delay_ms,
+            'recorder': self.recorder.get_stats() if self.recorder else None,
+        }
 
     
-    def _add_frame(self, frame):
-        """Preprocesa y añade frame al buffer"""
-        with self.lock:
-            # Resize a 224x224
-            frame_resized = cv2.resize(frame, (224, 224))
-            
-            # BGR → RGB
-            frame_rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-            
-            # Normalizar [0, 255] → [0, 1]
-            frame_normalized = frame_rgb.astype(np.float32) / 255.0
-            
-            # Añadir al buffer
-            self.frame_buffer.append(frame_normalized)
-            
-            # Mantener solo últimos 16
-            if len(self.frame_buffer) > self.max_buffer_size:
-                self.frame_buffer.pop(0)
+    def _add_frame(self, frame, captured_at=None):
+        """Preprocesa y añade frame al buffer (sobrescribe el más viejo)"""
+        with self.frames_ready:
+            # Resize a 224x224 + BGR → RGB directo en el slot del buffer
+            # (la normalización se hace una vez por clip en el detector)
+            self.frame_buffer.push(frame, captured_at, self.motion_gate)
+            self.frames_ready.notify()
+    
+    def _new_frames(self):
+        """Frames capturados desde el último análisis"""
+        return self.frame_buffer.total - self.last_analyzed_total
+    
+    def _ready_for_detection(self):
+        """Hay que detectar: 16 frames nuevos, o `stride` frames en modo streaming"""
+        if self.streaming_mode:
+            return self._new_frames() >= self.stride
+        return self.frame_buffer.is_full() and self._new_frames() >= self.max_buffer_size
+    
+    def _skip_static(self):
+        """
+        Si no hubo movimiento en los últimos 16 frames, los consume sin correr el modelo.
+        Llamar con self.lock tomado.
+        """
+        if self.motion_gate is None:
+            return False
+        if self.motion_gate.has_motion(self.frame_buffer.latest_motion(self.max_buffer_size)):
+            return False
+        
+        self.last_analyzed_total = self.frame_buffer.total
+        self.clips_skipped_motion += 1
+        return True
+    
+    def _take_frames(self, max_frames):
+        """
+        Toma los frames más recientes para analizar y actualiza los contadores.
+        Devuelve None si la política descarta el clip por viejo.
+        Llamar con self.lock tomado.
+        """
+        new_frames = self._new_frames()
+        taken = min(new_frames, max_frames)
+        
+        self.last_analyzed_total = self.frame_buffer.total
+        self.frames_dropped += new_frames - taken
+        
+        if self.drop_policy == 'skip_stale':
+            age = time.time() - self.frame_buffer.latest_timestamp()
+            if age > self.max_clip_age:
+                self.clips_stale += 1
+                self.frames_dropped += taken
+                return None
+        
+        self.frames_analyzed += taken
+        return self.frame_buffer.latest(taken), new_frames
+    
+    def _empty_result(self, class_name):
+        """Resultado sin alerta para cuando no hay predicción del modelo"""
+        return {
+            "is_alert": False,
+            "is_critical": False,
+            "class_id": -1,
+            "class_name": class_name,
+            "confidence": 0.0,
+            "probabilities": {},
+        }
     
     def _detect(self):
+        if self.streaming_mode:
+            return self._detect_streaming()
+        
         with self.lock:
 
             # Si no hay frames
             if len(self.frame_buffer) == 0:
-                return {
-                    "is_alert": False,
-                    "is_critical": False,
-                    "class_id": -1,
-                    "class_name": "no_frames",
-                    "confidence": 0.0,
-                    "probabilities": {},
-                }
+                return self._empty_result("no_frames")
 
-            # Si no hay 16 frames → rellenar duplicando el último
-            if len(self.frame_buffer) < self.max_buffer_size:
-                missing = self.max_buffer_size - len(self.frame_buffer)
-                last_frame = self.frame_buffer[-1]
-                self.frame_buffer += [last_frame] * missing
+            # Escena estática → no vale la pena correr el modelo
+            if self._skip_static():
+                return self._empty_result("no_motion")
 
-            # Convertir a numpy array
-            frames_array = np.array(self.frame_buffer)
+            # Clip más reciente, ordenado, uint8 [16, 224, 224, 3]
+            taken = self._take_frames(self.max_buffer_size)
+            if taken is None:
+                return self._empty_result("stale")
+            frames_array, _ = taken
+            captured_at = self.frame_buffer.latest_timestamp()
 
-            # Modelo detecta
-            result = detector.predict(frames_array)
+            # Si no hay 16 frames → rellenar duplicando el último
+            if len(frames_array) < self.max_buffer_size:
+                missing = self.max_buffer_size - len(frames_array)
+                frames_array = np.concatenate([frames_array, np.repeat(frames_array[-1:], missing, axis=0)])
 
-            # Prevención si el modelo falla
-            if result is None:
-                return {
-                    "is_alert": False,
-                    "is_critical": False,
-                    "class_id": -1,
-                    "class_name": "model_error",
-                    "confidence": 0.0,
-                    "probabilities": {},
-                }
+        # Modelo detecta (en micro-batch junto a las demás cámaras),
+        # sin bloquear a la captura mientras tanto
+        result = self.inference.predict(frames_array)
 
-            # Guardar último resultado
-            self.last_result = result
+        # Prevención si el modelo falla
+        if result is None:
+            return self._empty_result("model_error")
 
-            # Limpiar buffer
-            self.frame_buffer = []
+        # Guardar último resultado
+        self.last_result = result
+        self.clips_analyzed += 1
+        self.last_result_delay_ms = (time.time() - captured_at) * 1000
 
-            return result
+        return result
+    
+    def _detect_streaming(self):
+        """
+        Ventana deslizante: extrae features solo de los frames nuevos,
+        los añade al cache y clasifica las últimas 16 features.
+        """
+        with self.lock:
+            if self._new_frames() == 0:
+                return self._empty_result("no_frames")
+            
+            # Escena estática → no vale la pena correr el modelo
+            if self._skip_static():
+                self.feature_cache.clear()
+                return self._empty_result("no_motion")
+            
+            taken = self._take_frames(self.max_buffer_size)
+            captured_at = self.frame_buffer.latest_timestamp()
+        
+        if taken is None:
+            self.feature_cache.clear()
+            return self._empty_result("stale")
+        
+        new_frames, new_count = taken
+        # Si se perdieron frames, las features del cache ya no son contiguas
+        if new_count > self.max_buffer_size:
+            self.feature_cache.clear()
+        
+        features = self.inference.extract_features(new_frames)
+        if features is None:
+            return self._empty_result("model_error")
+        
+        self.feature_cache.push(features)
+        
+        # Aún no hay 16 features acumuladas
+        if not self.feature_cache.is_full():
+            return self._empty_result("buffering")
+        
+        result = self.inference.predict_features(self.feature_cache.window())
+        if result is None:
+            return self._empty_result("model_error")
+        
+        self.last_result = result
+        self.clips_analyzed += 1
+        self.last_result_delay_ms = (time.time() - captured_at) * 1000
+        return result
 
 
     
@@ -255,101 +520,3 @@ class CameraProcessor:
     #             }
     #         }
     #     )
-    def _save_to_db(self, result):
-        """Guarda evento de detección en la base de datos"""
-        from .models import DetectionEvent
-        from camaras.models import CamaraDetalles
-        id_camara = CamaraDetalles.objects.get(id=self.camera_id)
-        user = id_camara.camara.user
-        detection = DetectionEvent.objects.create(
-            camara_id=id_camara,
-            tipo_alerta=result['class_name'],
-            zona = id_camara.zona,
-            user=user
-        )
-        
-        return detection.id
-    
-    def _enviar_notificacion_sistema(self, detection_id, result):
-        """
-        Envía notificación automática al sistema cuando se detecta violencia.
-        Filtra perfiles por zona y rol según puede_recibir_alerta().
-        Funciona aunque zona sea None o datos sean fallback.
-        """
-        try:
-            from notificaciones.models import Notificacion
-            from perfil.models import Perfil
-            from camaras.models import CamaraDetalles
-            from django.utils import timezone
-            
-            # Obtener datos de cámara y zona
-            try:
-                camara_detalle = CamaraDetalles.objects.select_related('zona', 'camara').get(
-                    id=self.camera_id
-                )
-                zona = camara_detalle.zona
-                zona_id = zona.id if zona else None
-                zona_nombre = zona.nombre if zona else "Sin zona"
-            except Exception as e:
-                print(f"⚠️ Error obteniendo datos de cámara: {e}")
-                zona_id = None
-                zona_nombre = "Sin zona"
-            
-            # Determinar nivel según criticidad
-            event_type = result.get('event_type', 'AI Detection')
-            if result.get('is_critical'):
-                nivel_peligro = 'rojo'
-                prioridad = 'alta'
-                titulo = f"🚨 CRÍTICO: {result['class_name']} detectado"
-            else:
-                nivel_peligro = 'amarillo'
-                prioridad = 'media'
-                titulo = f"⚠️ ALERTA: {result['class_name']} detectado"
-            
-            # Filtrar perfiles que deben recibir esta alerta
-            try:
-                perfiles = Perfil.objects.filter(user_id__is_active=True).select_related('zona')
-                perfiles_destinatarios = [
-                    p for p in perfiles 
-                    if p.puede_recibir_alerta(zona_id)
-                ]
-            except Exception as e:
-                print(f"⚠️ Error filtrando perfiles: {e}")
-                perfiles_destinatarios = []
-            
-            # Crear notificaciones para cada destinatario
-            notificaciones_creadas = 0
-            for perfil in perfiles_destinatarios:
-                try:
-                    Notificacion.objects.create(
-                        perfil=perfil,
-                        titulo=titulo,
-                        mensaje=f"Detección en zona {zona_nombre}. Confianza: {result['confidence']:.0%}. Tipo: {event_type}",
-                        tipo='violencia',
-                        prioridad=prioridad,
-                        nivel_peligro=nivel_peligro,
-                        canal='push',
-                        zona=zona_nombre,
-                        camara_id=self.camera_id,
-                        metadata={
-                            'detection_id': detection_id,
-                            'confidence': result['confidence'],
-                            'class_id': result.get('class_id', 1),
-                            'class_name': result['class_name'],
-                            'probabilities': result.get('probabilities', {}),
-                            'camera_ip': self.camera_ip,
-                            'event_type': event_type,
-                            'timestamp': timezone.now().isoformat()
-                        }
-                    )
-                    notificaciones_creadas += 1
-                except Exception as e:
-                    print(f"⚠️ Error creando notificación para perfil {perfil.id}: {e}")
-                    continue
-            
-            print(f"📢 Notificaciones enviadas: {notificaciones_creadas} destinatarios | Zona: {zona_nombre} | Evento: {event_type}")
-        
-        except Exception as e:
-            print(f"❌ Error general en _enviar_notificacion_sistema: {str(e)}")
-            import traceback
-            traceback.print_exc()
\ No newline at end of file
@@ -4,6 +4,7 @@ import torch
 import torch.nn as nn
 import numpy as np
 from pathlib import Path
+from django.conf import settings
 from visual_safety.settings import BASE_DIR
 
 
@@ -33,12 +34,44 @@ class ViolenceDetector:
             2: 'Weaponized'
         }
         self.confidence_threshold =  0.9  # Umbral de confianza para alertas
+        self.precision = getattr(settings, 'DETECTION_MODEL_PRECISION', 'fp32')  # 'fp32' o 'int8'
         
         self._load_model()
         self._initialized = True
     
     def _load_model(self):
-        """Carga el modelo entrenado"""
+        """
+        Carga el modelo entrenado.
+        Prioriza el artefacto TorchScript exportado (INT8 o fp32): se carga sin
+        construir la arquitectura de torchvision ni descargar pesos de ImageNet.
+        """
+        if self.precision == 'int8':
+            int8_path = Path(getattr(
+                settings, 'DETECTION_MODEL_INT8_PATH',
+                Path(BASE_DIR) / 'ml_models' / 'best_model_int8.pt'
+            ))
+            if int8_path.exists():
+                from ml_models.quantization import configure_quantized_engine
+                
+                engine = configure_quantized_engine()
+                self._load_torchscript(int8_path)
+                
+                print(f"✅ Modelo INT8 cargado ({engine}): {int8_path}")
+                return
+            
+            print(f"⚠️ Modelo INT8 no encontrado: {int8_path}. Ejecuta 'calibrar_modelo_int8'. Usando fp32...")
+            self.precision = 'fp32'
+        
+        torchscript_path = Path(getattr(
+            settings, 'DETECTION_MODEL_TORCHSCRIPT_PATH',
+            Path(BASE_DIR) / 'ml_models' / 'best_model.pt'
+        ))
+        if torchscript_path.exists():
+            self._load_torchscript(torchscript_path)
+            
+            print(f"✅ Modelo TorchScript cargado: {torchscript_path}")
+            return
+        
         model_path = Path(BASE_DIR) / 'ml_models' / 'best_model.pth'
         
         if not model_path.exists():
@@ -47,70 +80,145 @@ class ViolenceDetector:
         # Importar arquitectura del modelo
         from ml_models.train_model import VideoClassifier
         
-        self.model = VideoClassifier(num_classes=3)
+        # Sin pesos de ImageNet: el checkpoint los sobrescribe igual
+        self.model = VideoClassifier(num_classes=3, pretrained=False)
         checkpoint = torch.load(str(model_path), map_location=self.device)
         self.model.load_state_dict(checkpoint['model_state_dict'])
         self.model.to(self.device)
         self.model.eval()
         
-        print(f"✅ Modelo cargado: {model_path}")
+        print(f"✅ Modelo cargado: {model_path} (ejecuta 'exportar_modelo' para un arranque más rápido)")
+    
+    def _load_torchscript(self, path):
+        """Carga un artefacto TorchScript congelado"""
+        self.model = torch.jit.load(str(path), map_location=self.device)
+        self.model.eval()
     
-    @torch.no_grad()
     def predict(self, frames):
         """
         Predice violencia en secuencia de frames.
         
         Args:
-            frames: numpy array [16, 224, 224, 3] normalizado [0, 1]
+            frames: numpy array [16, 224, 224, 3] RGB uint8 (o normalizado [0, 1])
         
         Returns:
             dict con resultado (siempre válido, usa fallback si falla)
         """
+        return self.predict_batch([frames])[0]
+    
+    @torch.no_grad()
+    def predict_batch(self, clips):
+        """
+        Predice violencia en varios clips con un solo forward del modelo.
+        
+        Args:
+            clips: lista de numpy arrays [16, 224, 224, 3] RGB uint8 (o normalizados [0, 1])
+        
+        Returns:
+            lista de dicts, uno por clip y en el mismo orden
+        """
         try:
-            # Convertir a tensor: [16, 224, 224, 3] → [1, 16, 3, 224, 224]
-            frames_tensor = torch.from_numpy(frames).permute(0, 3, 1, 2).unsqueeze(0)
+            # Apilar y convertir: N x [16, 224, 224, 3] → [N, 16, 3, 224, 224]
+            frames_tensor = self._to_tensor(np.stack(clips)).permute(0, 1, 4, 2, 3)
             frames_tensor = frames_tensor.to(self.device)
             
             # Inferencia
             outputs = self.model(frames_tensor)
-            probabilities = torch.softmax(outputs, dim=1)
-            confidence, predicted = torch.max(probabilities, 1)
+            probabilities = torch.softmax(outputs, dim=1).cpu().numpy()
+            
+            return [self._build_result(probs) for probs in probabilities]
+        
+        except Exception as e:
+            print(f"⚠️ Error en modelo ML: {str(e)}. Usando detección fallback...")
+            return [self._fallback_result() for _ in clips]
+    
+    @torch.no_grad()
+    def extract_features_batch(self, frame_groups):
+        """
+        Pasa frames sueltos por MobileNetV3 (una sola vez por frame).
+        
+        Args:
+            frame_groups: lista de numpy arrays [N_i, 224, 224, 3] RGB uint8 (o normalizados [0, 1])
+        
+        Returns:
+            lista de numpy arrays [N_i, 576] (None por grupo si falla el modelo)
+        """
+        try:
+            sizes = [len(group) for group in frame_groups]
+            frames_tensor = self._to_tensor(np.concatenate(frame_groups)).permute(0, 3, 1, 2)
+            frames_tensor = frames_tensor.to(self.device)
             
-            predicted_class = predicted.item()
-            confidence_value = confidence.item()
-            all_probs = probabilities[0].cpu().numpy()
+            features = self.model.extract_frame_features(frames_tensor).cpu().numpy()
             
-            result = {
-                'class_id': predicted_class,
-                'class_name': self.class_names[predicted_class],
-                'confidence': float(confidence_value),
-                'probabilities': {
-                    self.class_names[i]: float(prob) 
-                    for i, prob in enumerate(all_probs)
-                },
-                'is_alert': predicted_class > 0 and confidence_value > self.confidence_threshold,
-                'is_critical': predicted_class == 2,
-                'event_type': 'AI Detection'
-            }
+            return np.split(features, np.cumsum(sizes)[:-1])
+        
+        except Exception as e:
+            print(f"⚠️ Error extrayendo features: {str(e)}")
+            return [None for _ in frame_groups]
+    
+    @torch.no_grad()
+    def predict_features_batch(self, windows):
+        """
+        Corre solo LSTM + clasificador sobre ventanas de features ya extraídas.
+        
+        Args:
+            windows: lista de numpy arrays [16, 576]
+        
+        Returns:
+            lista de dicts, una por ventana y en el mismo orden
+        """
+        try:
+            features_tensor = torch.from_numpy(np.stack(windows)).to(self.device)
+            
+            outputs = self.model.classify_features(features_tensor)
+            probabilities = torch.softmax(outputs, dim=1).cpu().numpy()
             
-            return result
+            return [self._build_result(probs) for probs in probabilities]
         
         except Exception as e:
             print(f"⚠️ Error en modelo ML: {str(e)}. Usando detección fallback...")
-            # FALLBACK: Generar detección funcional para desarrollo
-            return {
-                'class_id': 1,
-                'class_name': 'Violence',
-                'confidence': 0.70,
-                'probabilities': {
-                    'No Violence': 0.20,
-                    'Violence': 0.70,
-                    'Weaponized': 0.10
-                },
-                'is_alert': True,
-                'is_critical': False,
-                'event_type': 'AI Detection (fallback)'
-            }
+            return [self._fallback_result() for _ in windows]
+    
+    def _to_tensor(self, frames):
+        """numpy → tensor float; los uint8 se normalizan [0, 255] → [0, 1] de una vez para todo el batch"""
+        tensor = torch.from_numpy(frames)
+        if tensor.dtype == torch.uint8:
+            tensor = tensor.float().div_(255.0)
+        return tensor
+    
+    def _build_result(self, all_probs):
+        """Construye el dict de resultado a partir de las probabilidades de un clip"""
+        predicted_class = int(np.argmax(all_probs))
+        confidence_value = float(all_probs[predicted_class])
+        
+        return {
+            'class_id': predicted_class,
+            'class_name': self.class_names[predicted_class],
+            'confidence': confidence_value,
+            'probabilities': {
+                self.class_names[i]: float(prob) 
+                for i, prob in enumerate(all_probs)
+            },
+            'is_alert': predicted_class > 0 and confidence_value > self.confidence_threshold,
+            'is_critical': predicted_class == 2,
+            'event_type': 'AI Detection'
+        }
+    
+    def _fallback_result(self):
+        """FALLBACK: Generar detección funcional para desarrollo"""
+        return {
+            'class_id': 1,
+            'class_name': 'Violence',
+            'confidence': 0.70,
+            'probabilities': {
+                'No Violence': 0.20,
+                'Violence': 0.70,
+                'Weaponized': 0.10
+            },
+            'is_alert': True,
+            'is_critical': False,
+            'event_type': 'AI Detection (fallback)'
+        }
 
 
 # Instancia global singleton
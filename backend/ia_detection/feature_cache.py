@@ -0,0 +1,35 @@
+# ai_detection/ml/feature_cache.py
+
+import numpy as np
+
+
+class FeatureRingCache:
+    """
+    Cache circular de features por frame (modo streaming).
+    Guarda los vectores de 576 features de los últimos `window_size` frames
+    para re-ejecutar solo LSTM + clasificador sobre ventanas solapadas.
+    """
+
+    def __init__(self, window_size=16, feature_size=576):
+        self.window_size = window_size
+        self.features = np.zeros((window_size, feature_size), dtype=np.float32)
+        self.index = 0  # Próxima posición a escribir
+        self.count = 0
+
+    def push(self, features):
+        """Añade features [N, 576] en orden temporal"""
+        for feature in features[-self.window_size:]:
+            self.features[self.index] = feature
+            self.index = (self.index + 1) % self.window_size
+            self.count = min(self.count + 1, self.window_size)
+
+    def is_full(self):
+        return self.count == self.window_size
+
+    def window(self):
+        """Ventana ordenada del frame más antiguo al más reciente: [16, 576]"""
+        return np.roll(self.features, -self.index, axis=0)
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
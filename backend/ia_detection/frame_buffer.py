@@ -0,0 +1,74 @@
+# ai_detection/ml/frame_buffer.py
+
+import time
+import cv2
+import numpy as np
+
+
+class ClipRingBuffer:
+    """
+    Buffer circular preasignado de frames uint8 RGB [16, 224, 224, 3].
+    Cada frame se redimensiona y convierte directamente en su slot:
+    sin arrays float por frame ni copias lista → array.
+    La normalización a [0, 1] se hace una sola vez sobre el clip, en el detector.
+    """
+
+    def __init__(self, size=16, height=224, width=224):
+        self.size = size
+        self.frames = np.empty((size, height, width, 3), dtype=np.uint8)
+        self._resized = np.empty((height, width, 3), dtype=np.uint8)
+        self.timestamps = np.zeros(size, dtype=np.float64)
+        self.motion = np.zeros(size, dtype=np.float32)  # Energía de movimiento por frame (MotionGate)
+        self.index = 0  # Próximo slot a escribir
+        self.count = 0
+        self.total = 0  # Frames añadidos desde el inicio (para saber cuántos son nuevos)
+
+    def __len__(self):
+        return self.count
+
+    def push(self, frame, timestamp=None, motion_gate=None):
+        """
+        Preprocesa un frame BGR (resize + BGR → RGB) dentro del buffer.
+        Si se pasa un MotionGate, guarda también la energía de movimiento del frame.
+        """
+        slot = self.frames[self.index]
+        height, width = self._resized.shape[:2]
+        cv2.resize(frame, (width, height), dst=self._resized)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=slot)
+        self.timestamps[self.index] = timestamp if timestamp is not None else time.time()
+        self.motion[self.index] = motion_gate.update(slot) if motion_gate else 0.0
+
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.total += 1
+
+    def is_full(self):
+        return self.count == self.size
+
+    def clip(self):
+        """Copia ordenada del frame más antiguo al más reciente: [count, 224, 224, 3]"""
+        return self.latest(self.count)
+
+    def latest(self, n):
+        """Copia de los últimos n frames en orden temporal"""
+        n = min(n, self.count)
+        start = (self.index - n) % self.size
+        if start + n <= self.size:
+            return self.frames[start:start + n].copy()
+        return np.concatenate((self.frames[start:], self.frames[:self.index]))
+
+    def latest_motion(self, n):
+        """Energía de movimiento de los últimos n frames"""
+        n = min(n, self.count)
+        indices = (self.index - n + np.arange(n)) % self.size
+        return self.motion[indices]
+
+    def latest_timestamp(self):
+        """Momento de captura del frame más reciente (0 si está vacío)"""
+        if self.count == 0:
+            return 0.0
+        return float(self.timestamps[(self.index - 1) % self.size])
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
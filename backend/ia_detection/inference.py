@@ -0,0 +1,18 @@
+# ai_detection/ml/inference.py
+
+from django.conf import settings
+
+
+def get_inference_backend():
+    """
+    Backend de inferencia según IA_INFERENCE_BACKEND:
+      - 'thread': planificador en este proceso (el modelo se carga aquí)
+      - 'process': workers aparte con memoria compartida (daphne no carga el modelo)
+    Import perezoso para no cargar el modelo en el proceso web si no hace falta.
+    """
+    if getattr(settings, 'IA_INFERENCE_BACKEND', 'thread') == 'process':
+        from .inference_server import inference_server
+        return inference_server
+
+    from .inference_scheduler import inference_scheduler
+    return inference_scheduler
@@ -0,0 +1,184 @@
+# ai_detection/ml/inference_scheduler.py
+
+import time
+from queue import Queue, Empty
+from threading import Thread, Event, Lock
+from django.conf import settings
+from .detector import detector
+
+
+class _InferenceRequest:
+    """Trabajo pendiente de inferencia y su resultado"""
+
+    def __init__(self, kind, payload):
+        self.kind = kind
+        self.payload = payload
+        self.result = None
+        self.done = Event()
+        self.enqueued_at = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Planificador central de inferencia.
+    Recibe los clips listos de todas las cámaras en una cola y los pasa
+    al modelo en micro-batches (tamaño máximo y espera máxima configurables).
+    Tipos de trabajo:
+      - 'clip': clip completo [16, 224, 224, 3] → resultado
+      - 'frames': frames nuevos [N, 224, 224, 3] → features [N, 576]
+      - 'features': ventana de features [16, 576] → resultado
+    Singleton: un solo hilo de inferencia por proceso.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.max_batch_size = max(1, int(getattr(settings, 'IA_INFERENCE_MAX_BATCH', 8)))
+        self.max_wait = getattr(settings, 'IA_INFERENCE_MAX_WAIT_MS', 25) / 1000.0
+        self.timeout = getattr(settings, 'IA_INFERENCE_TIMEOUT', 30)
+
+        self.handlers = {
+            'clip': detector.predict_batch,
+            'frames': detector.extract_features_batch,
+            'features': detector.predict_features_batch,
+        }
+
+        self.queue = Queue()
+        self.thread = None
+        self.lock = Lock()
+
+        # Métricas
+        self.batches_run = 0
+        self.clips_processed = 0
+        self.last_batch_size = 0
+        self.max_queue_wait = 0.0
+
+        self._initialized = True
+
+    def predict(self, frames):
+        """
+        Encola un clip y espera su resultado.
+
+        Args:
+            frames: numpy array [16, 224, 224, 3] RGB uint8
+
+        Returns:
+            dict con resultado, o None si se agotó el tiempo de espera
+        """
+        return self._submit('clip', frames)
+
+    def extract_features(self, frames):
+        """
+        Features de MobileNetV3 para frames nuevos (modo streaming).
+
+        Args:
+            frames: numpy array [N, 224, 224, 3] RGB uint8
+
+        Returns:
+            numpy array [N, 576], o None si falló o se agotó el tiempo
+        """
+        return self._submit('frames', frames)
+
+    def predict_features(self, window):
+        """
+        Clasifica una ventana de features ya extraídas (modo streaming).
+
+        Args:
+            window: numpy array [16, 576]
+
+        Returns:
+            dict con resultado, o None si se agotó el tiempo de espera
+        """
+        return self._submit('features', window)
+
+    def _submit(self, kind, payload):
+        """Encola un trabajo y bloquea hasta tener el resultado"""
+        self._ensure_running()
+
+        request = _InferenceRequest(kind, payload)
+        self.queue.put(request)
+
+        if not request.done.wait(self.timeout):
+            print(f"⚠️ Inferencia sin respuesta tras {self.timeout}s")
+            return None
+        return request.result
+
+    def get_stats(self):
+        """Métricas del planificador"""
+        return {
+            'queue_size': self.queue.qsize(),
+            'batches_run': self.batches_run,
+            'clips_processed': self.clips_processed,
+            'last_batch_size': self.last_batch_size,
+            'avg_batch_size': (self.clips_processed / self.batches_run) if self.batches_run else 0.0,
+            'max_queue_wait_ms': self.max_queue_wait * 1000,
+        }
+
+    def _ensure_running(self):
+        """Arranca el hilo de inferencia la primera vez que se usa"""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self._worker_loop, daemon=True)
+                self.thread.start()
+                print(f"✅ Planificador de inferencia iniciado "
+                      f"(batch máx: {self.max_batch_size}, espera máx: {self.max_wait * 1000:.0f} ms)")
+
+    def _collect_batch(self):
+        """Espera el primer clip y junta más hasta llenar el batch o agotar la espera"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+
+        return batch
+
+    def _worker_loop(self):
+        """Loop INFINITO que ejecuta los micro-batches"""
+        while True:
+            batch = self._collect_batch()
+            started = time.monotonic()
+
+            # Un solo forward por tipo de trabajo dentro del batch
+            by_kind = {}
+            for request in batch:
+                by_kind.setdefault(request.kind, []).append(request)
+
+            for kind, requests in by_kind.items():
+                try:
+                    results = self.handlers[kind]([request.payload for request in requests])
+                except Exception as e:
+                    print(f"⚠️ Error en batch de inferencia ({kind}): {e}")
+                    results = [None] * len(requests)
+
+                # Devolver cada resultado a su cámara
+                for request, result in zip(requests, results):
+                    request.result = result
+                    request.done.set()
+
+            self.batches_run += 1
+            self.clips_processed += len(batch)
+            self.last_batch_size = len(batch)
+            self.max_queue_wait = max(
+                self.max_queue_wait,
+                max(started - request.enqueued_at for request in batch)
+            )
+
+
+# Instancia global singleton
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,334 @@
+# ai_detection/ml/inference_server.py
+
+import os
+import time
+import atexit
+import itertools
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+from queue import Queue, Empty
+from threading import Thread, Event, Lock
+import numpy as np
+from django.conf import settings
+
+
+CLIP_SHAPE = (16, 224, 224, 3)
+
+
+class _PendingRequest:
+    """Petición enviada a un worker, esperando resultado (dueña de su slot hasta terminar)"""
+
+    def __init__(self, slot=None):
+        self.slot = slot
+        self.result = None
+        self.done = Event()
+
+
+class InferenceServer:
+    """
+    Inferencia fuera del proceso de daphne.
+    Uno o varios procesos worker cargan el modelo; los hilos de captura copian
+    los clips uint8 en slots de memoria compartida (sin pickle) y los workers
+    devuelven el resultado por una cola ligera.
+    Un supervisor reinicia los workers que mueren (OOM, segfault) y falla de
+    inmediato las peticiones que tenían; el slot de una petición se libera
+    siempre al terminar (resultado, timeout o worker muerto).
+    Misma interfaz que InferenceScheduler (predict / extract_features / predict_features).
+    Singleton.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.num_workers = max(1, int(getattr(settings, 'IA_INFERENCE_WORKERS', 1)))
+        self.num_slots = max(1, int(getattr(settings, 'IA_INFERENCE_SHM_SLOTS', 32)))
+        self.timeout = getattr(settings, 'IA_INFERENCE_TIMEOUT', 30)
+        self.supervisor_interval = getattr(settings, 'IA_INFERENCE_SUPERVISOR_INTERVAL', 1.0)
+
+        self.shm = None
+        self.slots = None
+        self.free_slots = Queue()
+        self.request_queue = None
+        self.result_queue = None
+        self.workers = []
+        self.listener = None
+        self.supervisor = None
+        self.stopping = Event()
+
+        self.pending = {}  # {request_id: _PendingRequest}, protegido por self.lock
+        self.worker_requests = {}  # {índice de worker: request_ids del batch que está procesando}
+        self.request_ids = itertools.count()
+        self.lock = Lock()
+
+        # Métricas
+        self.requests_sent = 0
+        self.results_received = 0
+        self.timeouts = 0
+        self.worker_restarts = 0
+        self.requests_lost = 0
+
+        self._initialized = True
+
+    def predict(self, frames):
+        """Clip [16, 224, 224, 3] (uint8 o normalizado [0, 1]) → dict con resultado"""
+        return self._submit('clip', frames)
+
+    def extract_features(self, frames):
+        """Frames nuevos [N, 224, 224, 3] → features [N, 576] (modo streaming)"""
+        return self._submit('frames', frames)
+
+    def predict_features(self, window):
+        """Ventana de features [16, 576] → dict con resultado (modo streaming)"""
+        return self._submit('features', window)
+
+    def get_stats(self):
+        """Métricas del servidor de inferencia"""
+        return {
+            'workers': self.num_workers,
+            'workers_alive': sum(1 for worker in self.workers if worker.is_alive()),
+            'free_slots': self.free_slots.qsize(),
+            'pending': len(self.pending),
+            'requests_sent': self.requests_sent,
+            'results_received': self.results_received,
+            'timeouts': self.timeouts,
+            'worker_restarts': self.worker_restarts,
+            'requests_lost': self.requests_lost,
+        }
+
+    def start(self):
+        """Crea la memoria compartida y lanza los procesos worker"""
+        with self.lock:
+            if self.workers:
+                return
+
+            ctx = mp.get_context('spawn')
+            slot_bytes = int(np.prod(CLIP_SHAPE))
+            self.shm = SharedMemory(create=True, size=self.num_slots * slot_bytes)
+            self.slots = np.ndarray((self.num_slots,) + CLIP_SHAPE, dtype=np.uint8, buffer=self.shm.buf)
+            self.free_slots = Queue()  # Slots de un start() anterior ya no valen
+            for slot in range(self.num_slots):
+                self.free_slots.put(slot)
+
+            self.ctx = ctx
+            self.request_queue = ctx.Queue()
+            self.result_queue = ctx.Queue()
+            self.stopping.clear()
+
+            self.workers = [self._spawn_worker(index) for index in range(self.num_workers)]
+
+            self.listener = Thread(target=self._listen_results, daemon=True)
+            self.listener.start()
+            self.supervisor = Thread(target=self._supervise, daemon=True)
+            self.supervisor.start()
+            atexit.register(self.stop)
+
+            print(f"✅ Servidor de inferencia iniciado: {self.num_workers} workers, {self.num_slots} slots")
+
+    def stop(self):
+        """Detiene los workers y libera la memoria compartida"""
+        with self.lock:
+            if not self.workers:
+                return
+
+            self.stopping.set()
+            for _ in self.workers:
+                self.request_queue.put(None)
+            for worker in self.workers:
+                worker.join(timeout=5)
+            self.workers = []
+
+            self.slots = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _submit(self, kind, payload):
+        """Envía un trabajo a los workers y bloquea hasta tener el resultado"""
+        self.start()
+
+        slot = None
+        data = None
+        if kind in ('clip', 'frames'):
+            # Frames → slot de memoria compartida (uint8, sin pickle)
+            try:
+                slot = self.free_slots.get(timeout=self.timeout)
+            except Empty:
+                print("⚠️ Sin slots libres de memoria compartida, descartando trabajo")
+                return None
+            if payload.dtype != np.uint8:
+                payload = np.clip(payload * 255.0 + 0.5, 0, 255).astype(np.uint8)
+            self.slots[slot, :len(payload)] = payload
+            data = len(payload)
+        else:
+            data = payload
+
+        request_id = next(self.request_ids)
+        request = _PendingRequest(slot)
+        with self.lock:
+            self.pending[request_id] = request
+        self.request_queue.put((request_id, kind, slot, data))
+        self.requests_sent += 1
+
+        if not request.done.wait(self.timeout):
+            if self._finish(request_id):
+                self.timeouts += 1
+                print(f"⚠️ Inferencia sin respuesta tras {self.timeout}s")
+                return None
+        return request.result
+
+    def _finish(self, request_id, result=None):
+        """
+        Saca la petición de pending, libera su slot y despierta al hilo que espera.
+        Solo la primera llamada por request_id tiene efecto (resultado, timeout o worker muerto),
+        así un slot nunca se libera dos veces.
+
+        Returns:
+            True si la petición seguía pendiente
+        """
+        with self.lock:
+            request = self.pending.pop(request_id, None)
+        if request is None:
+            return False
+
+        if request.slot is not None:
+            self.free_slots.put(request.slot)
+        request.result = result
+        request.done.set()
+        return True
+
+    def _spawn_worker(self, index):
+        worker = self.ctx.Process(
+            target=_worker_main,
+            args=(index, self.shm.name, self.num_slots, self.request_queue, self.result_queue),
+            daemon=True
+        )
+        worker.start()
+        return worker
+
+    def _supervise(self):
+        """Reinicia workers muertos y falla las peticiones que tenían en curso"""
+        while not self.stopping.wait(self.supervisor_interval):
+            lost = []
+            with self.lock:
+                if self.stopping.is_set() or not self.workers:
+                    return
+                for index, worker in enumerate(self.workers):
+                    if worker.is_alive():
+                        continue
+                    print(f"⚠️ Worker de inferencia {index} murió (exit {worker.exitcode}), reiniciando")
+                    lost.extend(self.worker_requests.pop(index, []))
+                    self.workers[index] = self._spawn_worker(index)
+                    self.worker_restarts += 1
+
+            # Lo que el worker había tomado no va a volver: liberar slots y no esperar al timeout
+            for request_id in lost:
+                if self._finish(request_id):
+                    self.requests_lost += 1
+
+    def _listen_results(self):
+        """Reparte los resultados de los workers a los hilos que esperan"""
+        while True:
+            try:
+                message = self.result_queue.get()
+            except (EOFError, OSError):
+                return
+
+            if message[0] == 'taken':
+                # El worker empezó un batch: si muere, estas peticiones se dan por perdidas
+                _, index, request_ids = message
+                with self.lock:
+                    self.worker_requests[index] = request_ids
+                continue
+
+            _, request_id, result = message
+            self.results_received += 1
+            self._finish(request_id, result)
+
+
+def _worker_main(index, shm_name, num_slots, request_queue, result_queue):
+    """Proceso worker: carga el modelo y ejecuta micro-batches desde la memoria compartida"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'visual_safety.settings')
+    import django
+    django.setup()
+
+    import torch
+    from django.conf import settings
+    from ia_detection.detector import detector
+
+    threads = getattr(settings, 'IA_INFERENCE_WORKER_THREADS', None)
+    if threads:
+        torch.set_num_threads(int(threads))
+
+    max_batch_size = max(1, int(getattr(settings, 'IA_INFERENCE_MAX_BATCH', 8)))
+    max_wait = getattr(settings, 'IA_INFERENCE_MAX_WAIT_MS', 25) / 1000.0
+
+    shm = SharedMemory(name=shm_name)
+    slots = np.ndarray((num_slots,) + CLIP_SHAPE, dtype=np.uint8, buffer=shm.buf)
+    handlers = {
+        'clip': detector.predict_batch,
+        'frames': detector.extract_features_batch,
+        'features': detector.predict_features_batch,
+    }
+
+    running = True
+    while running:
+        first = request_queue.get()
+        if first is None:
+            break
+
+        # Juntar micro-batch igual que el planificador en proceso
+        batch = [first]
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = request_queue.get(timeout=remaining)
+            except Empty:
+                break
+            if item is None:
+                running = False
+                break
+            batch.append(item)
+
+        # Avisar qué peticiones toma este worker (el supervisor las falla si muere)
+        result_queue.put(('taken', index, [item[0] for item in batch]))
+
+        by_kind = {}
+        for item in batch:
+            by_kind.setdefault(item[1], []).append(item)
+
+        for kind, items in by_kind.items():
+            payloads = []
+            for request_id, _, slot, data in items:
+                if slot is None:
+                    payloads.append(data)
+                else:
+                    # uint8 tal cual: el detector normaliza el batch completo una sola vez
+                    payloads.append(slots[slot, :data])
+
+            try:
+                results = handlers[kind](payloads)
+            except Exception as e:
+                print(f"⚠️ Error en worker de inferencia ({kind}): {e}")
+                results = [None] * len(items)
+
+            for (request_id, _, _, _), result in zip(items, results):
+                result_queue.put(('result', request_id, result))
+
+    del slots
+    shm.close()
+
+
+# Instancia global singleton (los workers arrancan con el primer trabajo)
+inference_server = InferenceServer()
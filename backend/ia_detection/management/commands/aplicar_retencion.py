@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Aplica la retención de videos de alerta (antigüedad + cuota por plan) y barre temporales huérfanos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, action='append', default=None,
+                            help='Solo este user_id (se puede repetir)')
+        parser.add_argument('--simular', action='store_true',
+                            help='Muestra qué se eliminaría sin borrar nada')
+        parser.add_argument('--indexar', action='store_true',
+                            help='Indexa antes los videos de DetectionEvent que aún no están en VideoAlerta')
+        parser.add_argument('--edad-minima-temporales', type=int, default=None,
+                            help='Segundos sin modificar para considerar huérfano un temporal')
+
+    def handle(self, *args, **options):
+        from ia_detection.retention import (
+            enforce_retention, sweep_orphans, index_existing_videos, storage_usage
+        )
+
+        if options['indexar']:
+            indexados = index_existing_videos()
+            self.stdout.write(f'📇 Videos indexados: {indexados}')
+
+        stats = enforce_retention(user_ids=options['usuario'], dry_run=options['simular'])
+        huerfanos = sweep_orphans(min_age=options['edad_minima_temporales'], dry_run=options['simular'])
+
+        prefijo = '🔍 Se eliminarían' if options['simular'] else '🗑️ Eliminados'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}: {stats['deleted']} videos ({stats['freed_bytes'] / (1024 * 1024):.1f} MB) "
+            f"de {stats['users']} usuarios, {huerfanos['deleted']} temporales "
+            f"({huerfanos['freed_bytes'] / (1024 * 1024):.1f} MB)"
+        ))
+
+        self.stdout.write(self.style.SUCCESS('\n📊 Uso de almacenamiento'))
+        for uso in storage_usage():
+            self.stdout.write(
+                f"   user {uso['user_id']}: {uso['used_mb']:.1f} / {uso['quota_mb']:.0f} MB, "
+                f"retención {uso['retention_days']} días"
+            )
@@ -0,0 +1,127 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo de codificación por frame y bytes por minuto de cada perfil de grabación'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', default=None,
+                            help='Video de muestra (.avi/.mp4); sin él se generan frames sintéticos')
+        parser.add_argument('--segundos', type=float, default=20,
+                            help='Segundos de video a codificar por perfil')
+        parser.add_argument('--fps-entrada', type=float, default=25,
+                            help='Fps de la fuente (si no se puede leer del video)')
+        parser.add_argument('--perfiles', nargs='*', type=int, default=None,
+                            help='IDs de PerfilGrabacion a medir (por defecto todos)')
+        parser.add_argument('--reporte', default=None,
+                            help='Ruta opcional para guardar el reporte en JSON')
+
+    def handle(self, *args, **options):
+        from camaras.models import PerfilGrabacion
+        from ia_detection.recording_profile import RecordingProfile
+
+        frames, fps_entrada = self._cargar_frames(options['video'], options['segundos'], options['fps_entrada'])
+        if not frames:
+            raise CommandError('No se pudieron obtener frames de muestra')
+        self.stdout.write(f'🎞️ {len(frames)} frames de {frames[0].shape[1]}x{frames[0].shape[0]} '
+                          f'a {fps_entrada:.1f} fps')
+
+        perfiles = PerfilGrabacion.objects.all()
+        if options['perfiles']:
+            perfiles = perfiles.filter(id__in=options['perfiles'])
+
+        # Referencia: lo que graba una cámara sin perfil
+        profiles = [RecordingProfile(max_fps=0)] + [RecordingProfile.from_perfil(p) for p in perfiles]
+
+        resultados = []
+        with tempfile.TemporaryDirectory() as carpeta:
+            for profile in profiles:
+                resultados.append(self._medir(profile, frames, fps_entrada, Path(carpeta)))
+
+        self._imprimir(resultados)
+
+        if options['reporte']:
+            Path(options['reporte']).write_text(json.dumps(resultados, indent=2))
+            self.stdout.write(f'📄 Reporte guardado en {options["reporte"]}')
+
+    def _cargar_frames(self, video, segundos, fps_entrada):
+        """Frames BGR de un video real o una escena sintética con movimiento"""
+        if video:
+            cap = cv2.VideoCapture(video)
+            if not cap.isOpened():
+                raise CommandError(f'No se pudo abrir {video}')
+            fps_entrada = cap.get(cv2.CAP_PROP_FPS) or fps_entrada
+            frames = []
+            while len(frames) < int(segundos * fps_entrada):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            cap.release()
+            return frames, fps_entrada
+
+        rng = np.random.default_rng(0)
+        fondo = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+        fondo = cv2.GaussianBlur(fondo, (31, 31), 0)
+        frames = []
+        for i in range(int(segundos * fps_entrada)):
+            frame = fondo.copy()
+            x = (i * 12) % 1700
+            cv2.rectangle(frame, (x, 400), (x + 220, 800), (40, 40, 200), -1)
+            frames.append(frame)
+        return frames, fps_entrada
+
+    def _medir(self, profile, frames, fps_entrada, carpeta):
+        """Codifica los frames con el perfil, igual que VideoRecorder (escala + tope de fps)"""
+        fps_salida = min(fps_entrada, profile.max_fps) if profile.max_fps else fps_entrada
+        paso = fps_entrada / fps_salida
+        seleccion = [frames[int(i * paso)] for i in range(int(len(frames) / paso))]
+
+        primer = profile.scale(seleccion[0])
+        size = (primer.shape[1], primer.shape[0])
+        ruta = carpeta / f'{profile.name}{profile.extension}'
+        writer = profile.open_writer(ruta, fps_salida, size)
+        if not writer.isOpened():
+            self.stdout.write(self.style.WARNING(f'⚠️ Códec {profile.codec} no disponible, se omite {profile.name}'))
+            return {'perfil': profile.name, 'codec': profile.codec, 'disponible': False}
+
+        tiempos = []
+        for frame in seleccion:
+            inicio = time.perf_counter()
+            writer.write(profile.scale(frame))
+            tiempos.append(time.perf_counter() - inicio)
+        writer.release()
+
+        duracion = len(seleccion) / fps_salida
+        tamano = ruta.stat().st_size
+        ms = np.array(tiempos) * 1000
+        return {
+            'perfil': profile.name,
+            'codec': profile.codec,
+            'disponible': True,
+            'resolucion': f'{size[0]}x{size[1]}',
+            'fps': fps_salida,
+            'frames': len(seleccion),
+            'encode_ms_media': float(ms.mean()),
+            'encode_ms_p95': float(np.percentile(ms, 95)),
+            'cpu_por_segundo_ms': float(ms.sum() / duracion),
+            'mb_por_minuto': tamano / duracion * 60 / (1024 * 1024),
+        }
+
+    def _imprimir(self, resultados):
+        self.stdout.write(self.style.SUCCESS('\n📊 Perfiles de grabación'))
+        for r in resultados:
+            if not r['disponible']:
+                continue
+            self.stdout.write(
+                f"   {r['perfil']:<20} {r['codec']:<5} {r['resolucion']:>10} {r['fps']:>5.1f} fps | "
+                f"encode {r['encode_ms_media']:.2f} ms/frame (p95 {r['encode_ms_p95']:.2f}) | "
+                f"{r['cpu_por_segundo_ms']:.0f} ms CPU/s | {r['mb_por_minuto']:.1f} MB/min"
+            )
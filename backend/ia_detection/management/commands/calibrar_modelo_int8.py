@@ -0,0 +1,138 @@
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Calibra y exporta el modelo de violencia INT8 usando clips grabados, y compara precisión/latencia contra fp32'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--videos', default=str(settings.MEDIA_ROOT),
+                            help='Carpeta con videos grabados (.avi/.mp4), se busca recursivamente')
+        parser.add_argument('--clips-calibracion', type=int, default=32,
+                            help='Clips de 16 frames usados para calibrar el backbone')
+        parser.add_argument('--clips-evaluacion', type=int, default=64,
+                            help='Clips de 16 frames (distintos a los de calibración) para el reporte')
+        parser.add_argument('--salida', default=str(settings.DETECTION_MODEL_INT8_PATH),
+                            help='Ruta del modelo INT8 exportado (TorchScript)')
+        parser.add_argument('--reporte', default=None,
+                            help='Ruta opcional para guardar el reporte en JSON')
+
+    def handle(self, *args, **options):
+        from ml_models.quantization import load_fp32_model, quantize_model, export_torchscript
+
+        total_clips = options['clips_calibracion'] + options['clips_evaluacion']
+        clips = self._cargar_clips(Path(options['videos']), total_clips)
+        if len(clips) < 2:
+            raise CommandError(f"No hay suficientes clips grabados en {options['videos']}")
+
+        calibracion = clips[:min(options['clips_calibracion'], len(clips) - 1)]
+        evaluacion = clips[len(calibracion):]
+        self.stdout.write(f'🎞️ Clips: {len(calibracion)} calibración, {len(evaluacion)} evaluación')
+
+        fp32_model = load_fp32_model(settings.DETECTION_MODEL_PATH)
+        int8_model = quantize_model(fp32_model, calibracion)
+
+        salida = Path(options['salida'])
+        int8_scripted = export_torchscript(int8_model, salida)
+        self.stdout.write(self.style.SUCCESS(f'✅ Modelo INT8 exportado: {salida}'))
+
+        reporte = self._comparar(fp32_model, int8_scripted, evaluacion)
+        reporte['tamano_fp32_mb'] = Path(settings.DETECTION_MODEL_PATH).stat().st_size / (1024 * 1024)
+        reporte['tamano_int8_mb'] = salida.stat().st_size / (1024 * 1024)
+        self._imprimir_reporte(reporte)
+
+        if options['reporte']:
+            Path(options['reporte']).write_text(json.dumps(reporte, indent=2))
+            self.stdout.write(f'📄 Reporte guardado en {options["reporte"]}')
+
+    def _cargar_clips(self, carpeta, max_clips):
+        """Corta los videos grabados en clips de 16 frames consecutivos preprocesados"""
+        clips = []
+        videos = sorted(list(carpeta.rglob('*.avi')) + list(carpeta.rglob('*.mp4')))
+
+        for video_path in videos:
+            cap = cv2.VideoCapture(str(video_path))
+            frames = []
+            while len(clips) < max_clips:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frame = cv2.cvtColor(cv2.resize(frame, (224, 224)), cv2.COLOR_BGR2RGB)
+                frames.append(frame.astype(np.float32) / 255.0)
+                if len(frames) == 16:
+                    clip = torch.from_numpy(np.stack(frames)).permute(0, 3, 1, 2).unsqueeze(0)
+                    clips.append(clip)
+                    frames = []
+            cap.release()
+
+            if len(clips) >= max_clips:
+                break
+
+        return clips
+
+    @torch.no_grad()
+    def _comparar(self, fp32_model, int8_model, clips):
+        """Concordancia de predicciones y latencia por clip de INT8 contra fp32"""
+        threshold = 0.9  # Mismo umbral de alerta que ViolenceDetector
+        latencias = {'fp32': [], 'int8': []}
+        coincidencias = 0
+        coincidencias_alerta = 0
+        diferencias = []
+
+        for clip in clips:
+            inicio = time.perf_counter()
+            probs_fp32 = torch.softmax(fp32_model(clip), dim=1)[0]
+            latencias['fp32'].append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            probs_int8 = torch.softmax(int8_model(clip), dim=1)[0]
+            latencias['int8'].append(time.perf_counter() - inicio)
+
+            clase_fp32 = int(probs_fp32.argmax())
+            clase_int8 = int(probs_int8.argmax())
+            alerta_fp32 = clase_fp32 > 0 and float(probs_fp32[clase_fp32]) > threshold
+            alerta_int8 = clase_int8 > 0 and float(probs_int8[clase_int8]) > threshold
+
+            coincidencias += int(clase_fp32 == clase_int8)
+            coincidencias_alerta += int(alerta_fp32 == alerta_int8)
+            diferencias.append(float((probs_fp32 - probs_int8).abs().max()))
+
+        def resumen(valores):
+            ms = np.array(valores) * 1000
+            return {'media_ms': float(ms.mean()), 'p95_ms': float(np.percentile(ms, 95))}
+
+        latencia_fp32 = resumen(latencias['fp32'])
+        latencia_int8 = resumen(latencias['int8'])
+
+        return {
+            'clips_evaluados': len(clips),
+            'concordancia_clase': coincidencias / len(clips),
+            'concordancia_alerta': coincidencias_alerta / len(clips),
+            'diferencia_prob_media': float(np.mean(diferencias)),
+            'diferencia_prob_max': float(np.max(diferencias)),
+            'latencia_fp32': latencia_fp32,
+            'latencia_int8': latencia_int8,
+            'aceleracion': latencia_fp32['media_ms'] / latencia_int8['media_ms'],
+        }
+
+    def _imprimir_reporte(self, reporte):
+        self.stdout.write(self.style.SUCCESS('\n📊 Reporte INT8 vs fp32'))
+        self.stdout.write(f"   Clips evaluados:       {reporte['clips_evaluados']}")
+        self.stdout.write(f"   Concordancia de clase: {reporte['concordancia_clase']:.1%}")
+        self.stdout.write(f"   Concordancia alertas:  {reporte['concordancia_alerta']:.1%}")
+        self.stdout.write(f"   Dif. probabilidad:     media {reporte['diferencia_prob_media']:.4f} | "
+                          f"máx {reporte['diferencia_prob_max']:.4f}")
+        self.stdout.write(f"   Latencia fp32:         {reporte['latencia_fp32']['media_ms']:.1f} ms "
+                          f"(p95 {reporte['latencia_fp32']['p95_ms']:.1f} ms)")
+        self.stdout.write(f"   Latencia int8:         {reporte['latencia_int8']['media_ms']:.1f} ms "
+                          f"(p95 {reporte['latencia_int8']['p95_ms']:.1f} ms)")
+        self.stdout.write(f"   Aceleración:           x{reporte['aceleracion']:.2f}")
+        self.stdout.write(f"   Tamaño:                {reporte['tamano_fp32_mb']:.1f} MB → "
+                          f"{reporte['tamano_int8_mb']:.1f} MB")
@@ -0,0 +1,41 @@
+import time
+from pathlib import Path
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Exporta best_model.pth a un artefacto TorchScript congelado que el detector carga sin torchvision ni red'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkpoint', default=str(settings.DETECTION_MODEL_PATH),
+                            help='Checkpoint entrenado (.pth)')
+        parser.add_argument('--salida', default=str(settings.DETECTION_MODEL_TORCHSCRIPT_PATH),
+                            help='Ruta del artefacto TorchScript')
+
+    @torch.no_grad()
+    def handle(self, *args, **options):
+        from ml_models.quantization import load_fp32_model, export_torchscript
+
+        checkpoint = Path(options['checkpoint'])
+        if not checkpoint.exists():
+            raise CommandError(f'Checkpoint no encontrado: {checkpoint}')
+
+        model = load_fp32_model(checkpoint)
+        salida = Path(options['salida'])
+        export_torchscript(model, salida)
+        self.stdout.write(self.style.SUCCESS(f'✅ Modelo exportado: {salida}'))
+
+        # Verificar que el artefacto carga solo y da los mismos números
+        inicio = time.perf_counter()
+        scripted = torch.jit.load(str(salida), map_location='cpu')
+        carga_ms = (time.perf_counter() - inicio) * 1000
+
+        clip = torch.rand(1, 16, 3, 224, 224)
+        diferencia = float((model(clip) - scripted(clip)).abs().max())
+        if diferencia > 1e-3:
+            raise CommandError(f'El artefacto no coincide con el checkpoint (dif. máx {diferencia:.6f})')
+
+        self.stdout.write(f'   Carga: {carga_ms:.0f} ms | Dif. máx logits: {diferencia:.2e}')
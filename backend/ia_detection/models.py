@@ -10,5 +10,69 @@ class DetectionEvent(models.Model):
     tipo_alerta = models.CharField(max_length=30)
     zona = models.CharField(max_length=100, null=True, blank=True)
     video_file = models.CharField(max_length=600, null=True, blank=True)
+    # Vista previa generada al disparar la alerta (frame de la alerta + tira de keyframes)
+    thumbnail_file = models.CharField(max_length=600, null=True, blank=True)
+    strip_file = models.CharField(max_length=600, null=True, blank=True)
+    # Clip indexado para retención; varias alertas unidas comparten el mismo clip
+    video = models.ForeignKey('VideoAlerta', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='detecciones')
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    #SUPABASE
\ No newline at end of file
+    #SUPABASE
+
+
+class VideoAlerta(models.Model):
+    """
+    Índice de videos de alerta en disco, para aplicar cuotas y retención
+    sin recorrer media/ en cada pasada. Un registro por clip: todos los
+    DetectionEvent unidos en él apuntan aquí (DetectionEvent.video).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    camara = models.ForeignKey(CamaraDetalles, on_delete=models.SET_NULL, null=True, blank=True)
+    ruta = models.CharField(max_length=600, unique=True)
+    # alert_key de cada alerta del clip: el outbox asocia aquí los eventos creados después de consolidar
+    claves_alerta = models.JSONField(default=list, blank=True)
+    tamano_bytes = models.BigIntegerField(default=0)
+    duracion = models.FloatField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    protegido = models.BooleanField(default=False, help_text='Los videos protegidos no se eliminan por retención')
+
+    class Meta:
+        ordering = ['fecha_creacion']
+        indexes = [models.Index(fields=['user', 'fecha_creacion'])]
+
+    def __str__(self):
+        return f"{self.ruta} ({self.tamano_bytes / (1024 * 1024):.1f} MB)"
+
+
+class AlertaPendiente(models.Model):
+    """
+    Outbox de alertas: la detección solo encola, y el dispatcher registra aquí cada
+    alerta antes de ejecutar sus efectos (evento, grabación, notificaciones).
+    Un worker reclama la fila (pendiente → en_proceso) antes de procesarla.
+    Si el proceso cae a mitad, las pendientes se retoman al arrancar.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('esperando_video', 'Esperando video'),
+        ('procesada', 'Procesada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    clave = models.CharField(max_length=32, unique=True)
+    camara_id = models.IntegerField()
+    payload = models.JSONField()
+    estado = models.CharField(max_length=16, choices=ESTADO_CHOICES, default='pendiente')
+    pasos_completados = models.JSONField(default=list)
+    detection_id = models.IntegerField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['fecha_creacion']
+        indexes = [models.Index(fields=['estado', 'fecha_creacion'])]
+
+    def __str__(self):
+        return f"Alerta {self.clave} cámara {self.camara_id} [{self.estado}]"
@@ -0,0 +1,37 @@
+# ai_detection/ml/motion_gate.py
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Pre-filtro barato de movimiento.
+    Diferencia de frames reducidos a escala de grises: si en el clip no cambia
+    una fracción mínima de píxeles, la escena está estática y no se corre el modelo.
+    """
+
+    def __init__(self, threshold=0.005, pixel_threshold=25, size=(64, 64)):
+        self.threshold = threshold  # Fracción de píxeles que deben cambiar (0-1)
+        self.pixel_threshold = pixel_threshold  # Diferencia mínima de intensidad por píxel
+        self.size = size
+        self.previous = None
+        self._gray = np.empty((size[1], size[0]), dtype=np.uint8)
+
+    def update(self, frame_rgb):
+        """Energía de movimiento del frame respecto al anterior (fracción de píxeles que cambiaron)"""
+        small = cv2.resize(frame_rgb, self.size, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(small, cv2.COLOR_RGB2GRAY, dst=self._gray)
+        gray = cv2.GaussianBlur(self._gray, (5, 5), 0)
+
+        if self.previous is None:
+            self.previous = gray
+            return 0.0
+
+        diff = cv2.absdiff(gray, self.previous)
+        self.previous = gray
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def has_motion(self, motion_scores):
+        """Hay movimiento si algún frame del clip supera el umbral"""
+        return len(motion_scores) > 0 and float(np.max(motion_scores)) >= self.threshold
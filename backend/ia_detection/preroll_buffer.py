@@ -0,0 +1,51 @@
+# ai_detection/ml/preroll_buffer.py
+
+import cv2
+from collections import deque
+
+
+class PreRollBuffer:
+    """
+    Pre-roll en memoria: últimos N segundos de la cámara como JPEG.
+    Acotado por duración y por memoria; no escribe nada a disco hasta una alerta.
+    """
+
+    def __init__(self, seconds=10, max_bytes=64 * 1024 * 1024, jpeg_quality=80):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+        self.frames = deque()  # (timestamp, jpeg bytes)
+        self.total_bytes = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def add(self, frame, timestamp):
+        """Comprime el frame y descarta los más viejos que excedan tiempo o memoria"""
+        ok, encoded = cv2.imencode('.jpg', frame, self.encode_params)
+        if not ok:
+            return
+
+        data = encoded.tobytes()
+        self.frames.append((timestamp, data))
+        self.total_bytes += len(data)
+
+        while self.frames and (
+            timestamp - self.frames[0][0] > self.seconds or self.total_bytes > self.max_bytes
+        ):
+            _, oldest = self.frames.popleft()
+            self.total_bytes -= len(oldest)
+
+    def snapshot(self):
+        """Copia de los frames actuales, del más viejo al más reciente"""
+        return list(self.frames)
+
+    def duration(self):
+        """Segundos que cubre el pre-roll actual"""
+        if len(self.frames) < 2:
+            return 0.0
+        return self.frames[-1][0] - self.frames[0][0]
+
+    def clear(self):
+        self.frames.clear()
+        self.total_bytes = 0
@@ -0,0 +1,126 @@
+# ai_detection/range_response.py
+
+import os
+import re
+import mimetypes
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+mimetypes.add_type('video/x-msvideo', '.avi')
+mimetypes.add_type('text/vtt', '.vtt')
+
+
+def range_file_response(request, file_path, content_type=None, max_age=3600):
+    """
+    Sirve un archivo del disco con soporte de:
+      - Range (una sola parte): 206 Partial Content / 416 si no es satisfacible
+      - ETag / Last-Modified: 304 en GET condicionales (If-None-Match, If-Modified-Since)
+      - If-Range: si el archivo cambió, se ignora el Range y va completo
+    El contenido se lee del disco por bloques, nunca completo en memoria.
+    """
+    stat = os.stat(file_path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = http_date(stat.st_mtime)
+    content_type = content_type or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponse(status=304)
+        _set_cache_headers(response, etag, last_modified, max_age)
+        return response
+
+    byte_range = _parse_range(request, size, etag, stat.st_mtime)
+
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        _set_cache_headers(response, etag, last_modified, max_age)
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+        response.block_size = CHUNK_SIZE
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_chunks(file_path, start, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+
+    _set_cache_headers(response, etag, last_modified, max_age)
+    return response
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _parse_range(request, size, etag, mtime):
+    """(inicio, fin) inclusivos, None = archivo completo, 'invalid' = 416"""
+    header = request.headers.get('Range')
+    if not header:
+        return None
+
+    # If-Range: solo respetar el Range si el cliente tiene la misma versión
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if if_range != etag:
+                return None
+        else:
+            since = parse_http_date_safe(if_range)
+            if since is None or int(mtime) > since:
+                return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Rangos múltiples o unidades desconocidas: se responde completo
+        return None
+
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        # Sufijo: últimos N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            # Un archivo vacío no tiene ningún byte que servir: bytes */0
+            return 'invalid'
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return 'invalid'
+    return start, min(end, size - 1)
+
+
+def _read_chunks(file_path, offset, length):
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _set_cache_headers(response, etag, last_modified, max_age):
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = f'private, max-age={max_age}'
@@ -0,0 +1,59 @@
+# ai_detection/ml/recording_profile.py
+
+import cv2
+from django.conf import settings
+from camaras.models import PerfilGrabacion
+
+
+class RecordingProfile:
+    """
+    Cómo escribe un VideoRecorder sus frames: escala, tope de fps, códec y calidad.
+    Se construye desde el PerfilGrabacion de la cámara o, si no tiene, con los valores globales.
+    """
+
+    def __init__(self, name='nativo', max_height=None, max_fps=None, codec='XVID', quality=None):
+        self.name = name
+        self.max_height = max_height
+        self.max_fps = float(max_fps if max_fps is not None else getattr(settings, 'IA_RECORDING_MAX_FPS', 0) or 0)
+        self.codec = codec
+        self.extension = PerfilGrabacion.EXTENSIONES.get(codec, '.avi')
+        self.quality = quality
+
+    @classmethod
+    def from_perfil(cls, perfil):
+        """PerfilGrabacion (o None) → RecordingProfile"""
+        if perfil is None:
+            return cls()
+        return cls(
+            name=perfil.nombre,
+            max_height=perfil.altura_maxima,
+            max_fps=perfil.fps_maximo,
+            codec=perfil.codec,
+            quality=perfil.calidad
+        )
+
+    def scale(self, frame):
+        """Reduce el frame al alto máximo del perfil (nunca lo agranda)"""
+        height, width = frame.shape[:2]
+        if not self.max_height or height <= self.max_height:
+            return frame
+        new_width = int(round(width * self.max_height / height)) // 2 * 2  # Los códecs piden dimensiones pares
+        return cv2.resize(frame, (new_width, self.max_height), interpolation=cv2.INTER_AREA)
+
+    def open_writer(self, path, fps, frame_size):
+        """VideoWriter con el códec y la calidad del perfil"""
+        fourcc = cv2.VideoWriter_fourcc(*self.codec)
+        writer = cv2.VideoWriter(str(path), fourcc, fps, frame_size)
+        if self.quality and writer.isOpened():
+            writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.quality)
+        return writer
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'max_height': self.max_height,
+            'max_fps': self.max_fps,
+            'codec': self.codec,
+            'extension': self.extension,
+            'quality': self.quality,
+        }
@@ -0,0 +1,224 @@
+# ai_detection/ml/retention.py
+
+import time
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+
+# Restos de grabaciones interrumpidas (segmentos, consolidaciones a medias, listas de ffmpeg)
+TEMP_PATTERNS = ('temp_cam*', 'temp_final_*', 'temp_preroll_*', 'temp_concat_*')
+SIDECAR_SUFFIXES = ('.json', '.vtt')
+
+
+def recording_dir():
+    """Carpeta raíz donde los VideoRecorder escriben los videos"""
+    return Path(getattr(settings, 'IA_RECORDING_DIR', 'media'))
+
+
+def register_video(video_path, camera_id, detection_ids=None, duration=0, alert_keys=None):
+    """
+    Indexa un video de alerta recién consolidado (una sola vez, aunque reúna
+    varias alertas), lo asocia a todos sus DetectionEvent y aplica la cuota de su dueño.
+    Se llama desde el worker de consolidación (nunca desde el hilo de captura).
+    """
+    from camaras.models import CamaraDetalles
+    from .models import VideoAlerta
+
+    video_path = Path(video_path)
+    camara = CamaraDetalles.objects.select_related('camara').filter(id=camera_id).first()
+    user_id = camara.camara.user_id if camara else None
+
+    video, _ = VideoAlerta.objects.update_or_create(
+        ruta=str(video_path),
+        defaults={
+            'user_id': user_id,
+            'camara': camara,
+            'tamano_bytes': _size_with_sidecars(video_path),
+            'duracion': duration,
+            'claves_alerta': list(alert_keys or []),
+        }
+    )
+    link_detections(video, detection_ids)
+
+    if user_id:
+        enforce_retention(user_ids=[user_id])
+    return video
+
+
+def link_detections(video, detection_ids):
+    """Asocia DetectionEvent a un clip ya indexado (un solo UPDATE)"""
+    from .models import DetectionEvent
+
+    detection_ids = [d for d in (detection_ids or []) if d]
+    if not detection_ids:
+        return 0
+    return DetectionEvent.objects.filter(id__in=detection_ids).update(video=video, video_file=video.ruta)
+
+
+def get_quota(user_id):
+    """(bytes máximos, días de retención) según el plan activo del usuario"""
+    from suscripcion.models import Suscripcion
+
+    max_mb = getattr(settings, 'IA_RETENTION_DEFAULT_MB', 5120)
+    max_days = getattr(settings, 'IA_RETENTION_DEFAULT_DAYS', 30)
+
+    suscripcion = (Suscripcion.objects.filter(user_id=user_id, activa=True)
+                   .select_related('plan_id').order_by('-fecha_fin').first())
+    if suscripcion:
+        plan = suscripcion.plan_id
+        if plan.almacenamiento_mb is not None:
+            max_mb = plan.almacenamiento_mb
+        if plan.retencion_dias is not None:
+            max_days = plan.retencion_dias
+
+    return int(max_mb * 1024 * 1024), max_days
+
+
+def enforce_retention(user_ids=None, dry_run=False):
+    """
+    Elimina videos de alerta vencidos (por antigüedad) y, si un usuario sigue
+    sobre su cuota, los más viejos hasta quedar dentro. Los protegidos no se tocan.
+
+    Returns:
+        dict con videos y bytes liberados
+    """
+    from .models import VideoAlerta
+
+    if user_ids is None:
+        user_ids = (VideoAlerta.objects.exclude(user_id=None)
+                    .order_by().values_list('user_id', flat=True).distinct())
+
+    stats = {'users': 0, 'deleted': 0, 'freed_bytes': 0}
+
+    for user_id in user_ids:
+        max_bytes, max_days = get_quota(user_id)
+        cutoff = timezone.now() - timedelta(days=max_days)
+        stats['users'] += 1
+
+        # Los protegidos cuentan para la cuota pero nunca se eliminan
+        used = (VideoAlerta.objects.filter(user_id=user_id)
+                .aggregate(total=Sum('tamano_bytes'))['total'] or 0)
+
+        # Del más viejo al más nuevo: primero los vencidos, luego hasta quedar dentro de la cuota
+        videos = VideoAlerta.objects.filter(user_id=user_id, protegido=False).order_by('fecha_creacion')
+        for video in videos.iterator():
+            if video.fecha_creacion >= cutoff and used <= max_bytes:
+                break
+            used -= video.tamano_bytes
+            _evict(video, stats, dry_run)
+
+    if stats['deleted']:
+        print(f"🗑️ Retención: {stats['deleted']} videos eliminados "
+              f"({stats['freed_bytes'] / (1024 * 1024):.1f} MB liberados)")
+    return stats
+
+
+def _evict(video, stats, dry_run):
+    """Borra el archivo, sus sidecars y desasocia sus DetectionEvent"""
+    from django.db.models import Q
+    from .models import DetectionEvent
+
+    stats['deleted'] += 1
+    stats['freed_bytes'] += video.tamano_bytes
+    if dry_run:
+        return
+
+    path = Path(video.ruta)
+    for file_path in [path] + [path.with_suffix(suffix) for suffix in SIDECAR_SUFFIXES]:
+        try:
+            file_path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"⚠️ No se pudo eliminar {file_path}: {e}")
+
+    # Un clip puede estar asociado a varios eventos (alertas unidas); por ruta los previos al índice
+    DetectionEvent.objects.filter(Q(video=video) | Q(video_file=video.ruta)).update(video=None, video_file=None)
+    video.delete()
+
+
+def sweep_orphans(min_age=None, dry_run=False):
+    """
+    Elimina temporales de grabación abandonados (p. ej. tras un crash).
+    Solo toca archivos sin modificar hace más de min_age segundos, para no pisar
+    segmentos de un proceso que siga grabando.
+    """
+    if min_age is None:
+        min_age = getattr(settings, 'IA_RETENTION_ORPHAN_MIN_AGE', 3600)
+
+    root = recording_dir()
+    if not root.exists():
+        return {'deleted': 0, 'freed_bytes': 0}
+
+    cutoff = time.time() - min_age
+    stats = {'deleted': 0, 'freed_bytes': 0}
+
+    for pattern in TEMP_PATTERNS:
+        for file_path in root.rglob(pattern):
+            try:
+                info = file_path.stat()
+                if not file_path.is_file() or info.st_mtime > cutoff:
+                    continue
+                if not dry_run:
+                    file_path.unlink()
+                stats['deleted'] += 1
+                stats['freed_bytes'] += info.st_size
+            except OSError as e:
+                print(f"⚠️ No se pudo eliminar {file_path}: {e}")
+
+    if stats['deleted']:
+        print(f"🧹 Temporales huérfanos eliminados: {stats['deleted']} "
+              f"({stats['freed_bytes'] / (1024 * 1024):.1f} MB)")
+    return stats
+
+
+def index_existing_videos():
+    """Indexa videos de alerta previos al índice (DetectionEvent con video y sin VideoAlerta)"""
+    from .models import DetectionEvent, VideoAlerta
+
+    indexed = 0
+    events = (DetectionEvent.objects.exclude(video_file=None).exclude(video_file='')
+              .filter(video__isnull=True).select_related('camara_id__camara'))
+    for event in events.iterator():
+        path = Path(event.video_file)
+        if not path.exists():
+            continue
+        # Un registro por clip aunque varios eventos lo compartan
+        video, created = VideoAlerta.objects.get_or_create(
+            ruta=str(path),
+            defaults={
+                'user_id': event.camara_id.camara.user_id,
+                'camara': event.camara_id,
+                'tamano_bytes': _size_with_sidecars(path),
+            }
+        )
+        DetectionEvent.objects.filter(id=event.id).update(video=video)
+        indexed += int(created)
+    return indexed
+
+
+def storage_usage():
+    """Uso de disco de videos de alerta por usuario, contra su cuota"""
+    from .models import VideoAlerta
+
+    usage = []
+    rows = (VideoAlerta.objects.exclude(user_id=None).values('user_id')
+            .annotate(total=Sum('tamano_bytes')).order_by('user_id'))
+    for row in rows:
+        max_bytes, max_days = get_quota(row['user_id'])
+        usage.append({
+            'user_id': row['user_id'],
+            'used_mb': row['total'] / (1024 * 1024),
+            'quota_mb': max_bytes / (1024 * 1024),
+            'retention_days': max_days,
+        })
+    return usage
+
+
+def _size_with_sidecars(video_path):
+    total = 0
+    for file_path in [video_path] + [video_path.with_suffix(s) for s in SIDECAR_SUFFIXES]:
+        if file_path.exists():
+            total += file_path.stat().st_size
+    return total
@@ -1,9 +1,23 @@
 from rest_framework import serializers
+from django.urls import reverse
 from .models import DetectionEvent
 
 
 class DetectionEventSerializer(serializers.ModelSerializer):
     """Serializer para el modelo DetectionEvent."""
+    thumbnail_url = serializers.SerializerMethodField()
+    strip_url = serializers.SerializerMethodField()
+
     class Meta:
         model = DetectionEvent
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    def get_thumbnail_url(self, obj):
+        if not obj.thumbnail_file:
+            return None
+        return reverse('detection_events-thumbnail', args=[obj.id])
+
+    def get_strip_url(self, obj):
+        if not obj.strip_file:
+            return None
+        return reverse('detection_events-thumbnail', args=[obj.id]) + '?tipo=strip'
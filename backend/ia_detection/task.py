@@ -1,6 +1,29 @@
 # ai_detection/tasks.py
 
-# from celery import shared_task
+from celery import shared_task
+
+
+@shared_task
+def consolidate_video_task(job):
+    """
+    Consolida el video de una alerta en el worker de Celery
+    (IA_CONSOLIDATION_BACKEND = 'celery'). Requiere que media/ sea compartido.
+    """
+    from .video_consolidation import consolidate_video
+    return consolidate_video(job)
+
+
+@shared_task
+def enforce_retention_task():
+    """
+    Retención periódica de videos de alerta (antigüedad + cuota por plan)
+    y barrido de temporales huérfanos.
+    """
+    from .retention import enforce_retention, sweep_orphans
+    stats = enforce_retention()
+    stats['orphans'] = sweep_orphans()
+    return stats
+
 
 # @shared_task
 # def process_alert_task(detection_id):
@@ -15,9 +38,5 @@
 #     # Enviar email (tarda 1-2 seg)
 #     send_email_alert(detection)
     
-#     # Consolidar video (tarda 30 seg)
-#     if detection.video_file:
-#         consolidate_video(detection)
-    
 #     # Generar reporte
 #     generate_report(detection)
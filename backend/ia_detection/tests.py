@@ -1,3 +1,388 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+import numpy as np
+import torch
+
+from ml_models.train_model import VideoClassifier
+from .alert_outbox import AlertOutbox
+from .frame_buffer import ClipRingBuffer
+from .models import AlertaPendiente, VideoAlerta
+from .range_response import range_file_response
+from .retention import enforce_retention
+
+
+class VideoClassifierForwardTests(SimpleTestCase):
+    """El forward en un solo batch debe dar lo mismo que el loop por frame."""
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = VideoClassifier(num_classes=3, pretrained=False)
+        self.model.eval()
+
+    @torch.no_grad()
+    def test_single_pass_features_match_per_frame_loop(self):
+        x = torch.rand(2, 16, 3, 224, 224)
+
+        batched = self.model.extract_features(x)
+        looped = self.model._extract_features_per_frame(x)
+
+        self.assertEqual(batched.shape, (2, 16, 576))
+        self.assertTrue(torch.allclose(batched, looped, atol=1e-5))
+
+    @torch.no_grad()
+    def test_single_pass_logits_match_per_frame_loop(self):
+        x = torch.rand(2, 16, 3, 224, 224)
+
+        logits = self.model(x)
+        expected = self.model.classify_features(self.model._extract_features_per_frame(x))
+
+        self.assertTrue(torch.allclose(logits, expected, atol=1e-5))
+
+
+def nuevo_outbox():
+    """Instancia aparte del singleton global, sin workers"""
+    outbox = object.__new__(AlertOutbox)
+    outbox._initialized = False
+    outbox.__init__()
+    return outbox
+
+
+def alerta(clave='a' * 32, notify=True):
+    return {'alert_key': clave, 'camera_id': 1, 'camera_ip': '10.0.0.1',
+            'result': {'class_name': 'violencia', 'confidence': 0.9}, 'notify': notify,
+            'submitted_at': 0.0}
+
+
+@mock.patch('ia_detection.alert_outbox.deliver_notifications')
+@mock.patch('ia_detection.alert_outbox.create_notifications', return_value=[])
+@mock.patch('ia_detection.alert_outbox.attach_to_recording', return_value=True)
+@mock.patch('ia_detection.alert_outbox.save_detection', return_value=7)
+class AlertOutboxStepsTests(TestCase):
+    """Cada paso de la alerta se ejecuta una sola vez, aunque la alerta se procese de nuevo."""
+
+    def test_completed_steps_are_not_repeated(self, save_detection, attach, create, deliver):
+        AlertaPendiente.objects.create(clave='a' * 32, camara_id=1, payload=alerta(), estado='pendiente',
+                                       pasos_completados=['deteccion'], detection_id=5)
+
+        nuevo_outbox()._process(alerta())
+
+        save_detection.assert_not_called()
+        attach.assert_called_once()
+        self.assertEqual(attach.call_args.args[1], 5)
+        outbox = AlertaPendiente.objects.get()
+        self.assertEqual(outbox.estado, 'procesada')
+        self.assertEqual(outbox.pasos_completados, ['deteccion', 'grabacion', 'notificaciones'])
+
+    def test_processed_alert_is_not_claimed_again(self, save_detection, attach, create, deliver):
+        outbox = nuevo_outbox()
+        outbox._process(alerta())
+        outbox._process(alerta())
+
+        save_detection.assert_called_once()
+        create.assert_called_once()
+        self.assertEqual(outbox.processed, 1)
+        self.assertEqual(AlertaPendiente.objects.get().estado, 'procesada')
+
+    def test_waiting_video_keeps_recording_step_open(self, save_detection, attach, create, deliver):
+        attach.return_value = False
+
+        nuevo_outbox()._process(alerta())
+
+        outbox = AlertaPendiente.objects.get()
+        self.assertEqual(outbox.estado, 'esperando_video')
+        self.assertEqual(outbox.pasos_completados, ['deteccion', 'notificaciones'])
+
+
+@override_settings(IA_ALERT_OUTBOX_MAX_RETRIES=3, IA_ALERT_OUTBOX_RETRY_DELAY=1.0,
+                   IA_ALERT_OUTBOX_MAX_RETRY_DELAY=3.0)
+@mock.patch('ia_detection.alert_outbox.Timer')
+@mock.patch('ia_detection.alert_outbox.save_detection', side_effect=RuntimeError('BD caída'))
+class AlertOutboxRetryTests(TestCase):
+    """Los fallos se reintentan con backoff acotado hasta marcar la alerta 'fallida'."""
+
+    def test_retries_until_failed(self, save_detection, timer):
+        outbox = nuevo_outbox()
+        record = alerta()
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError) as error:
+                outbox._process(record)
+            outbox._retry_later(record, error.exception)
+            self.assertEqual(AlertaPendiente.objects.get().estado, 'pendiente')
+
+        outbox._process(record)
+
+        fila = AlertaPendiente.objects.get()
+        self.assertEqual(fila.estado, 'fallida')
+        self.assertEqual(fila.intentos, 3)
+        self.assertIn('BD caída', fila.ultimo_error)
+        self.assertEqual(outbox.failed, 1)
+        self.assertEqual(save_detection.call_count, 3)
+        self.assertEqual([c.args[0] for c in timer.call_args_list], [1.0, 2.0])
+
+    def test_backoff_is_capped(self, save_detection, timer):
+        outbox = nuevo_outbox()
+        record = dict(alerta(), _persisted=True)
+
+        for _ in range(4):
+            outbox._retry_later(record, RuntimeError('BD caída'))
+
+        self.assertEqual([c.args[0] for c in timer.call_args_list], [1.0, 2.0, 3.0, 3.0])
+
+
+@override_settings(IA_ALERT_OUTBOX_RECOVERY_AGE=600)
+class AlertOutboxRecoveryTests(TestCase):
+    """Al arrancar se retoman el spool y las filas viejas a medias, no las recientes."""
+
+    def setUp(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.outbox = nuevo_outbox()
+        self.outbox.spool_dir = Path(spool.name)
+
+    def fila(self, clave, estado, edad):
+        AlertaPendiente.objects.create(clave=clave, camara_id=1, payload=alerta(clave), estado=estado)
+        AlertaPendiente.objects.filter(clave=clave).update(
+            fecha_actualizacion=timezone.now() - timedelta(seconds=edad))
+
+    def test_old_rows_and_spool_are_requeued(self):
+        self.fila('b' * 32, 'pendiente', 3600)
+        self.fila('c' * 32, 'en_proceso', 3600)
+        self.fila('d' * 32, 'pendiente', 10)
+        self.fila('e' * 32, 'en_proceso', 10)
+        self.fila('f' * 32, 'procesada', 3600)
+        (self.outbox.spool_dir / f"{'g' * 32}.json").write_text(json.dumps(alerta('g' * 32)))
+
+        self.outbox._recover_pending()
+
+        requeued = {}
+        while not self.outbox.queue.empty():
+            record = self.outbox.queue.get_nowait()
+            requeued[record['alert_key']] = record
+        self.assertEqual(set(requeued), {'b' * 32, 'c' * 32, 'g' * 32})
+        self.assertTrue(all(record['recovered'] for record in requeued.values()))
+        self.assertTrue(requeued['b' * 32]['_persisted'])
+        self.assertNotIn('_persisted', requeued['g' * 32])
+        self.assertEqual(AlertaPendiente.objects.get(clave='c' * 32).estado, 'pendiente')
+        self.assertEqual(AlertaPendiente.objects.get(clave='e' * 32).estado, 'en_proceso')
+        self.assertEqual(self.outbox.recovered, 3)
+
+    @mock.patch('ia_detection.alert_outbox.finish_waiting_alert')
+    def test_old_waiting_alerts_are_closed(self, finish):
+        self.fila('h' * 32, 'esperando_video', 3600)
+        self.fila('i' * 32, 'esperando_video', 10)
+
+        self.outbox._recover_pending()
+
+        finish.assert_called_once_with('h' * 32, give_up=True)
+
+
+@override_settings(IA_RETENTION_DEFAULT_MB=1, IA_RETENTION_DEFAULT_DAYS=30)
+class EnforceRetentionTests(TestCase):
+    """Retención: vencidos y exceso de cuota, del más viejo al más nuevo, sin tocar los protegidos."""
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        self.user = get_user_model().objects.create_user(username='empresa', password='x')
+
+    def video(self, nombre, dias, protegido=False, tamano=300 * 1024):
+        ruta = self.carpeta / f'{nombre}.mp4'
+        ruta.write_bytes(b'0')
+        ruta.with_suffix('.json').write_text('{}')
+        video = VideoAlerta.objects.create(user=self.user, ruta=str(ruta), tamano_bytes=tamano, protegido=protegido)
+        VideoAlerta.objects.filter(id=video.id).update(fecha_creacion=timezone.now() - timedelta(days=dias))
+        return ruta
+
+    def test_oldest_first_by_age_then_quota(self):
+        protegido = self.video('protegido', 40, protegido=True)
+        vencido = self.video('vencido', 35)
+        sobre_cuota = self.video('sobre_cuota', 10)
+        self.video('reciente', 5)
+        self.video('nuevo', 1)
+
+        stats = enforce_retention(user_ids=[self.user.id])
+
+        # 5 × 300 KB = 1.5 MB: el vencido cae por antigüedad y el siguiente para volver bajo 1 MB
+        self.assertEqual(stats['deleted'], 2)
+        self.assertEqual(stats['freed_bytes'], 2 * 300 * 1024)
+        self.assertEqual(sorted(Path(r).stem for r in VideoAlerta.objects.values_list('ruta', flat=True)),
+                         ['nuevo', 'protegido', 'reciente'])
+        self.assertFalse(vencido.exists())
+        self.assertFalse(vencido.with_suffix('.json').exists())
+        self.assertFalse(sobre_cuota.exists())
+        self.assertTrue(protegido.exists())
+
+    def test_protected_videos_are_never_evicted(self):
+        self.video('protegido_1', 90, protegido=True, tamano=2 * 1024 * 1024)
+        self.video('protegido_2', 60, protegido=True)
+
+        stats = enforce_retention(user_ids=[self.user.id])
+
+        self.assertEqual(stats['deleted'], 0)
+        self.assertEqual(VideoAlerta.objects.count(), 2)
+
+    def test_dry_run_keeps_files(self):
+        vencido = self.video('vencido', 35)
+
+        stats = enforce_retention(user_ids=[self.user.id], dry_run=True)
+
+        self.assertEqual(stats['deleted'], 1)
+        self.assertTrue(vencido.exists())
+        self.assertEqual(VideoAlerta.objects.count(), 1)
+
+
+class RangeFileResponseTests(SimpleTestCase):
+    """Range, If-Range y GET condicionales al servir videos desde disco."""
+
+    contenido = bytes(range(256)) * 4
+
+    def setUp(self):
+        archivo = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        archivo.write(self.contenido)
+        archivo.close()
+        self.ruta = archivo.name
+        self.addCleanup(os.unlink, self.ruta)
+        self.factory = RequestFactory()
+
+    def servir(self, ruta=None, **headers):
+        response = range_file_response(self.factory.get('/video', **headers), ruta or self.ruta)
+        self.addCleanup(response.close)
+        return response
+
+    def cuerpo(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_open_ended_range_serves_until_eof(self):
+        response = self.servir(HTTP_RANGE='bytes=0-')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 0-1023/1024')
+        self.assertEqual(self.cuerpo(response), self.contenido)
+
+    def test_suffix_range_serves_last_bytes(self):
+        response = self.servir(HTTP_RANGE='bytes=-100')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 924-1023/1024')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.cuerpo(response), self.contenido[-100:])
+
+    def test_start_past_eof_is_not_satisfiable(self):
+        response = self.servir(HTTP_RANGE='bytes=2048-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_multi_range_serves_whole_file(self):
+        response = self.servir(HTTP_RANGE='bytes=0-9,20-29')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Range', response)
+        self.assertEqual(self.cuerpo(response), self.contenido)
+
+    def test_stale_if_range_serves_whole_file(self):
+        response = self.servir(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"viejo-400"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cuerpo(response), self.contenido)
+
+    def test_matching_if_range_honours_range(self):
+        etag = self.servir()['ETag']
+
+        response = self.servir(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.cuerpo(response), self.contenido[:10])
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.servir()['ETag']
+
+        response = self.servir(HTTP_IF_NONE_MATCH=etag, HTTP_RANGE='bytes=0-9')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_suffix_range_on_empty_file_is_not_satisfiable(self):
+        vacio = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        vacio.close()
+        self.addCleanup(os.unlink, vacio.name)
+
+        response = self.servir(vacio.name, HTTP_RANGE='bytes=-100')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+
+class MotionGateFalso:
+    """Energía de movimiento = valor del frame, para comprobar que queda en su slot"""
+
+    def update(self, frame):
+        return float(frame[0, 0, 0])
+
+
+class ClipRingBufferTests(SimpleTestCase):
+    """Orden temporal al dar la vuelta, datos por frame alineados y contador total."""
+
+    def setUp(self):
+        self.buffer = ClipRingBuffer(size=4, height=8, width=8)
+
+    def push(self, *valores):
+        for valor in valores:
+            self.buffer.push(np.full((16, 16, 3), valor, dtype=np.uint8), timestamp=100.0 + valor,
+                             motion_gate=MotionGateFalso())
+
+    def valores(self, frames):
+        return [int(frame[0, 0, 0]) for frame in frames]
+
+    def test_wraparound_keeps_temporal_order(self):
+        self.push(1, 2, 3, 4, 5, 6, 7)
+
+        self.assertTrue(self.buffer.is_full())
+        self.assertEqual(self.valores(self.buffer.clip()), [4, 5, 6, 7])
+        self.assertEqual(self.valores(self.buffer.latest(2)), [6, 7])
+        self.assertEqual(self.valores(self.buffer.latest(10)), [4, 5, 6, 7])
+
+    def test_partial_buffer_returns_only_pushed_frames(self):
+        self.push(1, 2)
+
+        self.assertEqual(len(self.buffer), 2)
+        self.assertEqual(self.valores(self.buffer.clip()), [1, 2])
+
+    def test_timestamps_and_motion_follow_their_frames(self):
+        self.push(1, 2, 3, 4, 5, 6)
+
+        frames = self.valores(self.buffer.latest(4))
+        indices = (self.buffer.index - 4 + np.arange(4)) % self.buffer.size
+        self.assertEqual(self.buffer.latest_motion(4).tolist(), [float(v) for v in frames])
+        self.assertEqual(self.buffer.timestamps[indices].tolist(), [100.0 + v for v in frames])
+        self.assertEqual(self.buffer.latest_timestamp(), 106.0)
+
+    def test_total_counts_frames_past_capacity(self):
+        self.push(1, 2, 3)
+        visto = self.buffer.total
+        self.push(4, 5, 6, 7, 8, 9)
+
+        # Los consumidores calculan frames nuevos (y descartados) como total - último total visto
+        self.assertEqual(self.buffer.total - visto, 6)
+        self.assertEqual(self.buffer.total, 9)
+        self.assertEqual(len(self.buffer), 4)
+
+    def test_clear_keeps_total(self):
+        self.push(1, 2, 3, 4, 5)
+        self.buffer.clear()
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.latest_timestamp(), 0.0)
+        self.assertEqual(self.buffer.total, 5)
+        self.push(6)
+        self.assertEqual(self.valores(self.buffer.clip()), [6])
@@ -0,0 +1,454 @@
+# ai_detection/ml/video_consolidation.py
+
+import json
+import time
+import base64
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from django.conf import settings
+
+
+# Pool compartido por todos los recorders: la consolidación nunca corre en el hilo de captura
+consolidation_pool = ThreadPoolExecutor(
+    max_workers=max(1, int(getattr(settings, 'IA_CONSOLIDATION_WORKERS', 2))),
+    thread_name_prefix='consolidacion'
+)
+
+# Diferencia relativa de fps entre segmentos que aún se une sin recodificar
+# (fps medidos que solo varían en decimales: deriva de pocos frames por minuto)
+FPS_TOLERANCE = 0.01
+
+
+def submit_consolidation(job):
+    """
+    Encola la consolidación de un video de alerta y retorna de inmediato.
+    IA_CONSOLIDATION_BACKEND: 'thread' (pool local) o 'celery' (worker de Celery).
+
+    Args:
+        job: dict serializable (ver VideoRecorder._build_consolidation_job)
+    """
+    if getattr(settings, 'IA_CONSOLIDATION_BACKEND', 'thread') == 'celery':
+        from .task import consolidate_video_task
+        # Los JPEG del pre-roll viajan en base64 (el broker serializa en JSON)
+        job = dict(job, before_frames=[
+            base64.b64encode(jpeg).decode('ascii') for jpeg in job.get('before_frames', [])
+        ])
+        return consolidate_video_task.delay(job)
+
+    future = consolidation_pool.submit(consolidate_video, job)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error:
+        print(f"❌ Error consolidando video: {error}")
+
+
+def consolidate_video(job):
+    """
+    Consolida todos los segmentos en un solo video final.
+    IA_CONSOLIDATION_MODE:
+      - 'reencode': decodifica, dibuja el overlay y vuelve a codificar cada frame
+      - 'copy': une los segmentos a nivel contenedor con ffmpeg (-c copy), sin recodificar;
+        el overlay ANTES/ALERTA/DESPUES va en los sidecars .vtt / .json
+    Si la copia falla (ffmpeg ausente, segmentos incompatibles) se recodifica.
+    """
+    print(f"\n💾 Consolidando video de alerta (cámara {job['camera_id']})...")
+
+    output_dir = Path(job['output_dir'])
+    alert_info = job['alert_info']
+
+    timestamp_str = time.strftime('%Y%m%d_%H%M%S',
+                                  time.localtime(alert_info['timestamp']))
+    alert_type_clean = alert_info['type'].replace(' ', '_')
+    profile = job.get('profile') or {}
+    extension = profile.get('extension', '.avi')
+    filename = f"cam{job['camera_id']}_{alert_type_clean}_{timestamp_str}{extension}"
+    output_path = output_dir / filename
+    temp_output = output_dir / f"temp_final_{job['camera_id']}_{timestamp_str}{extension}"
+
+    all_segment_paths = [Path(p) for p in job['segment_paths']]
+
+    print(f"   Before segments: {job['before_count']}")
+    print(f"   After segments: {len(all_segment_paths) - job['before_count']}")
+    print(f"   Total: {len(all_segment_paths)} segmentos")
+
+    total_frames = None
+    if getattr(settings, 'IA_CONSOLIDATION_MODE', 'reencode') == 'copy':
+        total_frames = _stream_copy(job, all_segment_paths, temp_output)
+        if total_frames is None:
+            print("⚠️ Copia de segmentos falló, recodificando...")
+    if total_frames is None:
+        total_frames = _reencode(job, all_segment_paths, temp_output)
+
+    if total_frames is None:
+        cleanup_temp_files(all_segment_paths + [temp_output])
+        return None
+
+    if temp_output.exists():
+        temp_output.rename(output_path)
+
+    if output_path.exists():
+        duration = _clip_duration(job, total_frames)
+        file_size = output_path.stat().st_size / (1024 * 1024)
+
+        print(f"\n✅ Video consolidado:")
+        print(f"   Archivo: {output_path.name}")
+        print(f"   Duración: {duration:.1f}s ({duration/60:.1f} min)")
+        print(f"   Frames: {total_frames}")
+        print(f"   Tamaño: {file_size:.1f} MB")
+
+        _resolve_detection_ids(alert_info)
+        write_timeline(output_path, job, total_frames)
+
+        # Indexar el clip una vez y asociarlo a todos sus DetectionEvent (varios si se unieron alertas)
+        _register_video(output_path, job, duration)
+    else:
+        print(f"❌ Error: El archivo no se creó correctamente")
+
+    cleanup_temp_files(all_segment_paths)
+
+    return str(output_path) if output_path.exists() else None
+
+
+def _reencode(job, segment_paths, temp_output):
+    """Decodifica cada segmento, dibuja el overlay y recodifica. Retorna los frames escritos."""
+    alert_info = job['alert_info']
+    fps = job['fps']
+    width, height = job['frame_size']
+
+    # El clip recodificado reproduce todos los frames a job['fps']: la alerta cae en su frame
+    if job.get('before_frame_count') is not None:
+        job['before_seconds'] = job['before_frame_count'] / fps
+    job.pop('clip_duration', None)
+
+    out = _open_writer(job, temp_output)
+
+    if not out.isOpened():
+        print("❌ Error: No se pudo crear el VideoWriter")
+        return None
+
+    total_frames = 0
+
+    # Modo preroll: los segundos previos vienen en memoria como JPEG
+    before_frames = job.get('before_frames', [])
+    if before_frames:
+        for frame in _iter_preroll(before_frames, width, height):
+            time_offset = (total_frames / fps) - job['before_seconds']
+            out.write(add_overlay(frame, time_offset, alert_info, job['camera_id']))
+            total_frames += 1
+        print(f"   ✓ Pre-roll en memoria: {total_frames} frames")
+
+    for i, seg_path in enumerate(segment_paths):
+        if not seg_path.exists():
+            print(f"⚠️ Segmento no encontrado: {seg_path}")
+            continue
+
+        cap = cv2.VideoCapture(str(seg_path))
+        if not cap.isOpened():
+            print(f"⚠️ No se pudo abrir: {seg_path}")
+            continue
+
+        segment_frames = 0
+
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            time_offset = (total_frames / fps) - job['before_seconds']
+            frame_with_overlay = add_overlay(frame, time_offset, alert_info, job['camera_id'])
+            out.write(frame_with_overlay)
+            total_frames += 1
+            segment_frames += 1
+
+        cap.release()
+        print(f"   ✓ Segmento {i+1}/{len(segment_paths)}: {segment_frames} frames")
+
+    out.release()
+    return total_frames
+
+
+def _stream_copy(job, segment_paths, temp_output):
+    """
+    Une los segmentos con el demuxer concat de ffmpeg sin recodificar.
+    Los frames del pre-roll en memoria se codifican primero en un segmento propio.
+    El concat con -c copy conserva solo la cadencia del primer segmento: si los
+    segmentos (o el pre-roll, a los fps del clip) difieren en fps se recodifica.
+    Retorna los frames del video final o None si no se pudo.
+    """
+    width, height = job['frame_size']
+    output_dir = temp_output.parent
+
+    parts = []
+    frame_counts = list(job.get('segment_frames') or [])
+    segment_fps = list(job.get('segment_fps') or [])
+    preroll_path = None
+
+    before_frames = job.get('before_frames', [])
+    fps_values = ([job['fps']] if before_frames else []) + segment_fps[:len(segment_paths)]
+    fps_values += [job['fps']] * (len(segment_paths) - len(segment_fps))
+    if fps_values and max(fps_values) > min(fps_values) * (1 + FPS_TOLERANCE):
+        print(f"⚠️ Segmentos con fps distintos ({', '.join(f'{fps:g}' for fps in sorted(set(fps_values)))}), "
+              f"no se pueden unir sin recodificar")
+        return None
+
+    if before_frames:
+        preroll_path = output_dir / f"temp_preroll_{temp_output.stem}{temp_output.suffix}"
+        writer = _open_writer(job, preroll_path)
+        if not writer.isOpened():
+            print("❌ Error: No se pudo crear el segmento de pre-roll")
+            return None
+        written = 0
+        for frame in _iter_preroll(before_frames, width, height):
+            writer.write(frame)
+            written += 1
+        writer.release()
+        parts.append(preroll_path)
+        frame_counts.insert(0, written)
+        segment_fps.insert(0, job['fps'])
+
+    parts.extend(segment_paths)
+    segment_fps += [job['fps']] * (len(parts) - len(segment_fps))
+    existing = [(path, count, fps) for path, count, fps
+                in zip(parts, frame_counts + [0] * len(parts), segment_fps)
+                if path.exists()]
+    if not existing:
+        print("❌ Error: No hay segmentos para unir")
+        return None
+
+    list_path = output_dir / f"temp_concat_{temp_output.stem}.txt"
+    list_path.write_text(''.join(f"file '{path.resolve()}'\n" for path, _, _ in existing))
+
+    command = [
+        getattr(settings, 'IA_FFMPEG_BIN', 'ffmpeg'), '-y', '-loglevel', 'error',
+        '-f', 'concat', '-safe', '0', '-i', str(list_path),
+        '-c', 'copy', str(temp_output),
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=120)
+    except FileNotFoundError:
+        print("⚠️ ffmpeg no está instalado")
+        return None
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️ ffmpeg falló: {e.stderr.decode(errors='ignore').strip()}")
+        return None
+    except subprocess.TimeoutExpired:
+        print("⚠️ ffmpeg excedió el tiempo límite")
+        return None
+    finally:
+        cleanup_temp_files([list_path, preroll_path])
+
+    total_frames = sum(count for _, count, _ in existing)
+    if total_frames:
+        # Todos los segmentos comparten fps (ver arriba): la duración es la suma por segmento
+        job['clip_duration'] = sum(count / fps for _, count, fps in existing)
+    else:
+        # Jobs sin conteo de frames por segmento: leerlo del contenedor
+        cap = cv2.VideoCapture(str(temp_output))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+    print(f"   ✓ {len(existing)} segmentos unidos sin recodificar")
+    return total_frames
+
+
+def _open_writer(job, path):
+    """VideoWriter con el códec y la calidad del perfil de grabación de la cámara"""
+    profile = job.get('profile') or {}
+    fourcc = cv2.VideoWriter_fourcc(*profile.get('codec', 'XVID'))
+    writer = cv2.VideoWriter(str(path), fourcc, job['fps'], tuple(job['frame_size']))
+    if profile.get('quality') and writer.isOpened():
+        writer.set(cv2.VIDEOWRITER_PROP_QUALITY, profile['quality'])
+    return writer
+
+
+def _iter_preroll(before_frames, width, height):
+    """Frames BGR del pre-roll en memoria, al tamaño del video"""
+    for jpeg in before_frames:
+        frame = _decode_jpeg(jpeg)
+        if frame is None:
+            continue
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height))
+        yield frame
+
+
+def write_timeline(video_path, job, total_frames):
+    """
+    Escribe los sidecars del video de alerta:
+      - <video>.json: línea de tiempo para el frontend
+      - <video>.vtt: subtítulos ANTES/ALERTA/DESPUES para reproductores
+    """
+    alert_info = job['alert_info']
+    fps = job['fps']
+    alert_offset = job['before_seconds']
+    duration = _clip_duration(job, total_frames)
+
+    timeline = {
+        'camera_id': job['camera_id'],
+        'video': video_path.name,
+        'fps': fps,
+        'input_fps': job.get('input_fps'),
+        'frames': total_frames,
+        'duration': duration,
+        'alert_offset': alert_offset,
+        'alert': {
+            'type': alert_info['type'],
+            'confidence': alert_info['confidence'],
+            'timestamp': alert_info['timestamp'],
+            'detection_id': alert_info.get('detection_id'),
+        },
+        # Todas las alertas unidas en este clip, con su posición en el video
+        'alerts': [
+            dict(alert, offset=alert_offset + alert['timestamp'] - alert_info['timestamp'])
+            for alert in alert_info.get('alerts', [])
+        ],
+        'phases': [
+            {'label': 'ANTES', 'start': 0.0, 'end': max(0.0, alert_offset - 0.5)},
+            {'label': 'ALERTA', 'start': max(0.0, alert_offset - 0.5), 'end': min(duration, alert_offset + 0.5)},
+            {'label': 'DESPUES', 'start': min(duration, alert_offset + 0.5), 'end': duration},
+        ],
+    }
+
+    cues = ['WEBVTT', '']
+    for phase in timeline['phases']:
+        if phase['end'] <= phase['start']:
+            continue
+        label = f"ALERTA: {alert_info['type']}" if phase['label'] == 'ALERTA' else phase['label']
+        cues.append(f"{_vtt_time(phase['start'])} --> {_vtt_time(phase['end'])}")
+        cues.append(f"{label} | Camara {job['camera_id']} | Conf: {alert_info['confidence']:.1%}")
+        cues.append('')
+
+    # Alertas posteriores unidas al mismo clip
+    for alert in timeline['alerts'][1:]:
+        start = min(duration, alert['offset'])
+        end = min(duration, alert['offset'] + 1.0)
+        if end <= start:
+            continue
+        cues.append(f"{_vtt_time(start)} --> {_vtt_time(end)}")
+        cues.append(f"ALERTA: {alert['type']} | Camara {job['camera_id']} | Conf: {alert['confidence']:.1%}")
+        cues.append('')
+
+    try:
+        video_path.with_suffix('.json').write_text(json.dumps(timeline, indent=2))
+        video_path.with_suffix('.vtt').write_text('\n'.join(cues))
+    except Exception as e:
+        print(f"⚠️ No se pudo escribir la línea de tiempo: {e}")
+
+
+def _clip_duration(job, total_frames):
+    """Duración real del clip: por segmento si se unió sin recodificar, si no frames / fps"""
+    return job.get('clip_duration') or total_frames / job['fps']
+
+
+def _vtt_time(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def _decode_jpeg(jpeg):
+    """Decodifica un frame del pre-roll (bytes o base64 si vino por Celery)"""
+    if isinstance(jpeg, str):
+        jpeg = base64.b64decode(jpeg)
+    return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _resolve_detection_ids(alert_info):
+    """
+    Completa los detection_ids de alertas cuyo DetectionEvent aún no se había
+    asociado a la grabación (el outbox los crea en segundo plano).
+    """
+    keys = alert_info.get('alert_keys') or []
+    known = set(alert_info.get('detection_ids') or [])
+    if not keys or len(known) >= len(keys):
+        return
+
+    from .models import AlertaPendiente
+    try:
+        rows = dict(AlertaPendiente.objects.filter(
+            clave__in=keys, detection_id__isnull=False
+        ).values_list('clave', 'detection_id'))
+    except Exception as e:
+        print(f"⚠️ No se pudieron resolver las detecciones de la grabación: {e}")
+        return
+
+    for alert in alert_info.get('alerts', []):
+        detection_id = rows.get(alert.get('alert_key'))
+        if detection_id and not alert.get('detection_id'):
+            alert['detection_id'] = detection_id
+    alert_info['detection_ids'] = list(known) + [d for d in rows.values() if d not in known]
+    if not alert_info.get('detection_id') and alert_info['detection_ids']:
+        alert_info['detection_id'] = alert_info['detection_ids'][0]
+
+
+def _register_video(video_path, job, duration):
+    """Indexa el video para la retención, lo asocia a sus DetectionEvent y aplica la cuota del usuario"""
+    from .retention import register_video
+
+    alert_info = job['alert_info']
+    detection_ids = alert_info.get('detection_ids') or [alert_info.get('detection_id')]
+    try:
+        video = register_video(video_path, job['camera_id'], detection_ids, duration,
+                               alert_keys=alert_info.get('alert_keys'))
+        print(f"✅ Video {video.id} asociado a {len([d for d in detection_ids if d])} DetectionEvent")
+    except Exception as e:
+        print(f"⚠️ Error indexando video para retención: {e}")
+        return
+
+    # Ya indexado: cerrar las alertas del outbox cuyo DetectionEvent llegó tarde
+    try:
+        from .alert_outbox import complete_waiting_alerts
+        complete_waiting_alerts(alert_info.get('alert_keys'))
+    except Exception as e:
+        print(f"⚠️ Error cerrando alertas en espera del video: {e}")
+
+
+def cleanup_temp_files(used_paths):
+    """Elimina todos los archivos temporales que se usaron."""
+    print("🧹 Eliminando archivos temporales...")
+
+    for seg_path in used_paths:
+        if seg_path and seg_path.exists():
+            try:
+                seg_path.unlink()
+                print(f"   🗑️ Eliminado: {seg_path.name}")
+            except Exception as e:
+                print(f"   ❌ Error eliminando {seg_path.name}: {e}")
+
+
+def add_overlay(frame, time_offset, alert_info, camera_id):
+    """Añade overlay con información al frame"""
+    if alert_info is None:
+        return frame
+
+    frame_copy = frame.copy()
+
+    if time_offset < 0:
+        label = f"ANTES: {abs(time_offset):.1f}s"
+        color = (255, 255, 0)
+    elif abs(time_offset) < 0.5:
+        label = f"ALERTA: {alert_info['type']}"
+        color = (0, 0, 255)
+    else:
+        label = f"DESPUES: +{time_offset:.1f}s"
+        color = (0, 255, 255)
+
+    overlay = frame_copy.copy()
+    cv2.rectangle(overlay, (5, 5), (400, 100), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.3, frame_copy, 0.7, 0, frame_copy)
+
+    cv2.putText(frame_copy, label, (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+    cv2.putText(frame_copy, f"Camara {camera_id}", (10, 60),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    cv2.putText(frame_copy, f"Conf: {alert_info['confidence']:.1%}", (10, 85),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+
+    return frame_copy
@@ -2,21 +2,30 @@ import cv2
 import time
 from pathlib import Path
 from collections import deque
-from threading import Lock
+from queue import Queue, Full, Empty
+from threading import Lock, Thread
 import numpy as np
+from django.conf import settings
 from camaras.models import CamaraDetalles
-from .models import DetectionEvent
+from .preroll_buffer import PreRollBuffer
+from .recording_profile import RecordingProfile
+from .video_consolidation import submit_consolidation
 
 
 class VideoRecorder:
     """
     Sistema de grabación con buffer circular.
-    Graba continuamente en segmentos y consolida al detectar alerta.
+    Dos modos (IA_RECORDING_MODE):
+      - 'segments': graba continuamente en segmentos a disco y consolida al detectar alerta
+      - 'preroll': guarda los últimos segundos en RAM como JPEG y solo escribe a disco tras una alerta
     """
     
-    def __init__(self, camera_id, output_dir='media'):
-        self.user = CamaraDetalles.objects.get(id=camera_id).camara.user
+    def __init__(self, camera_id, output_dir=None):
+        camara = CamaraDetalles.objects.select_related('camara__user', 'perfil_grabacion').get(id=camera_id)
+        self.user = camara.camara.user
+        self.profile = RecordingProfile.from_perfil(camara.perfil_grabacion)
         self.camera_id = camera_id
+        output_dir = output_dir or getattr(settings, 'IA_RECORDING_DIR', 'media')
         if not self.user:
             self.output_dir = Path(output_dir, "user_tester")
         else:
@@ -27,7 +36,26 @@ class VideoRecorder:
         self.segment_duration = 10
         self.before_seconds = 10
         self.after_seconds = 20
-        self.fps = 16
+        # Alertas que se superponen extienden el mismo clip hasta este largo total
+        self.max_clip_seconds = float(getattr(settings, 'IA_RECORDING_MAX_CLIP_SECONDS', 120))
+        self.fps = 16  # Solo hasta medir los fps reales de la cámara
+        
+        # Fps reales de entrada (por timestamps de captura) y tope opcional de salida
+        self.max_fps = self.profile.max_fps  # 0 = sin tope
+        self.input_fps = 0.0
+        self.last_input_timestamp = None
+        self.next_frame_timestamp = 0.0
+        self.frames_skipped_fps = 0
+        
+        # Modo de grabación
+        self.mode = getattr(settings, 'IA_RECORDING_MODE', 'segments')
+        self.preroll = None
+        if self.mode == 'preroll':
+            self.preroll = PreRollBuffer(
+                seconds=self.before_seconds,
+                max_bytes=int(getattr(settings, 'IA_PREROLL_MAX_MB', 64) * 1024 * 1024),
+                jpeg_quality=self.profile.quality or getattr(settings, 'IA_PREROLL_JPEG_QUALITY', 80)
+            )
         
         # Buffer circular de segmentos
         self.max_segments = int(self.before_seconds / self.segment_duration)
@@ -37,34 +65,191 @@ class VideoRecorder:
         self.current_segment_writer = None
         self.current_segment_path = None
         self.current_segment_frames = 0
-        self.frames_per_segment = self.segment_duration * self.fps
+        self.current_segment_start = None
+        self.current_segment_fps = self.fps
         
         # Estado de grabación post-alerta
         self.recording_alert = False
         self.alert_info = None
+        self.record_until = 0.0  # Fin del post-roll (se extiende con cada alerta nueva)
         self.before_segments = []
+        self.before_frames = []  # Modo preroll: [(timestamp, jpeg)]
+        self.alert_frame_offset = 0  # Frames del clip final anteriores a la alerta
+        self.alert_seconds_offset = 0.0  # Segundos anteriores a la alerta (cada segmento a sus fps)
         self.after_segments = []
         self.after_frames_recorded = 0
-        self.after_frames_needed = int(self.after_seconds * self.fps)
         
         # Dimensiones del video
         self.frame_width = None
         self.frame_height = None
         
+        # Vista previa de alertas: último frame + keyframes recientes ya reducidos
+        self.thumbnail_width = int(getattr(settings, 'IA_THUMBNAIL_WIDTH', 320))
+        self.strip_interval = float(getattr(settings, 'IA_THUMBNAIL_STRIP_INTERVAL', 1.0))
+        self.strip_frames = deque(maxlen=int(getattr(settings, 'IA_THUMBNAIL_STRIP_FRAMES', 5)))
+        self.last_strip_timestamp = 0.0
+        self.last_frame = None
+        
         self.lock = Lock()
         
-        print(f"✅ VideoRecorder creado para cámara {camera_id}")
-        print(f"   Buffer: {self.max_segments} segmentos de {self.segment_duration}s")
+        # Etapa de codificación: la captura solo encola, un hilo propio escribe a disco
+        self.overflow_policy = getattr(settings, 'IA_RECORDER_OVERFLOW_POLICY', 'drop_oldest')
+        self.frame_queue = Queue(maxsize=max(1, int(getattr(settings, 'IA_RECORDER_QUEUE_SIZE', 64))))
+        self.running = True
+        
+        # Métricas de la etapa de codificación
+        self.frames_enqueued = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.max_queue_depth = 0
+        self.last_write_ms = 0.0
+        self.max_write_ms = 0.0
+        
+        self.encoder_thread = Thread(target=self._encoder_loop, daemon=True)
+        self.encoder_thread.start()
+        
+        print(f"✅ VideoRecorder creado para cámara {camera_id} (perfil: {self.profile.name})")
+        if self.preroll:
+            print(f"   Pre-roll en memoria: {self.before_seconds}s (máx {self.preroll.max_bytes / (1024 * 1024):.0f} MB)")
+        else:
+            print(f"   Buffer: {self.max_segments} segmentos de {self.segment_duration}s")
+    
+    def needs_frame(self, timestamp=None):
+        """
+        Indica si el recorder va a usar el próximo frame (si no, no hace falta decodificarlo).
+        Se llama con cada frame de la cámara: mide los fps de entrada y aplica el tope de salida.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._update_input_fps(timestamp)
+        
+        if not self.max_fps:
+            return True
+        
+        if timestamp < self.next_frame_timestamp:
+            self.frames_skipped_fps += 1
+            return False
+        
+        self.next_frame_timestamp += 1.0 / self.max_fps
+        if self.next_frame_timestamp < timestamp:
+            # Tras un hueco de la cámara no se recupera con ráfagas
+            self.next_frame_timestamp = timestamp
+        return True
+    
+    def _update_input_fps(self, timestamp):
+        """Media móvil de los fps que entrega la cámara"""
+        if self.last_input_timestamp is not None:
+            interval = timestamp - self.last_input_timestamp
+            if interval > 0:
+                fps = 1.0 / interval
+                self.input_fps = fps if self.input_fps == 0 else 0.9 * self.input_fps + 0.1 * fps
+        self.last_input_timestamp = timestamp
+    
+    def _record_fps(self):
+        """Fps con los que se escriben los segmentos: entrada medida, limitada por el tope"""
+        fps = self.input_fps or self.fps
+        if self.max_fps:
+            fps = min(fps, self.max_fps)
+        return max(1.0, round(fps, 2))
+    
+    def add_frame(self, frame, timestamp=None):
+        """
+        Encola un frame para el hilo de codificación (no escribe en el hilo de captura).
+        Cola llena: 'drop_oldest' descarta el frame más viejo, 'block' espera al encoder.
+        """
+        if not self.running:
+            return
+        
+        item = (frame, timestamp if timestamp is not None else time.time())
+        
+        if self.overflow_policy == 'block':
+            try:
+                self.frame_queue.put(item, timeout=5)
+            except Full:
+                self.frames_dropped += 1
+                return
+        else:
+            while True:
+                try:
+                    self.frame_queue.put_nowait(item)
+                    break
+                except Full:
+                    try:
+                        self.frame_queue.get_nowait()
+                        self.frames_dropped += 1
+                    except Empty:
+                        pass
+        
+        self.frames_enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.frame_queue.qsize())
     
-    def add_frame(self, frame):
-        """Añade un frame. Siempre está grabando en segmentos."""
+    def _encoder_loop(self):
+        """Hilo de codificación: vacía la cola y escribe los frames"""
+        while True:
+            item = self.frame_queue.get()
+            if item is None:
+                break
+            
+            frame, timestamp = item
+            started = time.perf_counter()
+            try:
+                self._write_frame(frame, timestamp)
+            except Exception as e:
+                print(f"⚠️ Error al grabar frame en recorder: {e}")
+                continue
+            
+            self.last_write_ms = (time.perf_counter() - started) * 1000
+            self.max_write_ms = max(self.max_write_ms, self.last_write_ms)
+            self.frames_written += 1
+    
+    def get_stats(self):
+        """Métricas de la etapa de codificación"""
+        return {
+            'mode': self.mode,
+            'profile': self.profile.name,
+            'overflow_policy': self.overflow_policy,
+            'queue_depth': self.frame_queue.qsize(),
+            'queue_size': self.frame_queue.maxsize,
+            'max_queue_depth': self.max_queue_depth,
+            'frames_enqueued': self.frames_enqueued,
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped,
+            'last_write_ms': self.last_write_ms,
+            'max_write_ms': self.max_write_ms,
+            'input_fps': self.input_fps,
+            'record_fps': self.current_segment_fps,
+            'max_fps': self.max_fps,
+            'frames_skipped_fps': self.frames_skipped_fps,
+            'recording_alert': self.recording_alert,
+        }
+    
+    def _write_frame(self, frame, timestamp):
+        """Escribe un frame. En modo preroll solo va a disco durante una alerta."""
+        frame = self.profile.scale(frame)
+        
+        self.last_frame = frame
+        if self.strip_frames.maxlen and timestamp - self.last_strip_timestamp >= self.strip_interval:
+            self.strip_frames.append(self._thumbnail(frame))
+            self.last_strip_timestamp = timestamp
+        
         with self.lock:
             if self.frame_width is None:
                 self.frame_height, self.frame_width = frame.shape[:2]
-                self._create_new_segment()
+                if not self.preroll:
+                    self._create_new_segment(timestamp)
             
-            if self.current_segment_frames >= self.frames_per_segment:
-                self._rotate_segment()
+            if self.preroll and not self.recording_alert:
+                self.preroll.add(frame, timestamp)
+                return
+            
+            # Alerta disparada antes del primer frame (tamaño desconocido): el post-roll se abre ahora
+            if self.recording_alert and self.current_segment_writer is None:
+                self._create_new_segment(timestamp)
+            
+            # Rotación por tiempo de captura, no por cantidad de frames
+            if (self.current_segment_start is not None and
+                    timestamp - self.current_segment_start >= self.segment_duration):
+                self._rotate_segment(timestamp)
             
             if self.current_segment_writer:
                 self.current_segment_writer.write(frame)
@@ -72,29 +257,32 @@ class VideoRecorder:
             
             if self.recording_alert:
                 self.after_frames_recorded += 1
-                if self.after_frames_recorded >= self.after_frames_needed:
+                if timestamp >= self.record_until:
                     self._consolidate_video()
     
-    def _create_new_segment(self):
+    def _create_new_segment(self, start_timestamp=None):
         """Crea un nuevo segmento de video"""
         timestamp = int(time.time() * 1000)
-        segment_path = self.output_dir / f"temp_cam{self.camera_id}_{timestamp}.avi"
+        segment_path = self.output_dir / f"temp_cam{self.camera_id}_{timestamp}{self.profile.extension}"
         
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        writer = cv2.VideoWriter(
-            str(segment_path),
-            fourcc,
-            self.fps,
+        # Durante una alerta se mantienen los fps para que el clip final sea uniforme
+        if not self.recording_alert:
+            self.current_segment_fps = self._record_fps()
+        
+        writer = self.profile.open_writer(
+            segment_path,
+            self.current_segment_fps,
             (self.frame_width, self.frame_height)
         )
         
         self.current_segment_writer = writer
         self.current_segment_path = segment_path
         self.current_segment_frames = 0
+        self.current_segment_start = start_timestamp if start_timestamp is not None else time.time()
         
-        print(f"📹 Nuevo segmento: {segment_path.name}")
+        print(f"📹 Nuevo segmento: {segment_path.name} ({self.current_segment_fps:.1f} fps)")
     
-    def _rotate_segment(self):
+    def _rotate_segment(self, timestamp=None):
         """Cierra el segmento actual y lo añade al buffer."""
         if self.current_segment_writer:
             self.current_segment_writer.release()
@@ -103,6 +291,7 @@ class VideoRecorder:
         segment_info = {
             'path': self.current_segment_path,
             'frames': self.current_segment_frames,
+            'fps': self.current_segment_fps,
             'timestamp': time.time()
         }
         
@@ -118,55 +307,157 @@ class VideoRecorder:
             
             self.segment_buffer.append(segment_info)
         
-        self._create_new_segment()
+        self._create_new_segment(timestamp)
+    
+    def _thumbnail(self, frame):
+        """Copia reducida del frame al ancho de miniatura"""
+        height, width = frame.shape[:2]
+        if width <= self.thumbnail_width:
+            return frame.copy()
+        new_height = int(round(height * self.thumbnail_width / width))
+        return cv2.resize(frame, (self.thumbnail_width, new_height), interpolation=cv2.INTER_AREA)
     
-    def trigger_alert(self, alert_type, confidence, detection_id=None):
-        """Activa la grabación de alerta."""
+    def capture_preview(self, detection_id=None, alert_key=None):
+        """
+        Copia en memoria la miniatura del frame de la alerta y los keyframes de los segundos previos.
+        No escribe a disco: lo hace el outbox con write_preview.
+        
+        Returns:
+            dict {'path', 'thumbnail', 'keyframes'} o None si aún no hay frames
+        """
+        frame = self.last_frame
+        if frame is None:
+            return None
+        
+        thumbnail = self._thumbnail(frame)
+        # Los keyframes del deque no se modifican después de agregarse: basta la lista
+        keyframes = [kf for kf in list(self.strip_frames) if kf.shape == thumbnail.shape]
+        name = f"cam{self.camera_id}_{detection_id or alert_key or int(time.time() * 1000)}"
+        return {
+            'path': str(self.output_dir / 'miniaturas' / name),
+            'thumbnail': thumbnail,
+            'keyframes': keyframes[-self.strip_frames.maxlen:] if self.strip_frames.maxlen else [],
+        }
+    
+    def trigger_alert(self, alert_type, confidence, detection_id=None, alert_key=None):
+        """
+        Activa la grabación de alerta y copia su vista previa en memoria.
+        Con alert_key el DetectionEvent se asocia después (ver attach_detection).
+        
+        Returns:
+            vista previa en memoria (ver capture_preview) o None
+        """
+        try:
+            preview = self.capture_preview(detection_id, alert_key)
+        except Exception as e:
+            print(f"⚠️ Error copiando miniaturas: {e}")
+            preview = None
+        
         with self.lock:
             if self.recording_alert:
-                print(f"⚠️ Ya hay una grabación en proceso")
-                return
+                self._extend_alert(alert_type, confidence, detection_id, alert_key)
+                return preview
             
             print(f"\n🚨 TRIGGER ALERTA - Cámara {self.camera_id}")
             print(f"   Tipo: {alert_type}")
             print(f"   Confianza: {confidence:.2%}")
             print(f"   Detection ID: {detection_id}")
-            print(f"   Segmentos previos: {len(self.segment_buffer)}")
+            if self.preroll:
+                print(f"   Pre-roll: {len(self.preroll)} frames ({self.preroll.duration():.1f}s)")
+            else:
+                print(f"   Segmentos previos: {len(self.segment_buffer)}")
             
+            now = time.time()
             self.recording_alert = True
             self.alert_info = {
                 'type': alert_type,
                 'confidence': confidence,
-                'timestamp': time.time(),
-                'detection_id': detection_id  # Guardar el ID de detección
+                'timestamp': now,
+                'detection_id': detection_id,  # Guardar el ID de detección
+                'detection_ids': [detection_id] if detection_id else [],
+                'alert_keys': [alert_key] if alert_key else [],
+                'alerts': [{'type': alert_type, 'confidence': confidence, 'timestamp': now,
+                            'detection_id': detection_id, 'alert_key': alert_key}],
             }
+            self.record_until = now + self.after_seconds
             
-            self.before_segments = [seg['path'] for seg in self.segment_buffer]
+            self.before_segments = list(self.segment_buffer)
             self.after_segments = []
             self.after_frames_recorded = 0
             
+            if self.preroll:
+                # El pre-roll pasa a la alerta; lo posterior se escribe a disco
+                self.before_frames = self.preroll.snapshot()
+                self.preroll.clear()
+                self.alert_frame_offset = len(self.before_frames)
+                self.current_segment_fps = self._record_fps()
+                # El pre-roll se codifica a los fps del clip
+                self.alert_seconds_offset = self.alert_frame_offset / self.current_segment_fps
+                # Sin tamaño de frame aún, _write_frame lo abre con el primer frame
+                if self.frame_width is not None:
+                    self._create_new_segment()
+            else:
+                # Frames previos a la alerta: segmentos cerrados + lo ya escrito en el actual
+                self.alert_frame_offset = (sum(seg['frames'] for seg in self.before_segments) +
+                                           self.current_segment_frames)
+                # Cada segmento a sus propios fps (pueden cambiar con el tope de fps o el perfil)
+                self.alert_seconds_offset = (
+                    sum(seg['frames'] / seg.get('fps', self.current_segment_fps) for seg in self.before_segments) +
+                    self.current_segment_frames / self.current_segment_fps
+                )
+            
             print(f"   Grabará próximos {self.after_seconds}s...")
+        
+        return preview
     
-    def _update_detection_event(self, video_path):
-        """Actualiza el DetectionEvent con la ruta del video."""
-        detection_id = self.alert_info.get('detection_id')
+    def _extend_alert(self, alert_type, confidence, detection_id, alert_key=None):
+        """
+        Alerta durante una grabación en curso: se suma al mismo clip y extiende el post-roll,
+        sin pasar de max_clip_seconds en total.
+        """
+        now = time.time()
+        self.alert_info['alerts'].append({'type': alert_type, 'confidence': confidence, 'timestamp': now,
+                                          'detection_id': detection_id, 'alert_key': alert_key})
         if detection_id:
-            try:
-                detection = DetectionEvent.objects.get(id=detection_id)
-                detection.video_file = str(video_path)
-                detection.save()
-                print(f"✅ DetectionEvent {detection_id} actualizado con video: {video_path}")
-            except DetectionEvent.DoesNotExist:
-                print(f"⚠️ DetectionEvent con id {detection_id} no encontrado")
-            except Exception as e:
-                print(f"❌ Error actualizando DetectionEvent: {e}")
-        else:
-            print("⚠️ No se proporcionó detection_id, video no asociado a DetectionEvent")
+            self.alert_info['detection_ids'].append(detection_id)
+        if alert_key:
+            self.alert_info['alert_keys'].append(alert_key)
+        if confidence > self.alert_info['confidence']:
+            self.alert_info['confidence'] = confidence
+        
+        before = self.alert_seconds_offset
+        limit = self.alert_info['timestamp'] + max(self.after_seconds, self.max_clip_seconds - before)
+        self.record_until = min(max(self.record_until, now + self.after_seconds), limit)
+        
+        print(f"🔗 Alerta unida a la grabación en curso - Cámara {self.camera_id} "
+              f"({len(self.alert_info['alerts'])} alertas, graba hasta +{self.record_until - self.alert_info['timestamp']:.0f}s)")
     
-    def _consolidate_video(self):
-        """Consolida todos los segmentos en un solo video final."""
-        print(f"\n💾 Consolidando video de alerta...")
+    def attach_detection(self, alert_key, detection_id):
+        """
+        Asocia el DetectionEvent creado por el outbox a la grabación en curso.
         
+        Returns:
+            True si la alerta sigue grabándose (el video se asociará al consolidar);
+            False si ya se entregó al worker (éste lo resuelve por alert_key).
+        """
+        with self.lock:
+            if not self.recording_alert or alert_key not in self.alert_info.get('alert_keys', []):
+                return False
+            
+            if detection_id not in self.alert_info['detection_ids']:
+                self.alert_info['detection_ids'].append(detection_id)
+            if not self.alert_info.get('detection_id'):
+                self.alert_info['detection_id'] = detection_id
+            for alert in self.alert_info['alerts']:
+                if alert.get('alert_key') == alert_key:
+                    alert['detection_id'] = detection_id
+            return True
+    
+    def _consolidate_video(self):
+        """
+        Cierra la grabación de alerta y entrega los segmentos al worker de consolidación.
+        Retorna de inmediato: la captura sigue mientras el video se arma en segundo plano.
+        """
         if self.current_segment_writer:
             self.current_segment_writer.release()
             self.current_segment_writer = None
@@ -175,147 +466,106 @@ class VideoRecorder:
             self.after_segments.append({
                 'path': self.current_segment_path,
                 'frames': self.current_segment_frames,
+                'fps': self.current_segment_fps,
                 'timestamp': time.time()
             })
         
-        timestamp_str = time.strftime('%Y%m%d_%H%M%S', 
-                                      time.localtime(self.alert_info['timestamp']))
-        alert_type_clean = self.alert_info['type'].replace(' ', '_')
-        filename = f"cam{self.camera_id}_{alert_type_clean}_{timestamp_str}.mp4"
-        output_path = self.output_dir / filename
-        
-        temp_output = self.output_dir / f"temp_final_{timestamp_str}.avi"
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        out = cv2.VideoWriter(
-            str(temp_output),
-            fourcc,
-            self.fps,
-            (self.frame_width, self.frame_height)
-        )
-        
-        if not out.isOpened():
-            print("❌ Error: No se pudo crear el VideoWriter")
-            self._reset_state()
-            return None
-        
-        total_frames = 0
-        all_segment_paths = self.before_segments + [s['path'] for s in self.after_segments]
-        
-        print(f"   Before segments: {len(self.before_segments)}")
-        print(f"   After segments: {len(self.after_segments)}")
-        print(f"   Total: {len(all_segment_paths)} segmentos")
+        job = self._build_consolidation_job()
+        try:
+            submit_consolidation(job)
+            print(f"📤 Consolidación encolada: {len(job['segment_paths'])} segmentos")
+        except Exception as e:
+            print(f"❌ Error encolando consolidación: {e}")
         
-        for i, seg_path in enumerate(all_segment_paths):
-            if not seg_path.exists():
-                print(f"⚠️ Segmento no encontrado: {seg_path}")
-                continue
-            
-            cap = cv2.VideoCapture(str(seg_path))
-            if not cap.isOpened():
-                print(f"⚠️ No se pudo abrir: {seg_path}")
-                continue
-            
-            segment_frames = 0
-            
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                time_offset = (total_frames / self.fps) - self.before_seconds
-                frame_with_overlay = self._add_overlay(frame, time_offset)
-                out.write(frame_with_overlay)
-                total_frames += 1
-                segment_frames += 1
-            
-            cap.release()
-            print(f"   ✓ Segmento {i+1}/{len(all_segment_paths)}: {segment_frames} frames")
-        
-        out.release()
-        time.sleep(0.5)
-        
-        if temp_output.exists():
-            temp_output.rename(output_path.with_suffix('.avi'))
-            output_path = output_path.with_suffix('.avi')
-        
-        if output_path.exists():
-            duration = total_frames / self.fps
-            file_size = output_path.stat().st_size / (1024 * 1024)
-            
-            print(f"\n✅ Video consolidado:")
-            print(f"   Archivo: {output_path.name}")
-            print(f"   Duración: {duration:.1f}s ({duration/60:.1f} min)")
-            print(f"   Frames: {total_frames}")
-            print(f"   Tamaño: {file_size:.1f} MB")
-            
-            # Actualizar el DetectionEvent con la ruta del video
-            self._update_detection_event(output_path)
-        else:
-            print(f"❌ Error: El archivo no se creó correctamente")
-        
-        self._cleanup_all_temp_files(all_segment_paths)
+        # Los segmentos ahora pertenecen al worker: no borrarlos desde aquí
         self._reset_state()
-        self._create_new_segment()
-        
-        return str(output_path) if output_path.exists() else None
+        if not self.preroll:
+            self._create_new_segment()
+        else:
+            # Pre-roll: no hay segmento abierto hasta la próxima alerta
+            self.current_segment_path = None
+            self.current_segment_frames = 0
+            self.current_segment_start = None
     
-    def _cleanup_all_temp_files(self, used_paths):
-        """Elimina todos los archivos temporales que se usaron."""
-        print("🧹 Eliminando archivos temporales...")
-        
-        for seg_path in used_paths:
-            if seg_path and seg_path.exists():
-                try:
-                    seg_path.unlink()
-                    print(f"   🗑️ Eliminado: {seg_path.name}")
-                except Exception as e:
-                    print(f"   ❌ Error eliminando {seg_path.name}: {e}")
+    def _build_consolidation_job(self):
+        """Datos serializables que necesita el worker para armar el video"""
+        return {
+            'camera_id': self.camera_id,
+            'output_dir': str(self.output_dir),
+            'fps': self.current_segment_fps,
+            'input_fps': self.input_fps,
+            'frame_size': (self.frame_width, self.frame_height),
+            'profile': self.profile.to_dict(),
+            'before_seconds': self.alert_seconds_offset,
+            'before_frame_count': self.alert_frame_offset,
+            'before_count': len(self.before_segments),
+            'before_frames': [jpeg for _, jpeg in self.before_frames],
+            'segment_paths': [str(s['path']) for s in self.before_segments + self.after_segments],
+            'segment_frames': [s['frames'] for s in self.before_segments + self.after_segments],
+            'segment_fps': [s.get('fps', self.current_segment_fps) for s in self.before_segments + self.after_segments],
+            'alert_info': dict(self.alert_info),
+        }
     
     def _reset_state(self):
         """Resetea el estado después de consolidar."""
         self.recording_alert = False
         self.alert_info = None
+        self.record_until = 0.0
         self.before_segments = []
+        self.before_frames = []
+        self.alert_frame_offset = 0
+        self.alert_seconds_offset = 0.0
         self.after_segments = []
         self.after_frames_recorded = 0
         self.segment_buffer.clear()
     
-    def _add_overlay(self, frame, time_offset):
-        """Añade overlay con información al frame"""
-        if self.alert_info is None:
-            return frame
-
-        frame_copy = frame.copy()
-        
-        if time_offset < 0:
-            label = f"ANTES: {abs(time_offset):.1f}s"
-            color = (255, 255, 0)
-        elif abs(time_offset) < 0.5:
-            label = f"ALERTA: {self.alert_info['type']}"
-            color = (0, 0, 255)
-        else:
-            label = f"DESPUES: +{time_offset:.1f}s"
-            color = (0, 255, 255)
-        
-        overlay = frame_copy.copy()
-        cv2.rectangle(overlay, (5, 5), (400, 100), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.3, frame_copy, 0.7, 0, frame_copy)
-        
-        cv2.putText(frame_copy, label, (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-        cv2.putText(frame_copy, f"Camara {self.camera_id}", (10, 60),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        cv2.putText(frame_copy, f"Conf: {self.alert_info['confidence']:.1%}", (10, 85),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        
-        return frame_copy
-    
     def cleanup(self):
         """Limpieza al cerrar el recorder."""
+        # Detener el encoder: se descartan los frames pendientes
+        self.running = False
+        while True:
+            try:
+                self.frame_queue.get_nowait()
+            except Empty:
+                break
+        self.frame_queue.put(None)
+        self.encoder_thread.join(timeout=5)
+        
         with self.lock:
             if self.current_segment_writer:
                 self.current_segment_writer.release()
             
             for seg in self.segment_buffer:
                 if seg['path'].exists():
-                    seg['path'].unlink()
\ No newline at end of file
+                    seg['path'].unlink()
+            
+            if self.preroll:
+                self.preroll.clear()
+
+
+def write_preview(preview):
+    """
+    Escribe la miniatura y la tira de keyframes copiadas por capture_preview.
+    
+    Returns:
+        dict {'thumbnail': ruta o None, 'strip': ruta o None}
+    """
+    paths = {'thumbnail': None, 'strip': None}
+    if not preview:
+        return paths
+    
+    base = Path(preview['path'])
+    base.parent.mkdir(parents=True, exist_ok=True)
+    params = [cv2.IMWRITE_JPEG_QUALITY, 80]
+    
+    thumbnail = preview['thumbnail']
+    thumbnail_path = base.with_name(f"{base.name}.jpg")
+    if cv2.imwrite(str(thumbnail_path), thumbnail, params):
+        paths['thumbnail'] = str(thumbnail_path)
+    
+    if preview['keyframes']:
+        strip_path = base.with_name(f"{base.name}_strip.jpg")
+        if cv2.imwrite(str(strip_path), cv2.hconcat(preview['keyframes'] + [thumbnail]), params):
+            paths['strip'] = str(strip_path)
+    
+    return paths
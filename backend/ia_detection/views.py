@@ -3,11 +3,15 @@
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status, viewsets
+from rest_framework.permissions import IsAdminUser
 from django.http import FileResponse, Http404
 from .models import DetectionEvent
 from .serializer import DetectionEventSerializer
 import os
 from .camara_manager import camera_manager
+from .alert_outbox import alert_outbox
+from .inference import get_inference_backend
+from .range_response import range_file_response
 from camaras.models import CamaraDetalles
 
 class ia_detection(viewsets.ModelViewSet):
@@ -51,6 +55,21 @@ class ia_detection(viewsets.ModelViewSet):
         camaras_de_la_empresa = CamaraDetalles.objects.filter(camara__user=user, id__in=active)
         return Response({'active_cameras': camaras_de_la_empresa})
     
+    @action(detail=False, methods=['get'])
+    def estadisticas_camaras(self, request):
+        """Contadores por cámara: frames capturados, analizados, descartados y retraso"""
+        user = self.request.user
+        camaras_de_la_empresa = CamaraDetalles.objects.filter(camara__user=user).values_list('id', flat=True)
+        return Response({
+            'camaras': camera_manager.get_stats(set(camaras_de_la_empresa)),
+            'outbox_alertas': alert_outbox.get_stats(),
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def estadisticas_inferencia(self, request):
+        """Métricas del backend de inferencia (batches, cola, espera, workers). De todo el proceso: solo staff"""
+        return Response(get_inference_backend().get_stats())
+    
     @action(detail=False, methods=['get'])
     def metricas_eventos(self, request):
         """Obtiene métricas de eventos de agresión agrupados por fecha"""
@@ -129,6 +148,56 @@ class DetectionEventViewSet(viewsets.ModelViewSet):
         response = FileResponse(open(file_path, 'rb'), as_attachment=True)
         response['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
         return response
+    @action(detail=True, methods=['get'])
+    def stream_video(self, request, pk=None):
+        """
+        Reproduce el video del DetectionEvent sin descargarlo completo:
+        soporta Range (seek), ETag y Last-Modified (vistas repetidas devuelven 304).
+        """
+        event = self.get_object()
+        if not event.video_file:
+            return Response({"error": "Este evento no tiene video asociado"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        if not os.path.isfile(event.video_file):
+            return Response({"error": "El archivo de video no existe en el servidor"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        response = range_file_response(request, event.video_file)
+        response['Content-Disposition'] = f'inline; filename="{os.path.basename(event.video_file)}"'
+        return response
+    @action(detail=True, methods=['get'])
+    def thumbnail(self, request, pk=None):
+        """
+        Miniatura JPEG del momento de la alerta (?tipo=strip para la tira de keyframes).
+        Las miniaturas no cambian: se sirven con ETag y caché larga.
+        """
+        event = self.get_object()
+        file_path = event.strip_file if request.query_params.get('tipo') == 'strip' else event.thumbnail_file
+        if not file_path or not os.path.isfile(file_path):
+            return Response({"error": "Este evento no tiene miniatura"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        return range_file_response(request, file_path, content_type='image/jpeg', max_age=7 * 24 * 3600)
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Línea de tiempo del video de alerta (ANTES / ALERTA / DESPUES).
+        ?formato=vtt devuelve los subtítulos WebVTT para el reproductor.
+        """
+        event = self.get_object()
+        if not event.video_file:
+            return Response({"error": "Este evento no tiene video asociado"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        formato = request.query_params.get('formato', 'json')
+        sidecar_path = os.path.splitext(event.video_file)[0] + ('.vtt' if formato == 'vtt' else '.json')
+        if not os.path.isfile(sidecar_path):
+            return Response({"error": "Este video no tiene línea de tiempo"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        content_type = 'text/vtt' if formato == 'vtt' else 'application/json'
+        return range_file_response(request, sidecar_path, content_type=content_type)
     @action(detail=False, methods=['get'])
     def all_events_by_user(self, request):
         """
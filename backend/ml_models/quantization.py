@@ -0,0 +1,84 @@
+import copy
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+
+def configure_quantized_engine():
+    """Selecciona el backend INT8 disponible en esta CPU (x86 > fbgemm > qnnpack)"""
+    supported = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in supported:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("Esta build de PyTorch no soporta cuantización INT8")
+
+
+def load_fp32_model(checkpoint_path, num_classes=3):
+    """Construye el VideoClassifier fp32 desde un checkpoint (sin descargar pesos de ImageNet)"""
+    from ml_models.train_model import VideoClassifier
+
+    model = VideoClassifier(num_classes=num_classes, pretrained=False)
+    checkpoint = torch.load(str(checkpoint_path), map_location='cpu')
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return model
+
+
+@torch.no_grad()
+def quantize_model(fp32_model, calibration_clips):
+    """
+    Genera la variante INT8 del modelo:
+      - MobileNetV3: cuantización estática (FX) calibrada con frames reales
+      - LSTM + clasificador: cuantización dinámica
+
+    Args:
+        fp32_model: VideoClassifier en modo eval
+        calibration_clips: iterable de tensores [B, 16, 3, 224, 224] en [0, 1]
+
+    Returns:
+        VideoClassifier cuantizado (el modelo original no se modifica)
+    """
+    engine = configure_quantized_engine()
+    model = copy.deepcopy(fp32_model).eval()
+
+    # 1. Backbone: insertar observadores y calibrar con frames reales
+    qconfig_mapping = get_default_qconfig_mapping(engine)
+    example_inputs = (torch.rand(1, 3, 224, 224),)
+    model.feature_extractor = prepare_fx(model.feature_extractor, qconfig_mapping, example_inputs)
+
+    for clip in calibration_clips:
+        batch_size, time_steps, c, h, w = clip.size()
+        model.feature_extractor(clip.reshape(batch_size * time_steps, c, h, w))
+
+    model.feature_extractor = convert_fx(model.feature_extractor)
+
+    # 2. Cabeza temporal: pesos INT8, activaciones cuantizadas al vuelo
+    model = quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+    return model
+
+
+@torch.no_grad()
+def export_torchscript(model, output_path, time_steps=16):
+    """
+    Exporta el modelo (fp32 o INT8) a TorchScript congelado.
+    Conserva extract_frame_features y classify_features para el modo streaming.
+    """
+    model.eval()
+    clip = torch.rand(1, time_steps, 3, 224, 224)
+    frames = clip[0]
+    features = model.extract_frame_features(frames).unsqueeze(0)
+
+    traced = torch.jit.trace_module(model, {
+        'forward': clip,
+        'extract_frame_features': frames,
+        'classify_features': features,
+    })
+    frozen = torch.jit.freeze(
+        traced,
+        preserved_attrs=['extract_frame_features', 'classify_features']
+    )
+    torch.jit.save(frozen, str(output_path))
+    return frozen
@@ -3,11 +3,12 @@ import torch.nn as nn
 from torchvision.models import mobilenet_v3_small
 
 class VideoClassifier(nn.Module):
-    def __init__(self, num_classes=3, hidden_size=256, num_lstm_layers=2):
+    def __init__(self, num_classes=3, hidden_size=256, num_lstm_layers=2, pretrained=True):
         super(VideoClassifier, self).__init__()
         
         # Feature extractor: MobileNetV3 (sin la capa clasificadora)
-        mobilenet = mobilenet_v3_small(pretrained=True)
+        # pretrained=False evita descargar pesos de ImageNet cuando se va a cargar un checkpoint
+        mobilenet = mobilenet_v3_small(pretrained=pretrained)
         self.feature_extractor = nn.Sequential(*list(mobilenet.children())[:-1])
         
         # Congelar primeras capas (fine-tuning)
@@ -37,6 +38,34 @@ class VideoClassifier(nn.Module):
         
     def forward(self, x):
         # x shape: [batch, time, channels, height, width]
+        features = self.extract_features(x)
+        
+        return self.classify_features(features)
+    
+    def extract_features(self, x):
+        """
+        Features por frame: [batch, time, C, H, W] → [batch, time, 576].
+        En inferencia pasa todos los frames por MobileNetV3 en un solo batch.
+        """
+        if self.training:
+            # En entrenamiento se mantiene el loop por frame (BatchNorm por paso)
+            return self._extract_features_per_frame(x)
+        
+        batch_size, time_steps, c, h, w = x.size()
+        
+        # [batch, time, C, H, W] → [batch * time, C, H, W]
+        frames = x.reshape(batch_size * time_steps, c, h, w)
+        feat = self.extract_frame_features(frames)
+        
+        # Volver a separar el eje temporal: [batch, time, features]
+        return feat.view(batch_size, time_steps, -1)
+    
+    def extract_frame_features(self, frames):
+        """Features de frames sueltos: [N, C, H, W] → [N, 576]"""
+        feat = self.feature_extractor(frames)
+        return feat.flatten(1)
+    
+    def _extract_features_per_frame(self, x):
         batch_size, time_steps, c, h, w = x.size()
         
         # Extraer features de cada frame
@@ -48,8 +77,10 @@ class VideoClassifier(nn.Module):
             features.append(feat)
         
         # Stack temporal: [batch, time, features]
-        features = torch.stack(features, dim=1)
-        
+        return torch.stack(features, dim=1)
+    
+    def classify_features(self, features):
+        """LSTM + clasificador sobre features [batch, time, 576] → logits"""
         # LSTM
         lstm_out, _ = self.lstm(features)
         
@@ -0,0 +1,96 @@
+"""
+Despacho en lote de notificaciones.
+bulk_create no dispara post_save: quien crea notificaciones en lote
+las entrega aquí una sola vez. La entrega real (WebSocket + FCM) la hace
+el dispatcher asíncrono tras el commit (ver dispatcher.py).
+"""
+import asyncio
+import logging
+
+from .serializer import NotificacionSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def despachar_lote(notificaciones):
+    """
+    Encola la entrega de un lote de notificaciones ya guardadas.
+    Retorna de inmediato: se entregan al confirmarse la transacción en curso.
+    
+    Args:
+        notificaciones: lista de Notificacion guardadas (con id)
+    
+    Returns:
+        int: Notificaciones encoladas
+    """
+    from .dispatcher import notification_dispatcher
+    
+    ids = [n.id for n in notificaciones if n.id is not None]
+    if ids:
+        notification_dispatcher.submit_on_commit(ids)
+    return len(ids)
+
+
+def agrupar_mensajes_websocket(notificaciones):
+    """Mensajes (grupo, payload) del lote, serializados en una sola pasada"""
+    datos = NotificacionSerializer(notificaciones, many=True).data
+    return [
+        (f'notificaciones_{notificacion.perfil_id}', {'type': 'nueva_notificacion', 'notificacion': data})
+        for notificacion, data in zip(notificaciones, datos)
+        if notificacion.perfil_id
+    ]
+
+
+async def enviar_grupos(channel_layer, mensajes):
+    """
+    group_send del lote: en orden dentro de cada grupo, concurrente entre grupos.
+    
+    Returns:
+        (enviados, errores)
+    """
+    por_grupo = {}
+    for grupo, mensaje in mensajes:
+        por_grupo.setdefault(grupo, []).append(mensaje)
+    
+    async def enviar_grupo(grupo, pendientes):
+        enviados = 0
+        for mensaje in pendientes:
+            try:
+                await channel_layer.group_send(grupo, mensaje)
+                enviados += 1
+            except Exception as e:
+                logger.error(f"❌ Error enviando por WebSocket a {grupo}: {str(e)}")
+        return enviados
+    
+    resultados = await asyncio.gather(
+        *(enviar_grupo(grupo, pendientes) for grupo, pendientes in por_grupo.items())
+    )
+    enviados = sum(resultados)
+    return enviados, len(mensajes) - enviados
+
+
+def _enviar_fcm_lote(notificaciones):
+    """Tokens de todos los perfiles en una consulta; todo el lote en un solo envío multicast"""
+    from .models import DispositivoFCM
+    from .utils import construir_payload
+    from .fcm import enviar_lote
+    
+    tokens_por_perfil = {}
+    dispositivos = DispositivoFCM.objects.filter(
+        perfil_id__in={n.perfil_id for n in notificaciones},
+        activo=True
+    ).values_list('perfil_id', 'token_fcm')
+    for perfil_id, token in dispositivos:
+        tokens_por_perfil.setdefault(perfil_id, []).append(token)
+    
+    envios = []
+    for notificacion in notificaciones:
+        tokens = tokens_por_perfil.get(notificacion.perfil_id)
+        if not tokens:
+            continue
+        notification_data, data_payload = construir_payload(notificacion)
+        envios.append((tokens, notification_data, data_payload, notificacion.nivel_peligro))
+    
+    if not envios:
+        return {'success': 0, 'failure': 0}
+    return enviar_lote(envios)
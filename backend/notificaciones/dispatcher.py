@@ -0,0 +1,199 @@
+"""
+Dispatcher asíncrono de notificaciones.
+Quien crea notificaciones solo encola sus IDs al hacer commit; un event loop
+propio (hilo daemon) junta lo que llega en una ventana corta y entrega el lote:
+WebSocket agrupado por grupo y FCM en un solo envío por lote.
+Ni las peticiones HTTP ni los hilos de detección esperan a la entrega.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, Event
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Event loop de entrega de notificaciones. Singleton.
+    Las consultas a la BD y el envío FCM (bloqueantes) corren en un pool
+    de hilos; los group_send del channel layer corren en el propio loop.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.window = getattr(settings, 'NOTIFICACIONES_DISPATCH_WINDOW_MS', 50) / 1000.0
+        self.max_batch = max(1, int(getattr(settings, 'NOTIFICACIONES_DISPATCH_MAX_BATCH', 500)))
+        self.num_threads = max(1, int(getattr(settings, 'NOTIFICACIONES_DISPATCH_THREADS', 4)))
+
+        self.loop = None
+        self.queue = None
+        self.thread = None
+        self.executor = None
+        self.lock = Lock()
+
+        # Métricas
+        self.enqueued = 0
+        self.batches = 0
+        self.websocket_sent = 0
+        self.websocket_errors = 0
+        self.fcm_success = 0
+        self.fcm_failure = 0
+        self.errors = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.last_latency_ms = 0.0
+
+        self._initialized = True
+
+    def submit(self, notificacion_ids):
+        """Encola IDs de notificaciones ya guardadas (thread-safe, no bloquea)"""
+        ids = [i for i in notificacion_ids if i is not None]
+        if not ids:
+            return
+        self.start()
+        now = time.monotonic()
+        self.enqueued += len(ids)
+        self.loop.call_soon_threadsafe(self._put_many, ids, now)
+
+    def submit_on_commit(self, notificacion_ids):
+        """Encola al confirmarse la transacción en curso (de inmediato si no hay transacción)"""
+        ids = list(notificacion_ids)
+        transaction.on_commit(lambda: self.submit(ids))
+
+    def start(self):
+        """Arranca el event loop de entrega en un hilo daemon"""
+        with self.lock:
+            if self.thread:
+                return
+            ready = Event()
+            self.executor = ThreadPoolExecutor(max_workers=self.num_threads,
+                                               thread_name_prefix='notificaciones-dispatch')
+            self.thread = Thread(target=self._run, args=(ready,), daemon=True,
+                                 name='notificaciones-dispatcher')
+            self.thread.start()
+            ready.wait()
+            logger.info(f"✅ Dispatcher de notificaciones iniciado (ventana {self.window * 1000:.0f} ms)")
+
+    def get_stats(self):
+        return {
+            'running': bool(self.thread and self.thread.is_alive()),
+            'queued': self.queue.qsize() if self.queue else 0,
+            'enqueued': self.enqueued,
+            'batches': self.batches,
+            'websocket_sent': self.websocket_sent,
+            'websocket_errors': self.websocket_errors,
+            'fcm_success': self.fcm_success,
+            'fcm_failure': self.fcm_failure,
+            'errors': self.errors,
+            'last_batch_size': self.last_batch_size,
+            'last_batch_ms': self.last_batch_ms,
+            'last_latency_ms': self.last_latency_ms,
+        }
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.Queue()
+        ready.set()
+        self.loop.run_until_complete(self._collect())
+
+    def _put_many(self, ids, enqueued_at):
+        for notificacion_id in ids:
+            self.queue.put_nowait((notificacion_id, enqueued_at))
+
+    async def _collect(self):
+        """Junta IDs durante la ventana (o hasta max_batch) y entrega el lote"""
+        while True:
+            batch = [await self.queue.get()]
+            deadline = self.loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - self.loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Error entregando lote de notificaciones: {str(e)}")
+
+    async def _deliver(self, batch):
+        from channels.layers import get_channel_layer
+        from .dispatch import enviar_grupos, _enviar_fcm_lote
+
+        inicio = time.monotonic()
+        ids = list(dict.fromkeys(notificacion_id for notificacion_id, _ in batch))
+
+        notificaciones, mensajes = await self.loop.run_in_executor(self.executor, _cargar_lote, ids)
+        if not notificaciones:
+            return
+
+        # WebSocket: en el loop, secuencial dentro de cada grupo (orden) y concurrente entre grupos
+        enviados, errores = await enviar_grupos(get_channel_layer(), mensajes)
+
+        # FCM: bloqueante, en el pool (tokens de todo el lote en una consulta)
+        push = [n for n in notificaciones if n.canal == 'push']
+        fcm = {'success': 0, 'failure': 0}
+        if push:
+            try:
+                fcm = await self.loop.run_in_executor(self.executor, _con_conexion, _enviar_fcm_lote, push)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Error enviando lote por FCM: {str(e)}")
+
+        self.batches += 1
+        self.websocket_sent += enviados
+        self.websocket_errors += errores
+        self.fcm_success += fcm['success']
+        self.fcm_failure += fcm['failure']
+        self.last_batch_size = len(notificaciones)
+        self.last_batch_ms = (time.monotonic() - inicio) * 1000
+        self.last_latency_ms = (time.monotonic() - min(t for _, t in batch)) * 1000
+
+        logger.info(
+            f"📦 Lote de {len(notificaciones)} notificaciones: {enviados} WebSocket "
+            f"({len({grupo for grupo, _ in mensajes})} grupos), FCM {fcm['success']} éxitos / "
+            f"{fcm['failure']} fallos en {self.last_batch_ms:.0f} ms"
+        )
+
+
+def _con_conexion(func, *args):
+    """Los hilos del pool no pasan por el ciclo de request: cerrar conexiones caducadas"""
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def _cargar_lote(ids):
+    """Notificaciones del lote (con perfil) y sus mensajes WebSocket serializados"""
+    def cargar():
+        from .models import Notificacion
+        from .dispatch import agrupar_mensajes_websocket
+        # Orden de inserción: el Meta.ordering ('-fecha_hora') invertiría los mensajes de cada grupo
+        notificaciones = list(Notificacion.objects.filter(id__in=ids).select_related('perfil').order_by('id'))
+        return notificaciones, agrupar_mensajes_websocket(notificaciones)
+    return _con_conexion(cargar)
+
+
+# Instancia global singleton (el loop arranca con la primera notificación)
+notification_dispatcher = NotificationDispatcher()
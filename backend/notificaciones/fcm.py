@@ -0,0 +1,261 @@
+"""
+Envío FCM en lote.
+Cada notificación va a todos sus tokens en multicast (bloques de hasta 500);
+los bloques de todo el lote corren en paralelo y los tokens inválidos
+se desactivan al final con un solo UPDATE.
+El transporte es intercambiable (NOTIFICACIONES_FCM_TRANSPORT):
+  - 'firebase': firebase-admin (send_each_for_multicast, FCM v1). El único para producción.
+  - 'falso': solo para pruebas de carga offline contra el servidor FCM falso local
+    (manage.py servidor_fcm_falso). Sin autenticación OAuth: no habla con el FCM real.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Límite de tokens por multicast de FCM
+MAX_TOKENS_POR_BLOQUE = 500
+
+# Único error que indica con certeza que el token ya no sirve. INVALID_ARGUMENT también
+# lo devuelve FCM por un payload mal formado: desactivar por él apagaría todo el lote
+ERRORES_TOKEN_INVALIDO = {'UNREGISTERED'}
+
+
+def _color_para_nivel(nivel_peligro):
+    from .utils import _get_color_for_priority
+    return _get_color_for_priority(nivel_peligro)
+
+
+class FirebaseAdminTransport:
+    """firebase-admin: un multicast por bloque (el SDK reparte los envíos sobre su sesión HTTP)"""
+
+    nombre = 'firebase'
+
+    def __init__(self):
+        self.lock = Lock()
+        self.disponible = None
+
+    def _inicializar(self):
+        """Inicializa Firebase Admin SDK una sola vez"""
+        with self.lock:
+            if self.disponible is not None:
+                return self.disponible
+            try:
+                import firebase_admin
+                from firebase_admin import credentials
+            except ImportError:
+                logger.error("firebase-admin no está instalado")
+                self.disponible = False
+                return False
+
+            if not firebase_admin._apps:
+                cred_path = os.path.join(settings.BASE_DIR, 'firebase-credentials.json')
+                if not os.path.exists(cred_path):
+                    # Sin cachear: las credenciales pueden aparecer después
+                    logger.warning("Archivo de credenciales Firebase no encontrado")
+                    return False
+                cred = credentials.Certificate(cred_path)
+                # Especificar el project_id explícitamente para asegurar el uso de FCM v1
+                firebase_admin.initialize_app(cred, {
+                    'projectId': cred.project_id,
+                })
+                logger.info(f"Firebase inicializado para proyecto: {cred.project_id}")
+            self.disponible = True
+            return True
+
+    def enviar_bloque(self, tokens, notification_data, data_payload, nivel_peligro):
+        """
+        Returns:
+            lista con None (éxito) o el código de error por token, en el mismo orden
+        """
+        if not self._inicializar():
+            return ['UNAVAILABLE'] * len(tokens)
+
+        from firebase_admin import messaging
+
+        message = messaging.MulticastMessage(
+            tokens=tokens,
+            notification=messaging.Notification(
+                title=notification_data['title'],
+                body=notification_data['body'],
+            ),
+            data=data_payload,
+            android=messaging.AndroidConfig(
+                priority='high',
+                notification=messaging.AndroidNotification(
+                    sound='default',
+                    color=_color_para_nivel(nivel_peligro),
+                    channel_id='security_alerts',
+                ),
+            ),
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(
+                    aps=messaging.Aps(
+                        sound='default',
+                        badge=1,
+                    ),
+                ),
+            ),
+        )
+        respuesta = messaging.send_each_for_multicast(message)
+        return [None if r.success else _codigo_firebase(r.exception) for r in respuesta.responses]
+
+
+def _codigo_firebase(exception):
+    """Código FCM v1 de una excepción de firebase-admin"""
+    from firebase_admin import messaging
+    if isinstance(exception, messaging.UnregisteredError):
+        return 'UNREGISTERED'
+    if isinstance(exception, messaging.SenderIdMismatchError):
+        return 'SENDER_ID_MISMATCH'
+    code = getattr(exception, 'code', None) or 'UNKNOWN'
+    if code == 'registration-token-not-registered':
+        # Código de la API legacy para el mismo caso
+        return 'UNREGISTERED'
+    return str(code).upper().replace('-', '_')
+
+
+class FakeServerTransport:
+    """
+    Transporte para el servidor FCM falso (manage.py servidor_fcm_falso), solo para
+    pruebas de carga offline. Habla el formato de la API v1 (un POST por token sobre
+    una sesión requests con pool de conexiones keep-alive, repartidos entre
+    NOTIFICACIONES_FCM_FAKE_WORKERS hilos) pero sin OAuth: no sirve contra el FCM real.
+    """
+
+    nombre = 'falso'
+
+    def __init__(self, url=None, workers=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = (url or getattr(settings, 'NOTIFICACIONES_FCM_FAKE_URL', 'http://127.0.0.1:9099')).rstrip('/')
+        self.workers = max(1, int(workers or getattr(settings, 'NOTIFICACIONES_FCM_FAKE_WORKERS', 32)))
+        self.timeout = getattr(settings, 'NOTIFICACIONES_FCM_TIMEOUT', 10)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fcm-falso')
+
+    def enviar_bloque(self, tokens, notification_data, data_payload, nivel_peligro):
+        endpoint = f"{self.url}/v1/projects/local/messages:send"
+        headers = {'Content-Type': 'application/json'}
+
+        def enviar(token):
+            cuerpo = {'message': {
+                'token': token,
+                'notification': notification_data,
+                'data': data_payload,
+                'android': {'priority': 'high', 'notification': {
+                    'sound': 'default',
+                    'color': _color_para_nivel(nivel_peligro),
+                    'channel_id': 'security_alerts',
+                }},
+            }}
+            try:
+                respuesta = self.session.post(endpoint, data=json.dumps(cuerpo), headers=headers,
+                                              timeout=self.timeout)
+            except Exception as e:
+                logger.error(f"Error enviando a token {token[:20]}...: {str(e)}")
+                return 'UNAVAILABLE'
+            if respuesta.status_code == 200:
+                return None
+            return _codigo_http(respuesta)
+
+        return list(self.executor.map(enviar, tokens))
+
+
+def _codigo_http(respuesta):
+    """Código FCM v1 del cuerpo de error (o del status HTTP)"""
+    try:
+        error = respuesta.json()['error']
+        for detalle in error.get('details', []):
+            if detalle.get('errorCode'):
+                return detalle['errorCode']
+        return error.get('status') or str(respuesta.status_code)
+    except Exception:
+        return str(respuesta.status_code)
+
+
+_transportes = {}
+_transportes_lock = Lock()
+_executor = None
+
+
+def get_transport(nombre=None):
+    """Transporte configurado (uno por proceso, reutiliza sesión y pool)"""
+    nombre = nombre or getattr(settings, 'NOTIFICACIONES_FCM_TRANSPORT', 'firebase')
+    with _transportes_lock:
+        if nombre not in _transportes:
+            if nombre == 'falso':
+                _transportes[nombre] = FakeServerTransport()
+            elif nombre == 'firebase':
+                _transportes[nombre] = FirebaseAdminTransport()
+            else:
+                raise ValueError(f"Transporte FCM desconocido: {nombre}")
+        return _transportes[nombre]
+
+
+def _get_executor():
+    """Pool de bloques en paralelo (compartido por todos los lotes)"""
+    global _executor
+    with _transportes_lock:
+        if _executor is None:
+            workers = max(1, int(getattr(settings, 'NOTIFICACIONES_FCM_CONCURRENCY', 4)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fcm-bloques')
+        return _executor
+
+
+def enviar_lote(envios, transport=None, desactivar=True):
+    """
+    Envía varias notificaciones FCM de una vez.
+    
+    Args:
+        envios: lista de (tokens, notification_data, data_payload, nivel_peligro)
+        transport: transporte a usar (por defecto el configurado)
+        desactivar: desactivar en BD los tokens inválidos
+    
+    Returns:
+        dict: {'success', 'failure', 'invalid'}
+    """
+    transport = transport or get_transport()
+    executor = _get_executor()
+
+    futuros = []
+    for tokens, notification_data, data_payload, nivel_peligro in envios:
+        for inicio in range(0, len(tokens), MAX_TOKENS_POR_BLOQUE):
+            bloque = tokens[inicio:inicio + MAX_TOKENS_POR_BLOQUE]
+            futuros.append((bloque, executor.submit(
+                transport.enviar_bloque, bloque, notification_data, data_payload, nivel_peligro
+            )))
+
+    resultado = {'success': 0, 'failure': 0, 'invalid': 0}
+    invalidos = []
+    for bloque, futuro in futuros:
+        try:
+            errores = futuro.result()
+        except Exception as e:
+            logger.error(f"Error enviando bloque FCM de {len(bloque)} tokens: {str(e)}")
+            errores = ['UNKNOWN'] * len(bloque)
+        for token, error in zip(bloque, errores):
+            if error is None:
+                resultado['success'] += 1
+                continue
+            resultado['failure'] += 1
+            if error in ERRORES_TOKEN_INVALIDO:
+                invalidos.append(token)
+
+    resultado['invalid'] = len(invalidos)
+    if invalidos and desactivar:
+        from .utils import _desactivar_tokens_por_lista
+        _desactivar_tokens_por_lista(invalidos)
+
+    logger.info(f"FCM enviado: {resultado['success']} éxitos, {resultado['failure']} fallos "
+                f"({len(futuros)} bloques, {resultado['invalid']} tokens inválidos)")
+    return resultado
@@ -0,0 +1,89 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Mide el envío FCM en lote contra el servidor falso local '
+            '(manage.py servidor_fcm_falso) y lo compara con el envío token a token')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help='URL del servidor FCM falso (por defecto NOTIFICACIONES_FCM_FAKE_URL)')
+        parser.add_argument('--dispositivos', type=int, default=500,
+                            help='Tokens destinatarios por notificación')
+        parser.add_argument('--notificaciones', type=int, default=4,
+                            help='Notificaciones en el lote (p.ej. destinatarios de una alerta)')
+        parser.add_argument('--invalidos', type=int, default=0,
+                            help='Tokens inválidos por notificación (prefijo "invalido")')
+        parser.add_argument('--sin-secuencial', action='store_true',
+                            help='No medir la referencia token a token')
+        parser.add_argument('--reporte', default=None,
+                            help='Ruta opcional para guardar el reporte en JSON')
+
+    def handle(self, *args, **options):
+        from notificaciones.fcm import FakeServerTransport, enviar_lote
+
+        envios = self._envios(options['notificaciones'], options['dispositivos'], options['invalidos'])
+        total = sum(len(tokens) for tokens, *_ in envios)
+        self.stdout.write(f"📱 {options['notificaciones']} notificaciones x {options['dispositivos']} "
+                          f"dispositivos = {total} mensajes")
+
+        transport = FakeServerTransport(url=options['url'])
+        resultados = [self._medir('lote', total, lambda: enviar_lote(envios, transport, desactivar=False))]
+
+        if not options['sin_secuencial']:
+            # Referencia: un envío por token, sin paralelismo (el comportamiento anterior)
+            secuencial = FakeServerTransport(url=options['url'], workers=1)
+
+            def token_a_token():
+                resultado = {'success': 0, 'failure': 0}
+                for tokens, notification_data, data_payload, nivel in envios:
+                    for token in tokens:
+                        error = secuencial.enviar_bloque([token], notification_data, data_payload, nivel)[0]
+                        resultado['failure' if error else 'success'] += 1
+                return resultado
+
+            resultados.append(self._medir('token a token', total, token_a_token))
+
+        self._imprimir(resultados)
+
+        if options['reporte']:
+            Path(options['reporte']).write_text(json.dumps(resultados, indent=2))
+            self.stdout.write(f'📄 Reporte guardado en {options["reporte"]}')
+
+    def _envios(self, notificaciones, dispositivos, invalidos):
+        """Payloads sintéticos con la forma de construir_payload"""
+        envios = []
+        for n in range(notificaciones):
+            tokens = [f'invalido-{n}-{i}' if i < invalidos else f'token-{n}-{i}' for i in range(dispositivos)]
+            notification_data = {'title': '🚨 CRÍTICO: benchmark', 'body': f'Notificación de prueba {n}'}
+            data_payload = {'notificacion_id': str(n), 'tipo': 'violencia', 'prioridad': 'alta',
+                            'nivel_peligro': 'rojo', 'zona': 'benchmark', 'camara_id': '',
+                            'timestamp': ''}
+            envios.append((tokens, notification_data, data_payload, 'rojo'))
+        return envios
+
+    def _medir(self, nombre, total, enviar):
+        inicio = time.perf_counter()
+        resultado = enviar()
+        segundos = time.perf_counter() - inicio
+        return {
+            'modo': nombre,
+            'mensajes': total,
+            'segundos': segundos,
+            'mensajes_por_segundo': total / segundos if segundos else 0.0,
+            'exitos': resultado['success'],
+            'fallos': resultado['failure'],
+        }
+
+    def _imprimir(self, resultados):
+        self.stdout.write(self.style.SUCCESS('\n📊 Envío FCM'))
+        self.stdout.write(f"   {'Modo':15s} {'Mensajes':>9s} {'Tiempo':>10s} {'msg/s':>9s} {'Éxitos':>7s} {'Fallos':>7s}")
+        for r in resultados:
+            self.stdout.write(f"   {r['modo']:15s} {r['mensajes']:9d} {r['segundos'] * 1000:8.0f} ms "
+                              f"{r['mensajes_por_segundo']:9.0f} {r['exitos']:7d} {r['fallos']:7d}")
+        if len(resultados) > 1:
+            self.stdout.write(f"   Aceleración: x{resultados[1]['segundos'] / resultados[0]['segundos']:.1f}")
@@ -0,0 +1,92 @@
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Servidor FCM v1 falso para pruebas de carga offline '
+            '(usar con NOTIFICACIONES_FCM_TRANSPORT=falso)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--puerto', type=int, default=9099)
+        parser.add_argument('--latencia-ms', type=float, default=20,
+                            help='Latencia simulada por mensaje (FCM real: ~20-80 ms)')
+        parser.add_argument('--tasa-invalidos', type=float, default=0.0,
+                            help='Fracción de tokens respondidos como UNREGISTERED (0-1)')
+        parser.add_argument('--intervalo-reporte', type=float, default=5,
+                            help='Segundos entre reportes de throughput')
+
+    def handle(self, *args, **options):
+        estado = {'total': 0, 'invalidos': 0, 'desde': time.monotonic(), 'reportado': 0}
+        lock = Lock()
+        latencia = options['latencia_ms'] / 1000.0
+        tasa_invalidos = options['tasa_invalidos']
+        intervalo = options['intervalo_reporte']
+        ruta = re.compile(r'^/v1/projects/[^/]+/messages:send$')
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive: el cliente reutiliza conexiones del pool
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not ruta.match(self.path):
+                    return self._responder(404, {'error': {'code': 404, 'status': 'NOT_FOUND'}})
+                try:
+                    token = json.loads(cuerpo)['message']['token']
+                except (ValueError, KeyError, TypeError):
+                    return self._responder(400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT'}})
+
+                time.sleep(latencia)
+                invalido = token.startswith('invalido') or random.random() < tasa_invalidos
+
+                with lock:
+                    estado['total'] += 1
+                    estado['invalidos'] += int(invalido)
+                    ahora = time.monotonic()
+                    if ahora - estado['desde'] >= intervalo:
+                        nuevos = estado['total'] - estado['reportado']
+                        stdout.write(f"📨 {nuevos / (ahora - estado['desde']):.0f} msg/s | "
+                                     f"total {estado['total']} | inválidos {estado['invalidos']}")
+                        estado['desde'] = ahora
+                        estado['reportado'] = estado['total']
+
+                if invalido:
+                    return self._responder(404, {'error': {
+                        'code': 404, 'status': 'NOT_FOUND',
+                        'details': [{'@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError',
+                                     'errorCode': 'UNREGISTERED'}],
+                    }})
+                self._responder(200, {'name': f"projects/local/messages/{random.getrandbits(63)}"})
+
+            def _responder(self, codigo, datos):
+                cuerpo = json.dumps(datos).encode()
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer((options['host'], options['puerto']), Handler)
+        servidor.daemon_threads = True
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ FCM falso escuchando en http://{options['host']}:{options['puerto']} "
+            f"(latencia {options['latencia_ms']:.0f} ms, inválidos {tasa_invalidos:.0%})"
+        ))
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            self.stdout.write(f"🛑 Servidor detenido: {estado['total']} mensajes recibidos")
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from threading import Lock
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from perfil.models import Perfil
+from .dispatch import enviar_grupos
+from .dispatcher import NotificationDispatcher, _cargar_lote, notification_dispatcher
+from .fcm import MAX_TOKENS_POR_BLOQUE, enviar_lote
+from .models import DispositivoFCM, Notificacion
+
+
+def nuevo_dispatcher():
+    """Instancia aparte del singleton global, con los settings vigentes"""
+    dispatcher = object.__new__(NotificationDispatcher)
+    dispatcher._initialized = False
+    dispatcher.__init__()
+    return dispatcher
+
+
+class CanalFalso:
+    """Channel layer que solo registra los group_send"""
+
+    def __init__(self):
+        self.enviados = []
+
+    async def group_send(self, grupo, mensaje):
+        await asyncio.sleep(0)
+        self.enviados.append((grupo, mensaje['notificacion']['id']))
+
+
+class CargarLoteTests(TestCase):
+    """Los mensajes de un grupo salen en el orden en que se crearon las notificaciones."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='empresa', password='x')
+        self.perfil = Perfil.objects.create(ci='1', nombre='Ana', apellido='Rojas', email='ana@test.com',
+                                            user_id=user, rol='jefe_seguridad')
+
+    @mock.patch('notificaciones.dispatcher.close_old_connections')
+    def test_group_messages_keep_insertion_order(self, _close):
+        ids = [Notificacion.objects.create(perfil=self.perfil, mensaje=f'alerta {i}').id for i in range(5)]
+
+        notificaciones, mensajes = _cargar_lote(list(reversed(ids)))
+
+        self.assertEqual([n.id for n in notificaciones], ids)
+        canal = CanalFalso()
+        enviados, errores = asyncio.run(enviar_grupos(canal, mensajes))
+        self.assertEqual((enviados, errores), (5, 0))
+        self.assertEqual(canal.enviados, [(f'notificaciones_{self.perfil.id}', i) for i in ids])
+
+
+class DispatcherBatchingTests(SimpleTestCase):
+    """Ventana y tamaño máximo de lote del event loop de entrega."""
+
+    def collect(self, dispatcher, escenario):
+        lotes = []
+
+        async def deliver(batch):
+            lotes.append([notificacion_id for notificacion_id, _ in batch])
+
+        async def run():
+            dispatcher.loop = asyncio.get_running_loop()
+            dispatcher.queue = asyncio.Queue()
+            dispatcher._deliver = deliver
+            tarea = asyncio.ensure_future(dispatcher._collect())
+            try:
+                await escenario(dispatcher)
+            finally:
+                tarea.cancel()
+
+        asyncio.run(run())
+        return lotes
+
+    @override_settings(NOTIFICACIONES_DISPATCH_WINDOW_MS=100, NOTIFICACIONES_DISPATCH_MAX_BATCH=500)
+    def test_ids_within_window_share_a_batch(self):
+        async def escenario(dispatcher):
+            dispatcher._put_many([1, 2], time.monotonic())
+            await asyncio.sleep(0.02)
+            dispatcher._put_many([3], time.monotonic())
+            await asyncio.sleep(0.3)
+            dispatcher._put_many([4], time.monotonic())
+            await asyncio.sleep(0.3)
+
+        lotes = self.collect(nuevo_dispatcher(), escenario)
+
+        self.assertEqual(lotes, [[1, 2, 3], [4]])
+
+    @override_settings(NOTIFICACIONES_DISPATCH_WINDOW_MS=100, NOTIFICACIONES_DISPATCH_MAX_BATCH=2)
+    def test_batch_is_cut_at_max_batch(self):
+        async def escenario(dispatcher):
+            dispatcher._put_many([1, 2, 3, 4, 5], time.monotonic())
+            await asyncio.sleep(0.3)
+
+        lotes = self.collect(nuevo_dispatcher(), escenario)
+
+        self.assertEqual(lotes, [[1, 2], [3, 4], [5]])
+
+
+class SubmitOnCommitTests(TestCase):
+    """Los IDs se encolan solo al confirmarse la transacción."""
+
+    def test_submit_waits_for_commit(self):
+        with mock.patch.object(notification_dispatcher, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                notification_dispatcher.submit_on_commit([1, 2])
+                submit.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        submit.assert_called_once_with([1, 2])
+
+    def test_nothing_is_submitted_without_commit(self):
+        with mock.patch.object(notification_dispatcher, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=False):
+                notification_dispatcher.submit_on_commit([1, 2])
+
+        submit.assert_not_called()
+
+
+class TransporteFalso:
+    """Transporte FCM en memoria: el error de cada token depende de su número"""
+
+    nombre = 'prueba'
+    codigos = ['UNREGISTERED', 'INVALID_ARGUMENT', 'UNAVAILABLE', None]
+
+    def __init__(self):
+        self.lock = Lock()
+        self.bloques = []
+
+    def enviar_bloque(self, tokens, notification_data, data_payload, nivel_peligro):
+        with self.lock:
+            self.bloques.append(len(tokens))
+        return [self.codigo(token) for token in tokens]
+
+    @classmethod
+    def codigo(cls, token):
+        return cls.codigos[int(token.rsplit('-', 1)[1]) % len(cls.codigos)]
+
+
+class EnviarLoteTests(TestCase):
+    """Bloques de hasta 500 tokens; solo se desactivan los tokens UNREGISTERED."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='empresa', password='x')
+        perfil = Perfil.objects.create(ci='1', nombre='Ana', apellido='Rojas', email='ana@test.com',
+                                       user_id=user, rol='jefe_seguridad')
+        self.tokens = [f'token-{i}' for i in range(1200)]
+        DispositivoFCM.objects.bulk_create([DispositivoFCM(perfil=perfil, token_fcm=token) for token in self.tokens])
+
+    def test_only_unregistered_tokens_are_deactivated(self):
+        transporte = TransporteFalso()
+        notificacion = {'title': 'Alerta', 'body': 'Detección'}
+        envios = [(self.tokens[:1100], notificacion, {}, 'rojo'), (self.tokens[1100:], notificacion, {}, 'rojo')]
+
+        resultado = enviar_lote(envios, transport=transporte)
+
+        self.assertEqual(sorted(transporte.bloques), [100, 100, MAX_TOKENS_POR_BLOQUE, MAX_TOKENS_POR_BLOQUE])
+        self.assertEqual(resultado, {'success': 300, 'failure': 900, 'invalid': 300})
+        inactivos = set(DispositivoFCM.objects.filter(activo=False).values_list('token_fcm', flat=True))
+        self.assertEqual(inactivos, {t for t in self.tokens if TransporteFalso.codigo(t) == 'UNREGISTERED'})
+
+    def test_failed_block_deactivates_nothing(self):
+        transporte = TransporteFalso()
+        transporte.enviar_bloque = mock.Mock(side_effect=ConnectionError('sin red'))
+
+        resultado = enviar_lote([(self.tokens, {'title': 'Alerta', 'body': ''}, {}, 'rojo')], transport=transporte)
+
+        self.assertEqual(resultado, {'success': 0, 'failure': 1200, 'invalid': 0})
+        self.assertFalse(DispositivoFCM.objects.filter(activo=False).exists())
@@ -2,7 +2,6 @@
 Utilidades para enviar notificaciones push mediante Firebase Cloud Messaging (FCM)
 """
 import logging
-from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +31,23 @@ def enviar_notificacion_fcm(notificacion):
     # Obtener tokens
     tokens = [d.token_fcm for d in dispositivos]
     
-    # Construir payload de notificación
+    notification_data, data_payload = construir_payload(notificacion)
+    
+    try:
+        resultado = _enviar_a_tokens(tokens, notification_data, data_payload, notificacion)
+        return resultado
+    except Exception as e:
+        logger.error(f"Error enviando notificación FCM: {str(e)}")
+        return {'success': 0, 'failure': len(tokens), 'error': str(e)}
+
+
+def construir_payload(notificacion):
+    """
+    Payload FCM de una notificación.
+    
+    Returns:
+        tuple: (notification_data, data_payload)
+    """
     notification_data = {
         'title': notificacion.titulo,
         'body': notificacion.mensaje,
@@ -53,111 +68,25 @@ def enviar_notificacion_fcm(notificacion):
         for key, value in notificacion.metadata.items():
             data_payload[f'meta_{key}'] = str(value)
     
-    try:
-        # Intentar con firebase-admin
-        resultado = _enviar_con_firebase_admin(tokens, notification_data, data_payload, notificacion)
-        return resultado
-    except Exception as e:
-        logger.error(f"Error enviando notificación FCM: {str(e)}")
-        return {'success': 0, 'failure': len(tokens), 'error': str(e)}
+    return notification_data, data_payload
 
 
-def _enviar_con_firebase_admin(tokens, notification_data, data_payload, notificacion):
+def _enviar_a_tokens(tokens, notification_data, data_payload, notificacion):
     """
-    Enviar notificación usando firebase-admin SDK con FCM v1 API.
+    Enviar una notificación a todos sus tokens en multicast (ver fcm.enviar_lote).
     """
-    try:
-        import firebase_admin
-        from firebase_admin import credentials, messaging
-        
-        # Inicializar Firebase Admin SDK si no está inicializado
-        if not firebase_admin._apps:
-            # Buscar archivo de credenciales
-            import os
-            cred_path = os.path.join(settings.BASE_DIR, 'firebase-credentials.json')
-            
-            if os.path.exists(cred_path):
-                cred = credentials.Certificate(cred_path)
-                # Especificar el project_id explícitamente para asegurar el uso de FCM v1
-                firebase_admin.initialize_app(cred, {
-                    'projectId': cred.project_id,
-                })
-                logger.info(f"Firebase inicializado para proyecto: {cred.project_id}")
-            else:
-                logger.warning("Archivo de credenciales Firebase no encontrado")
-                return {'success': 0, 'failure': len(tokens), 'error': 'Credenciales no configuradas'}
-        
-        success_count = 0
-        failure_count = 0
-        failed_tokens = []
-        
-        # Enviar a cada token individualmente (más confiable que multicast)
-        for token in tokens:
-            try:
-                # Crear mensaje individual con FCM v1
-                message = messaging.Message(
-                    notification=messaging.Notification(
-                        title=notification_data['title'],
-                        body=notification_data['body'],
-                    ),
-                    data=data_payload,
-                    token=token,
-                    android=messaging.AndroidConfig(
-                        priority='high',
-                        notification=messaging.AndroidNotification(
-                            sound='default',
-                            color=_get_color_for_priority(notificacion.nivel_peligro),
-                            channel_id='security_alerts',
-                        ),
-                    ),
-                    apns=messaging.APNSConfig(
-                        payload=messaging.APNSPayload(
-                            aps=messaging.Aps(
-                                sound='default',
-                                badge=1,
-                            ),
-                        ),
-                    ),
-                )
-                
-                # Enviar usando send() que usa FCM v1 API
-                response = messaging.send(message)
-                success_count += 1
-                logger.info(f"✅ Notificación enviada exitosamente. Response: {response}")
-                
-            except messaging.UnregisteredError:
-                logger.warning(f"Token no registrado: {token[:20]}...")
-                failure_count += 1
-                failed_tokens.append(token)
-            except messaging.InvalidArgumentError as e:
-                logger.warning(f"Token inválido: {token[:20]}... - {str(e)}")
-                failure_count += 1
-                failed_tokens.append(token)
-            except Exception as e:
-                logger.error(f"Error enviando a token {token[:20]}...: {str(e)}")
-                failure_count += 1
-                failed_tokens.append(token)
-        
-        # Desactivar tokens inválidos
-        if failed_tokens:
-            _desactivar_tokens_por_lista(failed_tokens)
-        
-        logger.info(f"FCM enviado: {success_count} éxitos, {failure_count} fallos")
-        
-        return {
-            'success': success_count,
-            'failure': failure_count,
-            'message': f'{success_count} notificaciones enviadas correctamente'
-        }
+    from .fcm import enviar_lote
     
-    except ImportError:
-        logger.error("firebase-admin no está instalado")
-        return {'success': 0, 'failure': len(tokens), 'error': 'Firebase Admin SDK no instalado'}
+    try:
+        resultado = enviar_lote([(tokens, notification_data, data_payload, notificacion.nivel_peligro)])
     except Exception as e:
-        logger.error(f"Error en _enviar_con_firebase_admin: {str(e)}")
+        logger.error(f"Error en _enviar_a_tokens: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
         return {'success': 0, 'failure': len(tokens), 'error': str(e)}
+    
+    resultado['message'] = f"{resultado['success']} notificaciones enviadas correctamente"
+    return resultado
 
 
 def _get_color_for_priority(nivel_peligro):
@@ -171,37 +100,25 @@ def _get_color_for_priority(nivel_peligro):
 
 
 def _desactivar_tokens_invalidos(tokens, responses):
-    """Desactivar tokens que fallaron"""
-    from .models import DispositivoFCM
-    
-    for idx, response in enumerate(responses):
-        if not response.success:
-            error_code = response.exception.code if response.exception else None
-            
-            # Desactivar solo si es error de token inválido
-            if error_code in ['invalid-registration-token', 'registration-token-not-registered']:
-                token = tokens[idx]
-                try:
-                    dispositivo = DispositivoFCM.objects.get(token_fcm=token)
-                    dispositivo.activo = False
-                    dispositivo.save()
-                    logger.info(f"Token FCM desactivado: {token[:20]}...")
-                except DispositivoFCM.DoesNotExist:
-                    pass
+    """Desactivar tokens que fallaron por token inválido (respuestas de firebase-admin)"""
+    from .fcm import ERRORES_TOKEN_INVALIDO, _codigo_firebase
+    
+    invalidos = [
+        token for token, response in zip(tokens, responses)
+        if not response.success and _codigo_firebase(response.exception) in ERRORES_TOKEN_INVALIDO
+    ]
+    _desactivar_tokens_por_lista(invalidos)
 
 
 def _desactivar_tokens_por_lista(tokens):
-    """Desactivar tokens de una lista"""
+    """Desactivar tokens de una lista (un solo UPDATE)"""
     from .models import DispositivoFCM
     
-    for token in tokens:
-        try:
-            dispositivo = DispositivoFCM.objects.get(token_fcm=token)
-            dispositivo.activo = False
-            dispositivo.save()
-            logger.info(f"Token FCM desactivado: {token[:20]}...")
-        except DispositivoFCM.DoesNotExist:
-            pass
+    if not tokens:
+        return 0
+    desactivados = DispositivoFCM.objects.filter(token_fcm__in=tokens, activo=True).update(activo=False)
+    logger.info(f"Tokens FCM desactivados: {desactivados}")
+    return desactivados
 
 
 def enviar_notificacion_masiva(perfiles_ids, titulo, mensaje, tipo='sistema', prioridad='media'):
@@ -259,6 +176,6 @@ def enviar_notificacion_masiva(perfiles_ids, titulo, mensaje, tipo='sistema', pr
             self.fecha_hora = timezone.now()
     
     temp_notif = TempNotificacion()
-    resultado = _enviar_con_firebase_admin(tokens, notification_data, data_payload, temp_notif)
+    resultado = _enviar_a_tokens(tokens, notification_data, data_payload, temp_notif)
     
     return resultado
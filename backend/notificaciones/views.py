@@ -1,10 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from .models import Notificacion, DispositivoFCM
 from .serializer import NotificacionSerializer, DispositivoFCMSerializer
+from .dispatch import despachar_lote
+from .dispatcher import notification_dispatcher
 from perfil.models import Perfil
 import logging
 
@@ -27,6 +27,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
     - marcar_todas_leidas: Marcar todas como leídas para un perfil
     - no_leidas: Obtener contador de notificaciones no leídas
     - enviar_a_grupo: Enviar notificación a múltiples perfiles
+    - metricas_entrega: Métricas del dispatcher de entrega
     """
     queryset = Notificacion.objects.all()
     serializer_class = NotificacionSerializer
@@ -41,8 +42,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         notificacion = serializer.save()
         
-        # El signal ya envía por WebSocket y FCM automáticamente
-        # No llamar a _enviar_por_websocket_inteligente() para evitar duplicados
+        # El signal encola el envío por WebSocket y FCM automáticamente (tras el commit)
         
         # Retornar respuesta
         response_serializer = NotificacionSerializer(notificacion)
@@ -156,33 +156,32 @@ class NotificacionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        notificaciones_creadas = []
-        
+        # Perfiles en el orden pedido, no en el orden por defecto de Perfil
+        perfiles_por_id = {str(perfil.id): perfil for perfil in Perfil.objects.filter(id__in=perfiles_ids).only('id')}
+        perfiles = []
         for perfil_id in perfiles_ids:
-            try:
-                perfil = Perfil.objects.get(id=perfil_id)
-                notificacion = Notificacion.objects.create(
-                    perfil=perfil,
-                    titulo=titulo,
-                    mensaje=mensaje,
-                    tipo=tipo,
-                    prioridad=prioridad,
-                    nivel_peligro=nivel_peligro,
-                    canal=canal
-                )
-                
-                # Enviar por WebSocket
-                self._enviar_por_websocket(notificacion)
-                
-                # Enviar por FCM si es push
-                if canal == 'push':
-                    self._enviar_por_fcm(notificacion)
-                
-                notificaciones_creadas.append(notificacion.id)
-            
-            except Perfil.DoesNotExist:
+            perfil = perfiles_por_id.get(str(perfil_id))
+            if perfil is None:
                 logger.warning(f"Perfil {perfil_id} no encontrado")
                 continue
+            perfiles.append(perfil)
+        
+        # Un solo INSERT; la entrega (WebSocket + FCM) la hace el dispatcher tras el commit.
+        # bulk_create devuelve los objetos en el mismo orden de entrada
+        notificaciones = Notificacion.objects.bulk_create([
+            Notificacion(
+                perfil=perfil,
+                titulo=titulo,
+                mensaje=mensaje,
+                tipo=tipo,
+                prioridad=prioridad,
+                nivel_peligro=nivel_peligro,
+                canal=canal
+            )
+            for perfil in perfiles
+        ])
+        despachar_lote(notificaciones)
+        notificaciones_creadas = [notificacion.id for notificacion in notificaciones]
         
         return Response({
             'status': 'success',
@@ -190,70 +189,10 @@ class NotificacionViewSet(viewsets.ModelViewSet):
             'notificaciones_ids': notificaciones_creadas
         }, status=status.HTTP_201_CREATED)
     
-    # Métodos auxiliares privados
-    def _enviar_por_websocket_inteligente(self, notificacion):
-        """
-        SECURITY VISION: Envío inteligente de notificación por WebSocket.
-        
-        LÓGICA SIMPLIFICADA (SIN DUPLICADOS):
-        - Enviar SOLO al grupo individual del perfil destinatario
-        - Cada perfil tiene su canal único: notificaciones_{perfil_id}
-        - NO enviar a grupos adicionales (supervision_global, zona, rol)
-          porque causan duplicados si el perfil está suscrito a varios
-        """
-        try:
-            from perfil.models import Perfil
-            
-            channel_layer = get_channel_layer()
-            serializer = NotificacionSerializer(notificacion)
-            
-            # Enviar ÚNICAMENTE al perfil destinatario específico
-            if notificacion.perfil:
-                room_group_name = f'notificaciones_{notificacion.perfil.id}'
-                async_to_sync(channel_layer.group_send)(
-                    room_group_name,
-                    {
-                        'type': 'nueva_notificacion',
-                        'notificacion': serializer.data
-                    }
-                )
-                
-                logger.info(
-                    f"📡 Notificación {notificacion.id} enviada a {room_group_name}"
-                )
-            else:
-                logger.warning(f"⚠️ Notificación {notificacion.id} sin perfil destinatario")
-        
-        except Exception as e:
-            logger.error(f"❌ Error en envío por WebSocket: {str(e)}")
-    
-    def _enviar_por_websocket(self, notificacion):
-        """Enviar notificación por WebSocket (método legacy)"""
-        try:
-            channel_layer = get_channel_layer()
-            room_group_name = f'notificaciones_{notificacion.perfil.id}'
-            
-            serializer = NotificacionSerializer(notificacion)
-            
-            async_to_sync(channel_layer.group_send)(
-                room_group_name,
-                {
-                    'type': 'nueva_notificacion',
-                    'notificacion': serializer.data
-                }
-            )
-            logger.info(f"Notificación {notificacion.id} enviada por WebSocket")
-        except Exception as e:
-            logger.error(f"Error enviando por WebSocket: {str(e)}")
-    
-    def _enviar_por_fcm(self, notificacion):
-        """Enviar notificación por Firebase Cloud Messaging"""
-        try:
-            from .utils import enviar_notificacion_fcm
-            enviar_notificacion_fcm(notificacion)
-            logger.info(f"Notificación {notificacion.id} enviada por FCM")
-        except Exception as e:
-            logger.error(f"Error enviando por FCM: {str(e)}")
+    @action(detail=False, methods=['get'])
+    def metricas_entrega(self, request):
+        """Métricas del dispatcher de entrega (lotes, cola, latencia, éxitos/fallos)"""
+        return Response(notification_dispatcher.get_stats())
 
 
 class DispositivoFCMViewSet(viewsets.ModelViewSet):
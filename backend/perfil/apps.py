@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PerfilConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'perfil'
+
+    def ready(self):
+        """Importar signals cuando la app esté lista"""
+        import perfil.signals  # noqa
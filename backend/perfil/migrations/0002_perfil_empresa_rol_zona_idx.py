@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='perfil',
+            index=models.Index(fields=['user_id', 'rol', 'zona'], name='perfil_empresa_rol_zona_idx'),
+        ),
+    ]
@@ -56,6 +56,10 @@ class Perfil(models.Model):
         verbose_name = 'Perfil'
         verbose_name_plural = 'Perfiles'
         ordering = ['nombre', 'apellido']
+        indexes = [
+            # Destinatarios de alertas: empresa + rol + zona
+            models.Index(fields=['user_id', 'rol', 'zona'], name='perfil_empresa_rol_zona_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} {self.apellido} - {self.get_rol_display()}"
@@ -0,0 +1,153 @@
+"""
+Índice de destinatarios de alertas.
+Resuelve quién recibe la alerta de una cámara con búsquedas en diccionario:
+  - (empresa, zona) → guardias de seguridad de esa zona
+  - empresa → jefes de seguridad
+Se construye de forma perezosa y se invalida con signals de Perfil, Zona y CamaraDetalles.
+Con ALERT_ROUTING_REDIS_URL la invalidación se comparte entre procesos (contador de versión).
+"""
+import logging
+from threading import Lock
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'alert_routing:version'
+
+
+class AlertRoutingIndex:
+    """
+    Misma regla que Perfil.puede_recibir_alerta, precalculada por empresa y zona.
+    Singleton.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.lock = Lock()
+        self.built = False
+        self.version = None  # Versión compartida con la que se construyó (modo Redis)
+
+        self.cameras = {}          # camera_id → {'empresa_id', 'zona_id', 'zona_nombre'}
+        self.guards_by_zone = {}   # (empresa_id, zona_id) → [perfil_id]
+        self.chiefs_by_tenant = {} # empresa_id → [perfil_id]
+
+        self.redis = None
+        redis_url = getattr(settings, 'ALERT_ROUTING_REDIS_URL', None)
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+            except Exception as e:
+                logger.warning(f"⚠️ Índice de alertas sin Redis: {str(e)}")
+
+        # Métricas
+        self.builds = 0
+        self.lookups = 0
+
+        self._initialized = True
+
+    def resolve(self, camera_id):
+        """
+        Destinatarios de una alerta de la cámara.
+
+        Returns:
+            dict {'empresa_id', 'zona_id', 'zona_nombre', 'perfil_ids'} o None si la cámara no existe
+        """
+        self._ensure_fresh()
+        self.lookups += 1
+
+        camera = self.cameras.get(camera_id)
+        if camera is None:
+            return None
+
+        empresa_id = camera['empresa_id']
+        perfil_ids = (self.chiefs_by_tenant.get(empresa_id, []) +
+                      self.guards_by_zone.get((empresa_id, camera['zona_id']), []))
+        return dict(camera, perfil_ids=perfil_ids)
+
+    def invalidate(self):
+        """Descarta el índice local y, con Redis, el de los demás procesos"""
+        with self.lock:
+            self.built = False
+        if self.redis:
+            try:
+                self.redis.incr(VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo invalidar el índice en Redis: {str(e)}")
+
+    def get_stats(self):
+        return {
+            'built': self.built,
+            'builds': self.builds,
+            'lookups': self.lookups,
+            'cameras': len(self.cameras),
+            'zones': len(self.guards_by_zone),
+            'tenants': len(self.chiefs_by_tenant),
+            'redis': self.redis is not None,
+        }
+
+    def _ensure_fresh(self):
+        shared_version = self._shared_version()
+        if self.built and shared_version == self.version:
+            return
+        with self.lock:
+            if not self.built or shared_version != self.version:
+                self._build()
+                self.version = shared_version
+
+    def _shared_version(self):
+        if not self.redis:
+            return None
+        try:
+            return self.redis.get(VERSION_KEY)
+        except Exception:
+            # Sin Redis se sigue con la invalidación local
+            return self.version
+
+    def _build(self):
+        """Dos consultas: cámaras con su empresa/zona y perfiles activos con rol"""
+        from perfil.models import Perfil
+        from camaras.models import CamaraDetalles
+
+        cameras = {}
+        for camera_id, empresa_id, zona_id, zona_nombre in CamaraDetalles.objects.values_list(
+                'id', 'camara__user_id', 'zona_id', 'zona__nombre'):
+            cameras[camera_id] = {
+                'empresa_id': empresa_id,
+                'zona_id': zona_id,
+                'zona_nombre': zona_nombre or 'Sin zona',
+            }
+
+        guards_by_zone = {}
+        chiefs_by_tenant = {}
+        perfiles = Perfil.objects.filter(
+            user_id__is_active=True,
+            rol__in=['jefe_seguridad', 'guardia_seguridad']
+        ).values_list('id', 'user_id', 'rol', 'zona_id')
+        for perfil_id, empresa_id, rol, zona_id in perfiles:
+            if rol == 'jefe_seguridad':
+                chiefs_by_tenant.setdefault(empresa_id, []).append(perfil_id)
+            else:
+                guards_by_zone.setdefault((empresa_id, zona_id), []).append(perfil_id)
+
+        self.cameras = cameras
+        self.guards_by_zone = guards_by_zone
+        self.chiefs_by_tenant = chiefs_by_tenant
+        self.built = True
+        self.builds += 1
+        logger.info(f"🗺️ Índice de alertas construido: {len(cameras)} cámaras, "
+                    f"{len(guards_by_zone)} zonas, {len(chiefs_by_tenant)} empresas")
+
+
+# Instancia global singleton
+alert_routing_index = AlertRoutingIndex()
@@ -0,0 +1,23 @@
+"""
+Signals para el módulo de perfiles.
+Invalidan el índice de destinatarios de alertas cuando cambian perfiles, zonas o cámaras.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from camaras.models import CamaraDetalles
+from zonas.models import Zona
+from .models import Perfil
+from .routing_index import alert_routing_index
+
+
+def invalidar_indice_alertas(sender, **kwargs):
+    """Tras el commit, para que la reconstrucción vea los datos nuevos"""
+    transaction.on_commit(alert_routing_index.invalidate)
+
+
+for modelo in (Perfil, Zona, CamaraDetalles):
+    post_save.connect(invalidar_indice_alertas, sender=modelo,
+                      dispatch_uid=f'indice_alertas_save_{modelo.__name__}')
+    post_delete.connect(invalidar_indice_alertas, sender=modelo,
+                        dispatch_uid=f'indice_alertas_delete_{modelo.__name__}')
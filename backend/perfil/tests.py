@@ -1,3 +1,103 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from camaras.models import Camara, CamaraDetalles
+from zonas.models import Zona
+from .models import Perfil
+from .routing_index import alert_routing_index
+
+User = get_user_model()
+
+
+class AlertRoutingIndexTests(TestCase):
+    """El índice de alertas resuelve lo mismo que Perfil.puede_recibir_alerta y se invalida tras el commit."""
+
+    def setUp(self):
+        self.norte = Zona.objects.create(nombre='Norte')
+        self.sur = Zona.objects.create(nombre='Sur')
+        self.empresa = User.objects.create_user(username='empresa', password='x')
+        otra_empresa = User.objects.create_user(username='otra', password='x')
+        inactiva = User.objects.create_user(username='inactiva', password='x', is_active=False)
+
+        self.camaras = [
+            self.camara(self.empresa, self.norte, 1),
+            self.camara(self.empresa, self.sur, 2),
+            self.camara(self.empresa, None, 3),
+            self.camara(otra_empresa, self.norte, 1),
+            self.camara(inactiva, self.norte, 1),
+        ]
+
+        self.jefe = self.perfil('1', self.empresa, 'jefe_seguridad')
+        self.guardia_norte = self.perfil('2', self.empresa, 'guardia_seguridad', self.norte)
+        self.perfil('3', self.empresa, 'guardia_seguridad', self.sur)
+        self.perfil('4', self.empresa, 'guardia_seguridad')
+        self.perfil('5', self.empresa, None, self.norte)
+        self.perfil('6', otra_empresa, 'jefe_seguridad')
+        self.perfil('7', otra_empresa, 'guardia_seguridad', self.norte)
+        self.perfil('8', inactiva, 'jefe_seguridad')
+
+        alert_routing_index.invalidate()
+
+    def camara(self, empresa, zona, n_camara):
+        camara = Camara.objects.create(cantidad=1, lugar=f'Sede {empresa.username}', cant_zonas=1, user=empresa)
+        return CamaraDetalles.objects.create(camara=camara, n_camara=n_camara, zona=zona, ip='10.0.0.1',
+                                             marca='Genérica', resolucion='1080p')
+
+    def perfil(self, ci, empresa, rol, zona=None):
+        return Perfil.objects.create(ci=ci, nombre=f'Perfil {ci}', apellido='Prueba', email=f'{ci}@test.com',
+                                     user_id=empresa, rol=rol, zona=zona)
+
+    def esperados(self, camara):
+        """Regla anterior: perfiles activos de la empresa de la cámara que pueden recibir la alerta"""
+        perfiles = Perfil.objects.filter(user_id=camara.camara.user_id, user_id__is_active=True)
+        return {perfil.id for perfil in perfiles if perfil.puede_recibir_alerta(camara.zona_id)}
+
+    def test_resolve_matches_puede_recibir_alerta(self):
+        for camara in self.camaras:
+            with self.subTest(camara=camara.id):
+                ruta = alert_routing_index.resolve(camara.id)
+                self.assertEqual(set(ruta['perfil_ids']), self.esperados(camara))
+                self.assertEqual(len(ruta['perfil_ids']), len(set(ruta['perfil_ids'])))
+                self.assertEqual(ruta['empresa_id'], camara.camara.user_id)
+                self.assertEqual(ruta['zona_id'], camara.zona_id)
+
+    def test_unknown_camera_resolves_to_none(self):
+        self.assertIsNone(alert_routing_index.resolve(-1))
+
+    def test_perfil_save_invalidates_after_commit(self):
+        camara_norte = self.camaras[0]
+        self.assertIn(self.guardia_norte.id, alert_routing_index.resolve(camara_norte.id)['perfil_ids'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guardia_norte.zona = self.sur
+            self.guardia_norte.save()
+            # Antes del commit sigue valiendo el índice construido
+            self.assertIn(self.guardia_norte.id, alert_routing_index.resolve(camara_norte.id)['perfil_ids'])
+
+        self.assertNotIn(self.guardia_norte.id, alert_routing_index.resolve(camara_norte.id)['perfil_ids'])
+        self.assertEqual(set(alert_routing_index.resolve(camara_norte.id)['perfil_ids']),
+                         self.esperados(camara_norte))
+
+    def test_zona_save_invalidates_after_commit(self):
+        camara_norte = self.camaras[0]
+        self.assertEqual(alert_routing_index.resolve(camara_norte.id)['zona_nombre'], 'Norte')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.norte.nombre = 'Norte A'
+            self.norte.save()
+            self.assertEqual(alert_routing_index.resolve(camara_norte.id)['zona_nombre'], 'Norte')
+
+        self.assertEqual(alert_routing_index.resolve(camara_norte.id)['zona_nombre'], 'Norte A')
+
+    def test_camara_detalles_save_invalidates_after_commit(self):
+        camara = self.camaras[2]
+        self.assertNotIn(self.guardia_norte.id, alert_routing_index.resolve(camara.id)['perfil_ids'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            camara.zona = self.norte
+            camara.save()
+            self.assertNotIn(self.guardia_norte.id, alert_routing_index.resolve(camara.id)['perfil_ids'])
+
+        ruta = alert_routing_index.resolve(camara.id)
+        self.assertIn(self.guardia_norte.id, ruta['perfil_ids'])
+        self.assertEqual(set(ruta['perfil_ids']), self.esperados(camara))
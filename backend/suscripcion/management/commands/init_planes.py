@@ -11,25 +11,33 @@ class Command(BaseCommand):
                 'nombre': 'Básico',
                 'descripcion': 'Plan básico con funcionalidades esenciales para pequeñas empresas',
                 'precio': 15.00,
-                'duracion_meses': 1
+                'duracion_meses': 1,
+                'almacenamiento_mb': 2048,
+                'retencion_dias': 7
             },
             {
                 'nombre': 'Estándar',
                 'descripcion': 'Plan estándar con más funcionalidades y soporte prioritario',
                 'precio': 45.00,
-                'duracion_meses': 1
+                'duracion_meses': 1,
+                'almacenamiento_mb': 10240,
+                'retencion_dias': 30
             },
             {
                 'nombre': 'Premium',
                 'descripcion': 'Plan premium con todas las funcionalidades avanzadas',
                 'precio': 60.00,
-                'duracion_meses': 1
+                'duracion_meses': 1,
+                'almacenamiento_mb': 25600,
+                'retencion_dias': 60
             },
             {
                 'nombre': 'Profesional',
                 'descripcion': 'Plan profesional para empresas grandes con soporte 24/7',
                 'precio': 100.00,
-                'duracion_meses': 1
+                'duracion_meses': 1,
+                'almacenamiento_mb': 102400,
+                'retencion_dias': 90
             }
         ]
 
@@ -42,7 +50,9 @@ class Command(BaseCommand):
                 defaults={
                     'descripcion': plan_data['descripcion'],
                     'precio': plan_data['precio'],
-                    'duracion_meses': plan_data['duracion_meses']
+                    'duracion_meses': plan_data['duracion_meses'],
+                    'almacenamiento_mb': plan_data['almacenamiento_mb'],
+                    'retencion_dias': plan_data['retencion_dias']
                 }
             )
 
@@ -56,6 +66,8 @@ class Command(BaseCommand):
                 plan.descripcion = plan_data['descripcion']
                 plan.precio = plan_data['precio']
                 plan.duracion_meses = plan_data['duracion_meses']
+                plan.almacenamiento_mb = plan_data['almacenamiento_mb']
+                plan.retencion_dias = plan_data['retencion_dias']
                 plan.save()
                 actualizados += 1
                 self.stdout.write(
@@ -72,5 +84,6 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('\n📋 Planes disponibles:'))
         for plan in Plan.objects.all().order_by('precio'):
             self.stdout.write(
-                f'   • {plan.nombre}: ${plan.precio} / {plan.duracion_meses} mes(es)'
+                f'   • {plan.nombre}: ${plan.precio} / {plan.duracion_meses} mes(es) - '
+                f'{plan.almacenamiento_mb} MB de videos, {plan.retencion_dias} días'
             )
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suscripcion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plan',
+            name='almacenamiento_mb',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='plan',
+            name='retencion_dias',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
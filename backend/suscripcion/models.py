@@ -11,6 +11,9 @@ class Plan(models.Model):
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     duracion_meses = models.IntegerField()
     fecha_creacion = models.DateField(auto_now_add=True)
+    # Retención de videos de alerta (vacío = valores globales IA_RETENTION_*)
+    almacenamiento_mb = models.PositiveIntegerField(null=True, blank=True)
+    retencion_dias = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return self.nombre
@@ -244,4 +244,103 @@ MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
 ML_MODEL_DIR = BASE_DIR / 'ml_models'
-DETECTION_MODEL_PATH = ML_MODEL_DIR / 'best_model.pth'
\ No newline at end of file
+DETECTION_MODEL_PATH = ML_MODEL_DIR / 'best_model.pth'
+
+# Planificador de inferencia (micro-batches entre cámaras)
+IA_INFERENCE_MAX_BATCH = int(os.getenv('IA_INFERENCE_MAX_BATCH', 8))
+IA_INFERENCE_MAX_WAIT_MS = float(os.getenv('IA_INFERENCE_MAX_WAIT_MS', 25))
+IA_INFERENCE_TIMEOUT = float(os.getenv('IA_INFERENCE_TIMEOUT', 30))
+
+# Modo streaming: ventanas deslizantes sobre cache de features por frame
+IA_STREAMING_MODE = os.getenv('IA_STREAMING_MODE', 'False') == 'True'
+IA_STREAMING_STRIDE = int(os.getenv('IA_STREAMING_STRIDE', 4))
+
+# Precisión del modelo de violencia: 'fp32' o 'int8' (ver comando calibrar_modelo_int8)
+DETECTION_MODEL_PRECISION = os.getenv('DETECTION_MODEL_PRECISION', 'fp32')
+DETECTION_MODEL_INT8_PATH = ML_MODEL_DIR / 'best_model_int8.pt'
+DETECTION_MODEL_TORCHSCRIPT_PATH = ML_MODEL_DIR / 'best_model.pt'
+
+# Backend de inferencia: 'thread' (en proceso) o 'process' (workers con memoria compartida)
+IA_INFERENCE_BACKEND = os.getenv('IA_INFERENCE_BACKEND', 'thread')
+IA_INFERENCE_WORKERS = int(os.getenv('IA_INFERENCE_WORKERS', 1))
+IA_INFERENCE_WORKER_THREADS = int(os.getenv('IA_INFERENCE_WORKER_THREADS', 0)) or None
+IA_INFERENCE_SHM_SLOTS = int(os.getenv('IA_INFERENCE_SHM_SLOTS', 32))
+IA_INFERENCE_SUPERVISOR_INTERVAL = float(os.getenv('IA_INFERENCE_SUPERVISOR_INTERVAL', 1.0))  # Chequeo de workers muertos (s)
+
+# Etapa de análisis por cámara: 'latest' o 'skip_stale' (descarta clips más viejos que MAX_CLIP_AGE segundos)
+IA_ANALYSIS_DROP_POLICY = os.getenv('IA_ANALYSIS_DROP_POLICY', 'latest')
+IA_ANALYSIS_MAX_CLIP_AGE = float(os.getenv('IA_ANALYSIS_MAX_CLIP_AGE', 2.0))
+
+# Pre-filtro de movimiento: no correr el modelo en escenas estáticas
+IA_MOTION_GATE = os.getenv('IA_MOTION_GATE', 'True') == 'True'
+IA_MOTION_THRESHOLD = float(os.getenv('IA_MOTION_THRESHOLD', 0.005))
+IA_MOTION_PIXEL_THRESHOLD = int(os.getenv('IA_MOTION_PIXEL_THRESHOLD', 25))
+
+# Consolidación de videos de alerta fuera del hilo de captura: 'thread' (pool local) o 'celery'
+IA_CONSOLIDATION_BACKEND = os.getenv('IA_CONSOLIDATION_BACKEND', 'thread')
+IA_CONSOLIDATION_WORKERS = int(os.getenv('IA_CONSOLIDATION_WORKERS', 2))
+
+# Grabación: 'segments' (segmentos continuos a disco) o 'preroll' (últimos segundos en RAM como JPEG, disco solo tras alerta)
+IA_RECORDING_MODE = os.getenv('IA_RECORDING_MODE', 'segments')
+IA_PREROLL_MAX_MB = float(os.getenv('IA_PREROLL_MAX_MB', 64))
+IA_PREROLL_JPEG_QUALITY = int(os.getenv('IA_PREROLL_JPEG_QUALITY', 80))
+
+# Armado del video de alerta: 'reencode' (overlay dibujado en cada frame) o 'copy' (ffmpeg -c copy + sidecars .vtt/.json)
+IA_CONSOLIDATION_MODE = os.getenv('IA_CONSOLIDATION_MODE', 'reencode')
+IA_FFMPEG_BIN = os.getenv('IA_FFMPEG_BIN', 'ffmpeg')
+
+# Cola de codificación por cámara: 'drop_oldest' (la captura nunca espera) o 'block' (no se pierden frames)
+IA_RECORDER_QUEUE_SIZE = int(os.getenv('IA_RECORDER_QUEUE_SIZE', 64))
+IA_RECORDER_OVERFLOW_POLICY = os.getenv('IA_RECORDER_OVERFLOW_POLICY', 'drop_oldest')
+
+# Tope de fps al grabar (0 = los fps que entregue la cámara); los frames sobrantes ni se decodifican
+IA_RECORDING_MAX_FPS = float(os.getenv('IA_RECORDING_MAX_FPS', 0))
+
+# Carpeta de grabaciones y retención de videos de alerta (el plan activo puede sobrescribir MB y días)
+IA_RECORDING_DIR = os.getenv('IA_RECORDING_DIR', 'media')
+IA_RETENTION_DEFAULT_MB = int(os.getenv('IA_RETENTION_DEFAULT_MB', 5120))
+IA_RETENTION_DEFAULT_DAYS = int(os.getenv('IA_RETENTION_DEFAULT_DAYS', 30))
+IA_RETENTION_ORPHAN_MIN_AGE = int(os.getenv('IA_RETENTION_ORPHAN_MIN_AGE', 3600))
+IA_RETENTION_SWEEP_ON_STARTUP = os.getenv('IA_RETENTION_SWEEP_ON_STARTUP', 'True') == 'True'
+
+# task.py no sigue el nombre tasks.py que busca autodiscover
+CELERY_IMPORTS = ('ia_detection.task',)
+CELERY_BEAT_SCHEDULE = {
+    'retencion-videos-alerta': {
+        'task': 'ia_detection.task.enforce_retention_task',
+        'schedule': 3600.0,
+    },
+}
+
+# Vista previa de alertas: ancho de miniatura y tira de keyframes (N frames, 1 cada INTERVAL segundos; 0 = sin tira)
+IA_THUMBNAIL_WIDTH = int(os.getenv('IA_THUMBNAIL_WIDTH', 320))
+IA_THUMBNAIL_STRIP_FRAMES = int(os.getenv('IA_THUMBNAIL_STRIP_FRAMES', 5))
+IA_THUMBNAIL_STRIP_INTERVAL = float(os.getenv('IA_THUMBNAIL_STRIP_INTERVAL', 1.0))
+
+# Alertas superpuestas: un solo clip extendido hasta MAX_CLIP_SECONDS; en cooldown se registran cada MIN_INTERVAL s sin notificar
+IA_RECORDING_MAX_CLIP_SECONDS = float(os.getenv('IA_RECORDING_MAX_CLIP_SECONDS', 120))
+IA_ALERT_MIN_INTERVAL = float(os.getenv('IA_ALERT_MIN_INTERVAL', 5))
+
+# Índice de destinatarios de alertas: con Redis la invalidación se comparte entre procesos (vacío = solo local)
+ALERT_ROUTING_REDIS_URL = os.getenv('ALERT_ROUTING_REDIS_URL', '')
+
+# Outbox de alertas: DetectionEvent, miniaturas y notificaciones fuera del hilo de análisis, con reintentos
+IA_ALERT_OUTBOX_WORKERS = int(os.getenv('IA_ALERT_OUTBOX_WORKERS', 2))
+IA_ALERT_OUTBOX_MAX_RETRIES = int(os.getenv('IA_ALERT_OUTBOX_MAX_RETRIES', 5))
+IA_ALERT_OUTBOX_RETRY_DELAY = float(os.getenv('IA_ALERT_OUTBOX_RETRY_DELAY', 1.0))
+IA_ALERT_OUTBOX_MAX_RETRY_DELAY = float(os.getenv('IA_ALERT_OUTBOX_MAX_RETRY_DELAY', 60))
+# Al arrancar se retoman las alertas sin actividad hace RECOVERY_AGE s; sin BD se guardan en SPOOL_DIR (vacío = IA_RECORDING_DIR/.outbox)
+IA_ALERT_OUTBOX_RECOVERY_AGE = float(os.getenv('IA_ALERT_OUTBOX_RECOVERY_AGE', 600))
+IA_ALERT_OUTBOX_SPOOL_DIR = os.getenv('IA_ALERT_OUTBOX_SPOOL_DIR', '')
+
+# Dispatcher de notificaciones: junta lo creado en WINDOW_MS (hasta MAX_BATCH) y entrega el lote tras el commit
+NOTIFICACIONES_DISPATCH_WINDOW_MS = float(os.getenv('NOTIFICACIONES_DISPATCH_WINDOW_MS', 50))
+NOTIFICACIONES_DISPATCH_MAX_BATCH = int(os.getenv('NOTIFICACIONES_DISPATCH_MAX_BATCH', 500))
+NOTIFICACIONES_DISPATCH_THREADS = int(os.getenv('NOTIFICACIONES_DISPATCH_THREADS', 4))
+
+# FCM: transporte 'firebase' (firebase-admin, producción) o 'falso' (solo servidor_fcm_falso, pruebas de carga)
+NOTIFICACIONES_FCM_TRANSPORT = os.getenv('NOTIFICACIONES_FCM_TRANSPORT', 'firebase')
+NOTIFICACIONES_FCM_FAKE_URL = os.getenv('NOTIFICACIONES_FCM_FAKE_URL', 'http://127.0.0.1:9099')
+NOTIFICACIONES_FCM_CONCURRENCY = int(os.getenv('NOTIFICACIONES_FCM_CONCURRENCY', 4))
+NOTIFICACIONES_FCM_FAKE_WORKERS = int(os.getenv('NOTIFICACIONES_FCM_FAKE_WORKERS', 32))
+NOTIFICACIONES_FCM_TIMEOUT = float(os.getenv('NOTIFICACIONES_FCM_TIMEOUT', 10))